@@ -0,0 +1,73 @@
+"""Compare le rechargement complet et la synchronisation incrémentale hors ligne.
+
+Usage : python -m benchmarks.bench_live_sync [--users 40] [--tasks 60]
+"""
+import argparse
+import random
+import time
+
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.live_sync import LiveSnapshot, full_load, sync_snapshot, sync_stamp_updates
+
+
+def build_room(n_users: int, n_tasks: int, seed: int = 0) -> FakeRTDB:
+    """Base remplie : chaque utilisateur a voté pour chaque tâche."""
+    rng = random.Random(seed)
+    fake = FakeRTDB()
+    root = fake.reference()
+    for u in range(n_users):
+        user_id = f"user_{u}"
+        root.child('users').child(user_id).set({'name': user_id, 'tokens': {'votes_3': 8}})
+        for t in range(n_tasks):
+            root.child('votes').child(f"csv_task_{t}").child(user_id).push({
+                'score': rng.randint(1, 5), 'timestamp': '2024-01-01T00:00:00', 'user_name': user_id})
+    root.update(sync_stamp_updates(
+        task_keys=[f"csv_task_{t}" for t in range(n_tasks)],
+        user_ids=[f"user_{u}" for u in range(n_users)],
+        tasks=True, stamp='2024-01-01T00:00:00'))
+    return fake
+
+
+def cast_vote(root, task_key: str, user_id: str, score: int):
+    root.child('votes').child(task_key).child(user_id).push({
+        'score': score, 'timestamp': time.time(), 'user_name': user_id})
+    root.update(sync_stamp_updates(task_keys=[task_key], user_ids=[user_id]))
+
+
+def measure(fake: FakeRTDB, fn) -> dict:
+    fake.reset_stats()
+    t0 = time.perf_counter()
+    fn()
+    stats = fake.stats()
+    stats['ms'] = round((time.perf_counter() - t0) * 1000, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--tasks', type=int, default=60)
+    args = parser.parse_args()
+
+    fake = build_room(args.users, args.tasks)
+    root = fake.reference()
+
+    snapshot = LiveSnapshot()
+    sync_snapshot(root, snapshot)
+
+    cast_vote(root, 'csv_task_0', 'user_1', 5)
+    delta = measure(fake, lambda: sync_snapshot(root, snapshot))
+    noop = measure(fake, lambda: sync_snapshot(root, snapshot))
+    full = measure(fake, lambda: full_load(root, LiveSnapshot()))
+
+    reference = LiveSnapshot()
+    full_load(root, reference)
+    assert reference.votes == snapshot.votes and reference.users == snapshot.users
+
+    print(f"{args.users} utilisateurs x {args.tasks} tâches")
+    for label, stats in (('rechargement complet', full), ('delta après 1 vote', delta), ('aucun changement', noop)):
+        print(f"  {label:<22} {stats['round_trips']:>3} appels  {stats['bytes_down']:>9} octets  {stats['ms']:>8} ms")
+
+
+if __name__ == '__main__':
+    main()
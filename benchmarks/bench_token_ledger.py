@@ -0,0 +1,93 @@
+"""Contention sur les tokens d'un même utilisateur : ancien schéma contre TokenLedger.
+
+Plusieurs threads corrigent des votes en parallèle (remboursement d'un type,
+débit d'un autre) sur une base locale simulant la latence réseau. L'ancien
+schéma (deux transactions, puis relecture pour deviner si le débit a eu lieu)
+est comparé au registre (une transaction groupée, résultat explicite).
+
+Usage : python -m benchmarks.bench_token_ledger [--threads 8] [--ops 25] [--latency 0.002]
+"""
+import argparse
+import threading
+import time
+
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.token_ledger import TokenLedger
+
+LIMITS = {"votes_5": 3, "votes_4": 5, "votes_3": 8, "votes_2": 10, "votes_1": 10}
+# Soldes à mi-dotation : ni plafond ni solde nul, chaque correction conserve le total de tokens
+START = {"votes_5": 3, "votes_4": 5, "votes_3": 8, "votes_2": 5, "votes_1": 5}
+USER = 'user_0'
+
+
+def legacy_swap(root, debit_type, refund_type):
+    """Reproduction de l'ancien increment_token + decrement_token (avec relecture)."""
+    tokens_ref = root.child('users').child(USER).child('tokens')
+
+    def _inc(cur):
+        val = int(cur) if cur is not None else 0
+        return val + 1 if val < LIMITS.get(refund_type, 0) else val
+
+    def _dec(cur):
+        val = int(cur) if cur is not None else 0
+        return val - 1 if val > 0 else val
+
+    tokens_ref.child(refund_type).transaction(_inc)
+    tok_ref = tokens_ref.child(debit_type)
+    new_val = tok_ref.transaction(_dec)
+    return int(new_val) >= 0 and int(new_val) != int((tok_ref.get() or 0) + 1)
+
+
+def run(label, swap, threads, ops, latency):
+    fake = FakeRTDB({'users': {USER: {'tokens': dict(START)}}}, latency=latency)
+    root = fake.reference()
+    # Chaque thread alterne entre deux types : l'état final attendu est connu
+    pairs = [('votes_1', 'votes_2'), ('votes_2', 'votes_1')]
+    applied = [0]
+    aborted = [0]
+    lock = threading.Lock()
+
+    def worker(i):
+        for n in range(ops):
+            debit, refund = pairs[(i + n) % 2]
+            try:
+                ok = swap(root, debit, refund)
+            except Exception:
+                # TransactionAbortedError : trop de conflits, l'appelant doit réessayer
+                with lock:
+                    aborted[0] += 1
+                continue
+            with lock:
+                applied[0] += bool(ok)
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stats = fake.stats()
+    total = threads * ops
+    round_trips = stats['round_trips'] + stats['transaction_retries']
+    final = root.child('users').child(USER).child('tokens').get()
+    print(f"  {label:<8} {total / elapsed:>7.1f} ops/s  {round_trips / total:>5.1f} allers-retours/op  "
+          f"{stats['transaction_retries']:>5} conflits  {aborted[0]:>3} abandons  "
+          f"{applied[0]:>4}/{total} signalés appliqués  total conservé {'oui' if sum(final.values()) == sum(START.values()) else 'NON'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=25)
+    parser.add_argument('--latency', type=float, default=0.002)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.ops} corrections, latence {args.latency * 1000:.1f} ms")
+    run('ancien', legacy_swap, args.threads, args.ops, args.latency)
+    run('ledger', lambda root, debit, refund: TokenLedger(root, LIMITS).swap(USER, debit, refund).applied,
+        args.threads, args.ops, args.latency)
+
+
+if __name__ == '__main__':
+    main()
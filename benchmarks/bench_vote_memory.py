@@ -0,0 +1,82 @@
+"""Mémoire occupée par les votes : arbre de dictionnaires contre ``VoteTable`` compacte.
+
+Pour chaque taille, mesure (tracemalloc) l'arbre ``votes`` tel que renvoyé par
+la RTDB, les copies créées par ``flatten_user_votes`` lors d'un parcours
+complet, et la ``VoteTable`` construite sur cet arbre (colonnes + index
+internés), ainsi que la durée de construction de la table.
+
+Usage : python -m benchmarks.bench_vote_memory [--sizes 10000 100000] [--tasks 60]
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from spring_vote.leaderboard import VoteTable
+from spring_vote.vote_utils import flatten_user_votes, generate_push_id
+
+
+def build_votes_json(n_votes: int, n_tasks: int, seed: int = 0) -> str:
+    """Arbre ``votes/{task_key}/{user_id}/{push_id}`` sérialisé, un vote par utilisateur et par tâche."""
+    rng = random.Random(seed)
+    n_users = max(1, n_votes // n_tasks)
+    start = datetime(2024, 1, 1)
+    votes = {}
+    for i in range(n_votes):
+        task_key = f"csv_task_{i % n_tasks}"
+        user_id = f"user_{i // n_tasks % n_users:06d}-{i // (n_tasks * n_users)}"
+        votes.setdefault(task_key, {})[user_id] = {generate_push_id(): {
+            'score': rng.randint(1, 5),
+            'timestamp': (start + timedelta(seconds=i)).isoformat(timespec='microseconds'),
+            'user_name': user_id,
+        }}
+    return json.dumps(votes)
+
+
+def allocated(fn):
+    """(résultat, octets encore alloués après l'appel, durée en ms)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before, elapsed * 1000
+
+
+def run(n_votes: int, n_tasks: int) -> dict:
+    raw = build_votes_json(n_votes, n_tasks)
+    votes, tree_bytes, _ = allocated(lambda: json.loads(raw))
+    _, flat_bytes, _ = allocated(lambda: [flatten_user_votes(uv) for tv in votes.values() for uv in tv.values()])
+    table, table_bytes, build_ms = allocated(lambda: VoteTable.build(votes))
+    return {
+        'votes': len(table),
+        'tree_kb': round(tree_bytes / 1024, 1),
+        'flatten_copies_kb': round(flat_bytes / 1024, 1),
+        'table_kb': round(table_bytes / 1024, 1),
+        'table_columns_kb': round(table.nbytes / 1024, 1),
+        'bytes_per_vote': {
+            'tree': round(tree_bytes / n_votes, 1),
+            'table': round(table_bytes / n_votes, 1),
+        },
+        'build_ms': round(build_ms, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--tasks', type=int, default=60)
+    args = parser.parse_args()
+
+    for n_votes in args.sizes:
+        print(f"== {n_votes} votes")
+        for key, value in run(n_votes, args.tasks).items():
+            print(f"  {key:<18} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Compare les backends de stockage sur le chemin de vote, hors ligne.
+
+Pour chaque ``VoteStore`` : allers-retours et durée par action (connexion,
+vote, correction, tâche proposée, import de 50 tâches, chargement,
+réinitialisation).
+
+Usage : python -m benchmarks.bench_vote_store [--users 20] [--tasks 30] [--latency 0.02]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from spring_vote.journal_store import JournalStore
+from spring_vote.leaderboard import VoteTable
+from spring_vote.sqlite_store import SqliteStore
+from spring_vote.vote_store import LocalVoteStore, MemoryVoteStore
+
+TOKENS = {"votes_5": 30, "votes_4": 30, "votes_3": 30, "votes_2": 30, "votes_1": 30}
+
+
+def measure(store, fn, repeat: int = 1) -> dict:
+    store.reset_stats()
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    elapsed = time.perf_counter() - t0
+    stats = store.stats()
+    return {
+        'round_trips': round(stats.get('round_trips', 0) / repeat, 2),
+        'ms': round(elapsed * 1000 / repeat, 3),
+    }
+
+
+def run(store, n_users: int, n_tasks: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    users = [f"user_{u}" for u in range(n_users)]
+    tasks = [f"csv_task_{t}" for t in range(n_tasks)]
+    tokens = {u: dict(TOKENS) for u in users}
+    scores = {}
+
+    def vote(i, correction=False):
+        user_id = users[i % n_users]
+        task_key = tasks[(i // n_users) % n_tasks]
+        score = rng.randint(1, 5)
+        previous = scores.get((task_key, user_id))
+        if correction and previous == score:
+            score = score % 5 + 1
+        result = store.commit_vote(task_key, user_id, user_id, score, tokens[user_id], previous)
+        tokens[user_id] = result.tokens
+        scores[(task_key, user_id)] = score
+
+    n_votes = n_users * n_tasks
+    results = {
+        'ensure_user': measure(store, lambda i: store.ensure_user(users[i], users[i], TOKENS), n_users),
+        'vote': measure(store, vote, n_votes),
+        'correction': measure(store, lambda i: vote(i, correction=True), n_users),
+        'add_task': measure(store, lambda i: store.add_task({
+            'id': f"t{i}", 'name': f"Tâche {i}", 'description': '', 'cost': 3, 'complexity': 3,
+            'interest': 3, 'proposed_by': users[0]}), 5),
+        'add_tasks_x50': measure(store, lambda i: store.add_tasks([{
+            'id': f"lot{i}_{j}", 'name': f"Tâche importée {i}.{j}", 'description': '', 'cost': 3,
+            'complexity': 3, 'interest': 3, 'proposed_by': users[0]} for j in range(50)]), 3),
+        'load_snapshot': measure(store, lambda i: store.load_snapshot(), 3),
+        'reset_user': measure(store, lambda i: store.reset_user(users[i], TOKENS), 3),
+    }
+    snapshot = store.load_snapshot()
+    results['check'] = {'votes': len(VoteTable.build(snapshot.votes)), 'expected': n_votes - 3 * n_tasks}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="latence simulée (s) par aller-retour pour le backend mémoire")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as journal_dir, tempfile.TemporaryDirectory() as sqlite_dir:
+        stores = [
+            MemoryVoteStore(latency=args.latency),
+            LocalVoteStore(JournalStore(journal_dir)),
+            LocalVoteStore(SqliteStore(sqlite_dir)),
+        ]
+        for store in stores:
+            results = run(store, args.users, args.tasks)
+            print(f"== {store.name}")
+            for action, stats in results.items():
+                print(f"  {action:<14} {stats}")
+        stores[2].backend.close()
+        stores[1].backend.close()
+
+
+if __name__ == '__main__':
+    main()
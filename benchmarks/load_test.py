@@ -0,0 +1,308 @@
+"""Test de charge : une salle de votants simultanés sur un backend hors ligne.
+
+Simule une réunion où tout le monde se connecte et vote dans les mêmes
+minutes. Chaque phase est jouée par un pool de threads (sessions Streamlit
+concurrentes) sur un ``VoteStore`` :
+
+    login            ensure_user
+    vote             commit_vote (débit du token, vote, compteurs, index)
+    correction       commit_vote avec remboursement de l'ancien token
+    correction_ledger  idem via TokenLedger + commit_vote_checked (backends Firebase)
+    load_snapshot    chargement complet (équivalent de l'ancien load_live_data)
+    shared_refresh   rafraîchissement du snapshot partagé à chaque réexécution (backends Firebase)
+    ranking          classement des tâches (``leaderboard`` sur la table de votes, comme l'application)
+
+Pour chaque phase : p50/p95/p99 (ms), allers-retours et octets par opération.
+Le pic mémoire Python (tracemalloc) couvre tout le test ; tracemalloc ralentit
+nettement les allocations, ``--no-tracemalloc`` donne des temps plus proches de
+la production (sans pic mémoire). ``--save`` écrit un
+JSON de référence ; ``--baseline`` compare un run à ce JSON et signale les
+régressions (code de sortie 1).
+
+Usage : python -m benchmarks.load_test [--users 300] [--backend memory] [--latency 0.005]
+        [--save baseline.json] [--baseline baseline.json]
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from spring_vote.journal_store import JournalStore
+from spring_vote.leaderboard import VoteTable, leaderboard, ranked
+from spring_vote.shared_cache import SharedSnapshotCache
+from spring_vote.sqlite_store import SqliteStore
+from spring_vote.token_ledger import TokenLedger
+from spring_vote.vote_commit import VoteRejected, build_vote_commit, commit_vote_checked
+from spring_vote.vote_store import LocalVoteStore, MemoryVoteStore
+from spring_vote.vote_utils import task_key_aliases
+
+TOKENS_CONFIG = {"votes_5": 3, "votes_4": 5, "votes_3": 8, "votes_2": 10, "votes_1": 10}
+# Métriques comparées à la référence : allers-retours et octets sont déterministes ; pour les temps,
+# la médiane (les p95/p99 sous contention du GIL varient trop d'un run à l'autre)
+COMPARED = ('p50_ms', 'round_trips_per_op', 'bytes_per_op')
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Percentile au rang le plus proche sur une liste triée."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Room:
+    """État client des participants simulés (tokens et votes connus, comme en session)."""
+
+    def __init__(self, n_users: int, n_tasks: int, seed: int):
+        self.users = [f"user_{u}" for u in range(n_users)]
+        self.tasks = [{'name': f"Tâche {t}", 'id': f"csv_Tâche {t}", 'source': 'csv'} for t in range(n_tasks)]
+        self.tokens = {u: dict(TOKENS_CONFIG) for u in self.users}
+        self.scores = {u: {} for u in self.users}
+        self.rngs = {u: random.Random(f"{seed}:{u}") for u in self.users}
+
+    def pick_score(self, user_id: str, exclude=None):
+        available = [int(t.split('_')[1]) for t, n in self.tokens[user_id].items() if n > 0]
+        available = [s for s in available if s != exclude]
+        return self.rngs[user_id].choice(available) if available else None
+
+
+def run_phase(store, sessions: list, concurrency: int) -> dict:
+    """Joue les sessions en parallèle ; chaque session enchaîne ses opérations (callables) une à une."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def play(ops):
+        for op in ops:
+            t0 = time.perf_counter()
+            try:
+                op()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    store.reset_stats()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(play, sessions))
+    wall = time.perf_counter() - t0
+    stats = store.stats()
+    n_ops = sum(len(ops) for ops in sessions)
+    n = max(1, n_ops)
+    latencies.sort()
+    return {
+        'ops': n_ops,
+        'errors': errors[0],
+        'ops_per_s': round(n_ops / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'round_trips_per_op': round((stats.get('round_trips', 0) + stats.get('transaction_retries', 0)) / n, 2),
+        'bytes_per_op': round((stats.get('bytes_down', 0) + stats.get('bytes_up', 0)) / n, 1),
+    }
+
+
+def vote_op(store, room: Room, user_id: str, task: dict):
+    def job():
+        score = room.pick_score(user_id)
+        if score is None:
+            return
+        result = store.commit_vote(task['id'], user_id, user_id, score, room.tokens[user_id])
+        room.tokens[user_id] = result.tokens
+        room.scores[user_id][task['id']] = score
+    return job
+
+
+def correction_op(store, room: Room, user_id: str, task_key: str, ledger=None):
+    def job():
+        previous = room.scores[user_id][task_key]
+        score = room.pick_score(user_id, exclude=previous)
+        if score is None:
+            return
+        if ledger is None:
+            result = store.commit_vote(task_key, user_id, user_id, score, room.tokens[user_id], previous)
+        else:
+            # Chemin des votes optimistes : tokens arbitrés par transaction serveur
+            result = build_vote_commit(task_key, user_id, user_id, score, room.tokens[user_id], previous)
+            try:
+                commit_vote_checked(store.ref, result, ledger)
+            except VoteRejected:
+                return
+        room.tokens[user_id] = result.tokens
+        room.scores[user_id][task_key] = score
+    return job
+
+
+def key_positions(tasks: list) -> dict:
+    """Clé de vote -> position de la tâche (calculé une fois, comme ``TaskCatalog.key_positions``)."""
+    positions = {}
+    for pos, task in enumerate(tasks):
+        for key in task_key_aliases(task):
+            positions.setdefault(key, pos)
+    return positions
+
+
+def ranking(table: VoteTable, tasks: list, positions: dict):
+    """Même calcul que le classement de l'application : ``leaderboard`` sur la table de votes du snapshot."""
+    return ranked(leaderboard(tasks, table, positions))
+
+
+def make_store(backend: str, latency: float, directory: str):
+    if backend == 'memory':
+        return MemoryVoteStore(latency=latency)
+    if backend == 'sqlite':
+        return LocalVoteStore(SqliteStore(directory))
+    if backend == 'journal':
+        return LocalVoteStore(JournalStore(directory))
+    raise ValueError(backend)
+
+
+def run(args) -> dict:
+    room = Room(args.users, args.tasks, args.seed)
+    readers = room.users[:args.readers] if args.readers else room.users
+    results = {}
+    if args.tracemalloc:
+        tracemalloc.start()
+    t_start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        store = make_store(args.backend, args.latency, directory)
+        ledger = TokenLedger(store.ref, TOKENS_CONFIG) if hasattr(store, 'ref') else None
+
+        results['login'] = run_phase(
+            store, [[lambda u=u: store.ensure_user(u, u, TOKENS_CONFIG)] for u in room.users], args.concurrency)
+
+        # Une session par participant : ses clics sont successifs, les participants votent en même temps
+        results['vote'] = run_phase(store, [
+            [vote_op(store, room, u, task)
+             for task in room.rngs[u].sample(room.tasks, min(args.votes_per_user, len(room.tasks)))]
+            for u in room.users], args.concurrency)
+
+        def corrections(use_ledger):
+            return [[correction_op(store, room, u, task_key, ledger if use_ledger else None)
+                     for task_key in sorted(room.scores[u])[:args.corrections_per_user]]
+                    for u in room.users]
+
+        results['correction'] = run_phase(store, corrections(False), args.concurrency)
+        if ledger is not None:
+            results['correction_ledger'] = run_phase(store, corrections(True), args.concurrency)
+
+        snapshots = []
+        results['load_snapshot'] = run_phase(
+            store, [[lambda: snapshots.append(store.load_snapshot())] for _ in readers], args.concurrency)
+
+        if hasattr(store, 'ref'):
+            shared = SharedSnapshotCache()
+            shared.refresh(store.ref, max_age=0)
+            results['shared_refresh'] = run_phase(
+                store, [[lambda: shared.refresh(store.ref)] for _ in readers], args.concurrency)
+            # Table tenue à jour par le snapshot partagé (mode cloud)
+            table = shared.snapshot.vote_table
+        else:
+            # Mode local : table construite à chaque rechargement (cf. refresh_live_data)
+            table = VoteTable.build(snapshots[-1].votes)
+
+        positions = key_positions(room.tasks)
+        results['ranking'] = run_phase(
+            store, [[lambda: ranking(table, room.tasks, positions)] for _ in readers], args.concurrency)
+
+        expected = sum(len(s) for s in room.scores.values())
+        consistent = len(table) == expected
+        if hasattr(store, 'backend'):
+            store.backend.close()
+    peak = None
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'config': {k: v for k, v in vars(args).items() if k not in ('save', 'baseline', 'tolerance', 'time_tolerance', 'min_delta_ms')},
+        'actions': results,
+        'peak_memory_kb': round(peak / 1024, 1) if peak is not None else None,
+        'wall_s': round(time.perf_counter() - t_start, 3),
+        'consistent': consistent,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float, time_tolerance: float = 1.0,
+            min_delta_ms: float = 5.0) -> list:
+    """Régressions : métrique supérieure à la référence de plus de ``tolerance`` (relatif),
+    ``time_tolerance`` pour les temps. Les écarts de temps sous ``min_delta_ms`` sont ignorés."""
+    regressions = []
+    if baseline.get('config') != report['config']:
+        regressions.append(f"configuration différente de la référence : {baseline.get('config')}")
+    for action, stats in report['actions'].items():
+        ref = baseline.get('actions', {}).get(action)
+        if not ref:
+            continue
+        for metric in COMPARED:
+            old, new = ref.get(metric, 0), stats.get(metric, 0)
+            limit = tolerance
+            if metric.endswith('_ms'):
+                if new - old < min_delta_ms:
+                    continue
+                limit = time_tolerance
+            if old and new > old * (1 + limit):
+                regressions.append(f"{action}.{metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f} %)")
+    old_peak = baseline.get('peak_memory_kb')
+    new_peak = report['peak_memory_kb']
+    if old_peak and new_peak and new_peak > old_peak * (1 + tolerance):
+        regressions.append(f"peak_memory_kb: {old_peak} -> {new_peak}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=('memory', 'sqlite', 'journal'), default='memory')
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--tasks', type=int, default=60)
+    parser.add_argument('--votes-per-user', type=int, default=10)
+    parser.add_argument('--corrections-per-user', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=50, help="sessions qui rechargent/classent (0 = toutes)")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.005, help="latence simulée (s) par aller-retour (memory)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false',
+                        help="ne pas mesurer le pic mémoire (temps non faussés par tracemalloc)")
+    parser.add_argument('--save', help="écrit le rapport JSON (référence)")
+    parser.add_argument('--baseline', help="rapport JSON de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--time-tolerance', type=float, default=1.0,
+                        help="écart relatif toléré sur les temps (bruités sous contention)")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{args.users} participants, {args.tasks} tâches, backend {args.backend}, "
+          f"{args.concurrency} sessions simultanées, latence {args.latency * 1000:.1f} ms")
+    print(f"  {'action':<18} {'ops':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'a/r/op':>7} {'octets/op':>10} {'err':>4}")
+    for action, s in report['actions'].items():
+        print(f"  {action:<18} {s['ops']:>6} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} "
+              f"{s['round_trips_per_op']:>7} {s['bytes_per_op']:>10} {s['errors']:>4}")
+    peak = f"{report['peak_memory_kb']} Ko" if report['peak_memory_kb'] is not None else "n/d"
+    print(f"  pic mémoire {peak}, durée {report['wall_s']} s, "
+          f"votes cohérents : {'oui' if report['consistent'] else 'NON'}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.time_tolerance, args.min_delta_ms)
+        if regressions:
+            print("Régressions par rapport à la référence :")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Aucune régression par rapport à la référence.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Temps jusqu'au premier affichage de l'application, à froid et à chaud.
+
+Chaque mesure « à froid » tourne dans un nouveau processus Python : imports de
+l'application, initialisation des ressources partagées (``st.cache_resource``),
+lecture du CSV et premier rendu complet (``AppTest``). La mesure « à chaud »
+est une seconde session dans le même processus : caches déjà remplis.
+
+Le mode cloud utilise ``FakeRTDB`` (latence simulée par aller-retour) à la
+place de la Realtime Database. La liste des modules lourds effectivement
+importés est indiquée (``firebase_admin`` ne doit pas l'être en mode local).
+
+Usage : python -m benchmarks.startup_time [--runs 3] [--cloud] [--latency 0.05] [--users 100]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'streamlit_cloud_app.py')
+CSV = os.path.join(ROOT, 'Evaluation_Taches_SPRING - Copie.csv')
+HEAVY_MODULES = ('firebase_admin', 'plotly', 'pandas', 'numpy')
+
+_PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_import = time.perf_counter() - t0
+config = json.loads(sys.argv[1])
+if config['cloud']:
+    import firebase_admin
+    from firebase_admin import db
+    from benchmarks.bench_live_sync import build_room
+    fake = build_room(config['users'], 60)
+    fake.latency = config['latency']
+    firebase_admin._apps['[DEFAULT]'] = object()
+    db.reference = lambda *a, **k: fake.reference()
+preloaded = {m for m in config['heavy'] if m in sys.modules}
+
+def first_render():
+    at = AppTest.from_file(config['app'], default_timeout=120)
+    if config['cloud']:
+        at.secrets['firebase'] = {'database_url': 'fake'}
+    t = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise SystemExit(str(at.exception))
+    return time.perf_counter() - t
+
+cold = first_render()
+warm = first_render()
+print(json.dumps({
+    'import_streamlit_ms': t_import * 1000, 'cold_ms': cold * 1000, 'warm_ms': warm * 1000,
+    'imported': sorted(m for m in config['heavy'] if m in sys.modules and m not in preloaded),
+}))
+'''
+
+
+def probe(config: dict) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        # Dossier de travail neuf : pas de base locale ni de cache d'une mesure précédente
+        shutil.copy(CSV, workdir)
+        os.makedirs(os.path.join(workdir, '.streamlit'))
+        with open(os.path.join(workdir, '.streamlit', 'secrets.toml'), 'w', encoding='utf-8') as f:
+            f.write('ADMIN_PASSWORD = "admin"\n')
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        out = subprocess.run([sys.executable, '-c', _PROBE, json.dumps(config)], cwd=workdir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--cloud', action='store_true', help="mode cloud sur FakeRTDB")
+    parser.add_argument('--latency', type=float, default=0.05, help="latence simulée (s) par aller-retour")
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    config = {'app': APP, 'cloud': args.cloud, 'latency': args.latency, 'users': args.users,
+              'heavy': list(HEAVY_MODULES)}
+    results = [probe(config) for _ in range(args.runs)]
+    print(f"mode {'cloud (FakeRTDB)' if args.cloud else 'local'}, {args.runs} processus")
+    for key in ('import_streamlit_ms', 'cold_ms', 'warm_ms'):
+        values = [r[key] for r in results]
+        print(f"  {key:<20} médiane {statistics.median(values):9.1f}  min {min(values):9.1f}  max {max(values):9.1f}")
+    print(f"  modules lourds importés par l'application : {', '.join(results[0]['imported']) or 'aucun'}")
+
+
+if __name__ == '__main__':
+    main()
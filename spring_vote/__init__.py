@@ -0,0 +1 @@
+"""Briques réutilisables du système de vote SPRING (hors interface Streamlit)."""
@@ -0,0 +1,174 @@
+"""Compteurs de votes par clé de tâche.
+
+Côté serveur, chaque écriture de vote maintient des compteurs
+``aggregates/{task_key}`` = ``{sum, count, histogram: {1..5}}`` par incréments
+atomiques (ServerValue ``increment``) dans le même ``update`` multi-chemins que
+le vote : le classement (``leaderboard_from_counters``) se calcule alors sur ce
+petit nœud au lieu de la table de votes.
+``server_aggregates_from_votes`` recalcule ces compteurs depuis les votes bruts
+(réparation / initialisation des données existantes). Les votes écrits avant
+les compteurs n'y figurent pas : tant que ``rebuild_server_aggregates`` n'a
+pas été exécuté (marqueur ``aggregates_complete``), le classement reste
+calculé sur les votes.
+"""
+from collections import Counter
+from datetime import datetime
+
+from spring_vote.vote_utils import flatten_user_votes
+
+SCORES = (1, 2, 3, 4, 5)
+AGGREGATES_ROOT = 'aggregates'
+AGGREGATES_COMPLETE = 'aggregates_complete'
+
+
+class TaskAggregate:
+    """Total d'étoiles, nombre de votes, histogramme des notes et votants d'une tâche."""
+
+    __slots__ = ('total_stars', 'num_votes', 'histogram', 'voters')
+
+    def __init__(self):
+        self.total_stars = 0
+        self.num_votes = 0
+        self.histogram = [0] * len(SCORES)
+        self.voters = set()
+
+    @property
+    def avg_score(self) -> float:
+        return self.total_stars / self.num_votes if self.num_votes > 0 else 0
+
+    def add(self, user_id: str, vote):
+        self.num_votes += 1
+        self.voters.add(user_id)
+        if isinstance(vote, dict):
+            score = vote.get('score', 0)
+            self.total_stars += score
+            if score in SCORES:
+                self.histogram[score - 1] += 1
+
+    def merge(self, other: 'TaskAggregate'):
+        self.total_stars += other.total_stars
+        self.num_votes += other.num_votes
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        self.voters |= other.voters
+
+    @classmethod
+    def from_task_votes(cls, task_votes: dict) -> 'TaskAggregate':
+        agg = cls()
+        for user_id, user_votes in (task_votes or {}).items():
+            for vote in flatten_user_votes(user_votes):
+                agg.add(user_id, vote)
+        return agg
+
+
+def _histogram_from_node(raw) -> dict:
+    # La RTDB renvoie un objet à clés 1..5 sous forme de liste (index 0 vide)
+    if isinstance(raw, list):
+        return {i: v or 0 for i, v in enumerate(raw) if i in SCORES}
+    if isinstance(raw, dict):
+        return {int(k): v or 0 for k, v in raw.items() if str(k).isdigit() and int(k) in SCORES}
+    return {}
+
+
+def _increment(delta):
+    return {'.sv': {'increment': delta}}
+
+
+def counter_values(raw) -> tuple:
+    """``(somme, nombre, [nombre de notes 1..5])`` d'un nœud ``aggregates/{task_key}`` (zéros si absent)."""
+    if not isinstance(raw, dict):
+        return 0, 0, [0] * len(SCORES)
+    hist = _histogram_from_node(raw.get('histogram'))
+    return raw.get('sum') or 0, raw.get('count') or 0, [hist.get(s, 0) for s in SCORES]
+
+
+def total_count(node: dict) -> int:
+    """Nombre total de votes d'après les compteurs."""
+    return sum(counter_values(raw)[1] for raw in (node or {}).values())
+
+
+def apply_counter_updates(node: dict, updates: dict) -> dict:
+    """Copie de ``node`` où les incréments ``aggregates/...`` de ``updates`` sont appliqués
+    (mise à jour locale d'un vote déjà écrit, sans relire les compteurs)."""
+    node = dict(node or {})
+    prefix = f'{AGGREGATES_ROOT}/'
+    touched = {}
+    for path, value in updates.items():
+        if not path.startswith(prefix) or not isinstance(value, dict) or '.sv' not in value:
+            continue
+        task_key, _, field = path[len(prefix):].partition('/')
+        if task_key not in touched:
+            total, count, hist = counter_values(node.get(task_key))
+            touched[task_key] = {'sum': total, 'count': count,
+                                 'histogram': {str(s): n for s, n in zip(SCORES, hist) if n}}
+        counters = touched[task_key]
+        delta = value['.sv'].get('increment', 0)
+        if field.startswith('histogram/'):
+            score = field.partition('/')[2]
+            counters['histogram'][score] = counters['histogram'].get(score, 0) + delta
+        else:
+            counters[field] = counters.get(field, 0) + delta
+    for task_key, counters in touched.items():
+        node[task_key] = counters
+    return node
+
+
+def aggregate_delta_updates(task_key: str, added_scores=(), removed_scores=()) -> dict:
+    """Chemins ``aggregates/...`` à fusionner dans l'``update`` qui ajoute/supprime ces votes."""
+    added = [s for s in added_scores if s is not None]
+    removed = [s for s in removed_scores if s is not None]
+    base = f'{AGGREGATES_ROOT}/{task_key}'
+    updates = {}
+    sum_delta = sum(added) - sum(removed)
+    count_delta = len(added) - len(removed)
+    if sum_delta:
+        updates[f'{base}/sum'] = _increment(sum_delta)
+    if count_delta:
+        updates[f'{base}/count'] = _increment(count_delta)
+    hist = Counter(s for s in added if s in SCORES)
+    hist.subtract(s for s in removed if s in SCORES)
+    for score, delta in sorted(hist.items()):
+        if delta:
+            updates[f'{base}/histogram/{score}'] = _increment(delta)
+    return updates
+
+
+def server_aggregates_from_votes(votes: dict) -> dict:
+    """Recalcule le nœud ``aggregates`` complet à partir des votes bruts."""
+    node = {}
+    for task_key, task_votes in (votes or {}).items():
+        agg = TaskAggregate.from_task_votes(task_votes)
+        if agg.num_votes:
+            node[task_key] = {
+                'sum': agg.total_stars,
+                'count': agg.num_votes,
+                'histogram': {str(score): n for score, n in zip(SCORES, agg.histogram) if n},
+            }
+    return node
+
+
+def aggregate_drift(expected: dict, current: dict) -> list:
+    """Clés de tâches dont les compteurs serveur diffèrent des compteurs recalculés."""
+    def normalized(raw):
+        if not isinstance(raw, dict):
+            return None
+        hist = _histogram_from_node(raw.get('histogram'))
+        return (raw.get('sum') or 0, raw.get('count') or 0, tuple(hist.get(s, 0) for s in SCORES))
+
+    empty = (0, 0, (0,) * len(SCORES))
+    drifted = []
+    for task_key in sorted(set(expected or {}) | set(current or {})):
+        a = normalized((expected or {}).get(task_key)) or empty
+        b = normalized((current or {}).get(task_key)) or empty
+        if a != b:
+            drifted.append(task_key)
+    return drifted
+
+
+def rebuild_server_aggregates(firebase_ref) -> dict:
+    """Relit tous les votes et réécrit ``aggregates`` et son marqueur de complétude en une seule écriture.
+    Retourne le nouveau nœud."""
+    node = server_aggregates_from_votes(firebase_ref.child('votes').get() or {})
+    stamp = datetime.now().isoformat()
+    # last_updated sans marqueur sync/ : les clients rechargent tout et lisent les nouveaux compteurs
+    firebase_ref.update({AGGREGATES_ROOT: node, AGGREGATES_COMPLETE: stamp, 'last_updated': stamp})
+    return node
@@ -0,0 +1,138 @@
+"""Lecture du CSV des tâches évaluées : schéma typé, validation et snapshot binaire.
+
+Le CSV est exporté d'Excel (séparateur ``;``, décimales ``,``), en cp1252 ou
+en UTF-8 selon le poste. Les en-têtes sont reconnus sans tenir compte des
+accents ni de la casse (``Score_Complexité`` == ``Score_Complexite``) puis
+renommés selon ``CSV_SCHEMA`` : les noms de colonnes ne dépendent plus de
+l'encodage du fichier.
+
+Le résultat est conservé dans ``.spring_cache/`` sous forme de pickle,
+indexé par l'empreinte SHA-256 du fichier. Tant que le fichier garde la même
+date de modification et la même taille, le snapshot est relu sans même
+recalculer l'empreinte ; un fichier modifié puis restauré retrouve son
+snapshot.
+"""
+import hashlib
+import io
+import json
+import os
+import unicodedata
+
+import pandas as pd
+
+from spring_vote.task_catalog import file_version
+
+DEFAULT_CACHE_DIR = '.spring_cache'
+# À incrémenter si le schéma ou le traitement change (invalide les snapshots existants)
+SCHEMA_VERSION = 1
+ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+# Colonne -> (type, obligatoire)
+CSV_SCHEMA = {
+    'Nouveau_Nom': (str, True),
+    'Description': (str, False),
+    'Cout': ('float64', False),
+    "Complexité_Niveau de modification sur l'installation": ('float64', False),
+    'Complexité_Temps de mise en œuvre': ('float64', False),
+    'Complexité_Compétences externes nécessaires': ('float64', False),
+    'Complexité_Intégration logicielle / automatisme': ('float64', False),
+    'Complexité_Encombrement physique': ('float64', False),
+    'Intérêt_Sécurité accrue': ('float64', False),
+    'Intérêt_Fiabilité / MTBF': ('float64', False),
+    'Intérêt_Ergonomie opérateur/Data': ('float64', False),
+    'Intérêt spring': ('float64', False),
+    'Score_Prix': ('float64', True),
+    'Score_Complexité': ('float64', True),
+    'Score_Intérêt': ('float64', True),
+    'Score_Total': ('float64', True),
+    'Ancien_Nom_CSV': (str, False),
+}
+
+
+class CsvSchemaError(ValueError):
+    """Le CSV ne respecte pas ``CSV_SCHEMA`` (colonne manquante, valeur non numérique)."""
+
+
+def column_id(name: str) -> str:
+    """Nom de colonne comparable quel que soit l'encodage : sans accents, ligatures ni casse."""
+    text = unicodedata.normalize('NFKD', str(name).replace('œ', 'oe').replace('Œ', 'OE'))
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold().strip()
+
+
+_SCHEMA_IDS = {column_id(name): name for name in CSV_SCHEMA}
+
+
+def decode_csv(raw: bytes) -> str:
+    for encoding in ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise CsvSchemaError("Encodage du CSV non reconnu")
+
+
+def parse_tasks_csv(raw: bytes) -> pd.DataFrame:
+    """Parse et valide le contenu du CSV ; colonnes renommées et typées selon ``CSV_SCHEMA``."""
+    text = decode_csv(raw)
+    header = pd.read_csv(io.StringIO(text), sep=';', nrows=0).columns
+    renames = {col: _SCHEMA_IDS[column_id(col)] for col in header if column_id(col) in _SCHEMA_IDS}
+    missing = [name for name, (_, required) in CSV_SCHEMA.items() if required and name not in renames.values()]
+    if missing:
+        raise CsvSchemaError(f"Colonnes manquantes dans le CSV : {', '.join(missing)}")
+
+    dtypes = {col: CSV_SCHEMA[name][0] for col, name in renames.items()}
+    try:
+        df = pd.read_csv(io.StringIO(text), sep=';', decimal=',', dtype=dtypes)
+    except ValueError as e:
+        raise CsvSchemaError(f"Valeur invalide dans le CSV : {e}") from e
+    df = df.rename(columns=renames)
+    # Lignes vides en fin d'export Excel
+    return df[df['Nouveau_Nom'].notna() & (df['Nouveau_Nom'].str.strip() != '')].reset_index(drop=True)
+
+
+def read_tasks_csv(path: str) -> pd.DataFrame:
+    with open(path, 'rb') as f:
+        return parse_tasks_csv(f.read())
+
+
+def _snapshot_key(raw: bytes) -> str:
+    return hashlib.sha256(raw + f'schema{SCHEMA_VERSION}'.encode()).hexdigest()
+
+
+def load_tasks_csv(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """CSV des tâches, relu depuis le snapshot binaire quand le fichier n'a pas changé.
+    Le cache est facultatif : en cas d'erreur d'écriture le CSV est simplement parsé."""
+    version = file_version(path)
+    meta_path = os.path.join(cache_dir, os.path.basename(path) + '.json')
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') == list(version or ()) and meta.get('schema') == SCHEMA_VERSION:
+            return pd.read_pickle(os.path.join(cache_dir, meta['key'] + '.pkl'))
+    except Exception:
+        # Pas de snapshot, ou snapshot illisible : on repart du fichier
+        pass
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    key = _snapshot_key(raw)
+    snapshot_path = os.path.join(cache_dir, key + '.pkl')
+    try:
+        df = pd.read_pickle(snapshot_path)
+    except Exception:
+        df = parse_tasks_csv(raw)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = snapshot_path + '.tmp'
+            df.to_pickle(tmp)
+            os.replace(tmp, snapshot_path)
+        except OSError:
+            return df
+    try:
+        tmp = meta_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': list(version or ()), 'schema': SCHEMA_VERSION, 'key': key}, f)
+        os.replace(tmp, meta_path)
+    except OSError:
+        pass
+    return df
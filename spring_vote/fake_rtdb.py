@@ -0,0 +1,272 @@
+"""Stand-in local de la Realtime Database Firebase.
+
+Reproduit le sous-ensemble de ``firebase_admin.db.Reference`` utilisé par
+l'application (``child``, ``get``, ``set``, ``update``, ``push``, ``delete``,
+``transaction``, ``listen``) sur un arbre en mémoire, et comptabilise les
+appels et les octets échangés pour pouvoir tester et mesurer la logique de
+synchronisation sans connexion au cloud.
+
+``latency`` ajoute un délai (en secondes) à chaque aller-retour simulé. Les
+transactions sont optimistes comme dans firebase-admin : lecture, calcul hors
+verrou, écriture conditionnelle, nouvelle tentative si la valeur a changé
+entre-temps (au plus ``TRANSACTION_MAX_RETRIES`` fois).
+"""
+import copy
+import json
+import threading
+import time
+from collections import Counter
+
+TRANSACTION_MAX_RETRIES = 25
+
+
+class TransactionAbortedError(Exception):
+    """Même rôle que ``firebase_admin.db.TransactionAbortedError``."""
+
+
+def payload_size(value) -> int:
+    """Taille approximative (en octets) de la charge JSON échangée avec la base."""
+    if value is None:
+        return 0
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _split(path) -> list:
+    if isinstance(path, (list, tuple)):
+        return [p for p in path if p]
+    return [p for p in str(path).split('/') if p]
+
+
+def _prune(value):
+    """Applique la sémantique RTDB : ni None ni dictionnaire vide ne sont stockés."""
+    if isinstance(value, dict):
+        pruned = {}
+        for k, v in value.items():
+            v = _prune(v)
+            if v is not None:
+                pruned[str(k)] = v
+        return pruned or None
+    return value
+
+
+class FakeEvent:
+    """Même interface que ``firebase_admin.db.Event``."""
+
+    def __init__(self, event_type: str, path: str, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class FakeListenerRegistration:
+    """Même interface que ``firebase_admin.db.ListenerRegistration``."""
+
+    def __init__(self, db: 'FakeRTDB', entry):
+        self._db = db
+        self._entry = entry
+
+    def close(self):
+        with self._db._lock:
+            if self._entry in self._db._listeners:
+                self._db._listeners.remove(self._entry)
+
+
+class FakeRTDB:
+    """Base en mémoire, thread-safe, avec compteurs d'appels et de volume."""
+
+    def __init__(self, data: dict = None, latency: float = 0.0):
+        self._root = _prune(copy.deepcopy(data or {})) or {}
+        self.latency = latency
+        self._lock = threading.RLock()
+        self._push_counter = 0
+        self._listeners = []
+        self.calls = Counter()
+        self.bytes_down = 0
+        self.bytes_up = 0
+        self.transaction_retries = 0
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reference(self, path: str = '/') -> 'FakeReference':
+        return FakeReference(self, _split(path))
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes_down = 0
+            self.bytes_up = 0
+            self.transaction_retries = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'round_trips': sum(self.calls.values()),
+                'bytes_down': self.bytes_down,
+                'bytes_up': self.bytes_up,
+                'transaction_retries': self.transaction_retries,
+            }
+
+    # ---- Accès bas niveau à l'arbre (sous verrou) ----
+    def _read(self, segments: list):
+        node = self._root
+        for seg in segments:
+            if not isinstance(node, dict) or seg not in node:
+                return None
+            node = node[seg]
+        return node
+
+    def _write(self, segments: list, value):
+        self._store(segments, value)
+        self._notify(segments)
+
+    def _notify(self, segments: list):
+        # Les écouteurs sont appelés de façon synchrone, dans le thread de l'écrivain
+        for listen_segments, callback in list(self._listeners):
+            depth = len(listen_segments)
+            if segments[:depth] == listen_segments:
+                rel = segments[depth:]
+            elif listen_segments[:len(segments)] == segments:
+                rel = []
+            else:
+                continue
+            data = copy.deepcopy(self._read(listen_segments + rel))
+            callback(FakeEvent('put', '/' + '/'.join(rel), data))
+
+    def _resolve_server_values(self, segments: list, value):
+        """Remplace les ServerValue ({'.sv': ...}) comme le ferait le serveur."""
+        if isinstance(value, dict):
+            sv = value.get('.sv') if len(value) == 1 else None
+            if isinstance(sv, dict) and 'increment' in sv:
+                current = self._read(segments)
+                base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+                return base + sv['increment']
+            if sv == 'timestamp':
+                return int(time.time() * 1000)
+            return {k: self._resolve_server_values(segments + [str(k)], v) for k, v in value.items()}
+        return value
+
+    def _store(self, segments: list, value):
+        value = _prune(self._resolve_server_values(segments, copy.deepcopy(value)))
+        if not segments:
+            self._root = value or {}
+            return
+        parents = [self._root]
+        node = self._root
+        for seg in segments[:-1]:
+            nxt = node.get(seg)
+            if not isinstance(nxt, dict):
+                if value is None:
+                    return
+                nxt = {}
+                node[seg] = nxt
+            node = nxt
+            parents.append(node)
+        if value is None:
+            node.pop(segments[-1], None)
+            # Supprimer les parents devenus vides
+            for depth in range(len(segments) - 1, 0, -1):
+                if parents[depth]:
+                    break
+                parents[depth - 1].pop(segments[depth - 1], None)
+        else:
+            node[segments[-1]] = value
+
+    def _next_push_id(self) -> str:
+        self._push_counter += 1
+        return f"-fake{time.time_ns():020d}{self._push_counter:06d}"
+
+
+class FakeReference:
+    """Équivalent local de ``firebase_admin.db.Reference``."""
+
+    def __init__(self, db: FakeRTDB, segments: list):
+        self._db = db
+        self._segments = list(segments)
+
+    @property
+    def key(self):
+        return self._segments[-1] if self._segments else None
+
+    @property
+    def path(self) -> str:
+        return '/' + '/'.join(self._segments)
+
+    def child(self, path: str) -> 'FakeReference':
+        return FakeReference(self._db, self._segments + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        self._db._round_trip()
+        with self._db._lock:
+            self._db.calls['get'] += 1
+            value = self._db._read(self._segments)
+            if shallow and isinstance(value, dict):
+                value = {k: True for k in value}
+            else:
+                value = copy.deepcopy(value)
+            self._db.bytes_down += payload_size(value)
+        return value
+
+    def set(self, value):
+        self._db._round_trip()
+        with self._db._lock:
+            self._db.calls['set'] += 1
+            self._db.bytes_up += payload_size(value)
+            self._db._write(self._segments, value)
+
+    def update(self, value: dict):
+        if not isinstance(value, dict) or not value:
+            raise ValueError('Dictionary must not be empty')
+        self._db._round_trip()
+        with self._db._lock:
+            self._db.calls['update'] += 1
+            self._db.bytes_up += payload_size(value)
+            for path, sub in value.items():
+                self._db._write(self._segments + _split(path), sub)
+
+    def push(self, value='') -> 'FakeReference':
+        self._db._round_trip()
+        with self._db._lock:
+            self._db.calls['push'] += 1
+            self._db.bytes_up += payload_size(value)
+            ref = self.child(self._db._next_push_id())
+            self._db._write(ref._segments, value)
+        return ref
+
+    def delete(self):
+        self._db._round_trip()
+        with self._db._lock:
+            self._db.calls['delete'] += 1
+            self._db._write(self._segments, None)
+
+    def transaction(self, transaction_update):
+        # Lecture initiale (avec ETag dans firebase-admin)
+        self._db._round_trip()
+        with self._db._lock:
+            self._db.calls['transaction'] += 1
+            current = copy.deepcopy(self._db._read(self._segments))
+            self._db.bytes_down += payload_size(current)
+        for attempt in range(TRANSACTION_MAX_RETRIES):
+            new_value = transaction_update(copy.deepcopy(current))
+            # Écriture conditionnelle : échoue si la valeur a changé depuis la lecture
+            self._db._round_trip()
+            with self._db._lock:
+                self._db.bytes_up += payload_size(new_value)
+                latest = self._db._read(self._segments)
+                if latest == current:
+                    self._db._write(self._segments, new_value)
+                    return copy.deepcopy(new_value)
+                self._db.transaction_retries += 1
+                current = copy.deepcopy(latest)
+                self._db.bytes_down += payload_size(current)
+        raise TransactionAbortedError('Transaction aborted after failed retries.')
+
+    def listen(self, callback) -> FakeListenerRegistration:
+        """Appelle ``callback`` avec un événement initial puis à chaque écriture sous ce nœud."""
+        with self._db._lock:
+            entry = (list(self._segments), callback)
+            self._db._listeners.append(entry)
+            callback(FakeEvent('put', '/', copy.deepcopy(self._db._read(self._segments))))
+        return FakeListenerRegistration(self._db, entry)
@@ -0,0 +1,38 @@
+"""Initialisation de firebase-admin hors de Streamlit (outils en ligne de commande)."""
+
+
+def credentials_dict(firebase_secrets) -> dict:
+    """Dictionnaire de credentials du compte de service à partir de la section [firebase] des secrets."""
+    return {
+        "type": firebase_secrets["type"],
+        "project_id": firebase_secrets["project_id"],
+        "private_key_id": firebase_secrets["private_key_id"],
+        "private_key": firebase_secrets["private_key"].replace('\\n', '\n'),
+        "client_email": firebase_secrets["client_email"],
+        "client_id": firebase_secrets["client_id"],
+        "auth_uri": firebase_secrets["auth_uri"],
+        "token_uri": firebase_secrets["token_uri"],
+        "auth_provider_x509_cert_url": firebase_secrets["auth_provider_x509_cert_url"],
+        "client_x509_cert_url": firebase_secrets["client_x509_cert_url"]
+    }
+
+
+def init_from_secrets_file(path: str = '.streamlit/secrets.toml'):
+    """Initialise firebase-admin à partir du fichier de secrets Streamlit et retourne la référence racine."""
+    import firebase_admin
+    from firebase_admin import credentials
+    from firebase_admin import db
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        # Python < 3.11
+        import tomli as tomllib
+
+    with open(path, 'rb') as f:
+        firebase_secrets = tomllib.load(f)["firebase"]
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(credentials_dict(firebase_secrets))
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': firebase_secrets["database_url"]
+        })
+    return db.reference()
@@ -0,0 +1,235 @@
+"""Stockage local journalisé (mode hors cloud).
+
+Au lieu de réécrire les trois fichiers JSON à chaque vote, chaque mutation est
+ajoutée sur une ligne compacte d'un journal (write-ahead log) :
+
+    {"ts": "...", "set": [[["votes", task_key, user_id], [...]], [["users", user_id], {...}]]}
+
+Chaque entrée ``[chemin, valeur]`` remplace (ou supprime si la valeur est
+``null``) le nœud désigné ; rejouer une ligne deux fois donne le même état. Les
+tâches proposées sont indexées par id sous ``additional_tasks``.
+
+Le journal est vidé vers l'OS à chaque écriture et synchronisé sur disque
+(fsync) par lots. Toutes les ``compact_every`` mutations, l'état est réécrit
+dans les fichiers JSON habituels (snapshot, remplacement atomique), avec un
+nombre borné de sauvegardes, puis le journal est tronqué. Au chargement :
+snapshot + relecture de la fin du journal.
+"""
+import atexit
+import copy
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from spring_vote.token_ledger import apply_deltas
+from spring_vote.user_votes import index_entry
+
+SNAPSHOT_FILES = {
+    'votes': "votes_spring_meeting.json",
+    'users': "users_spring_meeting.json",
+    'additional_tasks': "tasks_spring_meeting.json",
+}
+JOURNAL_FILE = "spring_meeting.journal"
+
+
+def _tasks_by_id(raw) -> dict:
+    if isinstance(raw, dict):
+        return dict(raw)
+    tasks = {}
+    for i, task in enumerate(raw or []):
+        if isinstance(task, dict):
+            tasks[str(task.get('id', i))] = task
+    return tasks
+
+
+def _set_path(root: dict, path: list, value):
+    node = root
+    for seg in path[:-1]:
+        nxt = node.get(seg)
+        if not isinstance(nxt, dict):
+            if value is None:
+                return
+            nxt = {}
+            node[seg] = nxt
+        node = nxt
+    if value is None:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = value
+
+
+class JournalStore:
+    """Snapshot JSON + journal d'ajouts, partagé par les sessions d'un processus."""
+
+    def __init__(self, directory: str = '.', fsync_every: int = 16, fsync_interval: float = 1.0,
+                 compact_every: int = 500, keep_backups: int = 3):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.keep_backups = keep_backups
+        self._lock = threading.RLock()
+        self._state = None
+        self._journal = None
+        self._records_since_compaction = 0
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        atexit.register(self.close)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # ---- Chargement ----
+    def _load_snapshot(self) -> dict:
+        state = {'votes': {}, 'users': {}, 'additional_tasks': {}}
+        for area, filename in SNAPSHOT_FILES.items():
+            path = self._path(filename)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                state[area] = _tasks_by_id(data) if area == 'additional_tasks' else (data or {})
+        return state
+
+    def _replay_journal(self, state: dict) -> int:
+        path = self._path(JOURNAL_FILE)
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        good_offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dernière ligne incomplète (arrêt brutal pendant l'écriture) : on l'ignore
+                    break
+                self._apply_record(state, record)
+                good_offset += len(line)
+                count += 1
+        if good_offset < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+        return count
+
+    def _ensure_loaded(self):
+        if self._state is None:
+            state = self._load_snapshot()
+            self._records_since_compaction = self._replay_journal(state)
+            self._state = state
+
+    def load(self):
+        """Retourne ``(votes, users, additional_tasks)`` : copies indépendantes pour la session."""
+        with self._lock:
+            self._ensure_loaded()
+            votes = copy.deepcopy(self._state['votes'])
+            users = copy.deepcopy(self._state['users'])
+            additional_tasks = copy.deepcopy(list(self._state['additional_tasks'].values()))
+        return votes, users, additional_tasks
+
+    def user(self, user_id: str):
+        """Enregistrement d'un utilisateur (copie), ou None."""
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._state['users'].get(user_id))
+
+    def user_votes(self, user_id: str) -> dict:
+        """Votes d'un utilisateur ``{task_key: {vote_id, score}}`` (parcours en mémoire, sans copie)."""
+        with self._lock:
+            self._ensure_loaded()
+            found = {}
+            for task_key, task_votes in self._state['votes'].items():
+                entry = index_entry((task_votes or {}).get(user_id))
+                if entry is not None:
+                    found[task_key] = entry
+            return found
+
+    # ---- Écriture ----
+    @staticmethod
+    def _apply_record(state: dict, record: dict):
+        for path, value in record.get('set', []):
+            if path and path[0] in state:
+                _set_path(state, [str(p) for p in path], value)
+
+    def apply(self, changes, token_deltas: dict = None) -> dict:
+        """Journalise et applique une mutation : liste de ``(chemin, valeur)``, valeur None = suppression.
+        ``token_deltas`` ``{user_id: {type de vote: variation}}`` est appliqué aux tokens actuels sous le même
+        verrou (``InsufficientTokens`` : rien n'est écrit). Retourne les nouveaux tokens par utilisateur."""
+        with self._lock:
+            self._ensure_loaded()
+            tokens = {user_id: apply_deltas((self._state['users'].get(user_id) or {}).get('tokens'), deltas)
+                      for user_id, deltas in (token_deltas or {}).items()}
+            # Tokens journalisés en valeur absolue : rejouer la ligne reste idempotent
+            changes = [*changes, *((('users', user_id, 'tokens'), t) for user_id, t in tokens.items())]
+            record = {
+                'ts': datetime.now().isoformat(),
+                'set': [[list(path), value] for path, value in changes],
+            }
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            if self._journal is None:
+                self._journal = open(self._path(JOURNAL_FILE), 'a', encoding='utf-8')
+            self._journal.write(line)
+            self._journal.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+            self._apply_record(self._state, record)
+            self._records_since_compaction += 1
+            if self._records_since_compaction >= self.compact_every:
+                self.compact()
+        return tokens
+
+    def _fsync(self):
+        if self._journal is not None and self._unsynced:
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._fsync()
+
+    # ---- Compaction ----
+    def compact(self):
+        """Réécrit l'état complet dans les fichiers JSON puis tronque le journal."""
+        with self._lock:
+            self._ensure_loaded()
+            self._fsync()
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            for area, filename in SNAPSHOT_FILES.items():
+                data = self._state[area]
+                if area == 'additional_tasks':
+                    data = list(data.values())
+                path = self._path(filename)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(path) and self.keep_backups > 0:
+                    shutil.copy2(path, f"{path}.backup_{timestamp}")
+                os.replace(tmp_path, path)
+                self._prune_backups(path)
+            # Le snapshot contient tout le journal : on repart d'un journal vide
+            if self._journal is not None:
+                self._journal.close()
+            self._journal = open(self._path(JOURNAL_FILE), 'w', encoding='utf-8')
+            self._records_since_compaction = 0
+
+    def _prune_backups(self, path: str):
+        backups = sorted(glob.glob(glob.escape(path) + '.backup_*'))
+        for old in backups[:max(0, len(backups) - self.keep_backups)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._fsync()
+                self._journal.close()
+                self._journal = None
@@ -0,0 +1,225 @@
+"""Classement vectorisé : table de votes en colonnes et agrégations groupées.
+
+Le snapshot de votes (``votes/{task_key}/{user_id}/...``) est aplati une seule
+fois en une ``VoteTable`` compacte : clés de tâches et identifiants
+d'utilisateurs internés (un code entier par valeur distincte), notes en
+``int8`` et horodatages en ``datetime64[us]``, soit une quinzaine d'octets par
+vote au lieu de plusieurs centaines pour l'arbre de dictionnaires.
+``VoteTable.patched`` ne réaplatit que les tâches relues lors d'une
+synchronisation ; les autres lignes sont reprises par masque NumPy.
+
+``leaderboard`` rattache chaque clé de vote à sa tâche (toutes clés historiques
+confondues) puis calcule total d'étoiles, nombre de votes, moyenne,
+histogramme et rang avec ``np.bincount`` / ``np.lexsort`` : aucun parcours
+Python par vote ni par ligne. ``leaderboard_from_counters`` produit le même
+tableau à partir des compteurs serveur ``aggregates/{task_key}`` (une ligne
+par clé de tâche, sans parcourir les votes).
+"""
+import numpy as np
+import pandas as pd
+
+from spring_vote.aggregates import SCORES, counter_values
+from spring_vote.vote_utils import task_key_aliases
+
+VOTE_COLUMNS = ('task_key', 'user_id', 'score', 'ts')
+HIST_COLUMNS = tuple(f'hist_{score}' for score in SCORES)
+
+
+def _stored_votes(user_votes):
+    # Comme ``flatten_user_votes``, sans recopier chaque vote pour y ajouter son push id
+    if isinstance(user_votes, list):
+        return user_votes
+    if isinstance(user_votes, dict):
+        return [v for v in user_votes.values() if isinstance(v, dict)]
+    return []
+
+
+def _timestamps(values: list) -> np.ndarray:
+    try:
+        return np.array(values, dtype='datetime64[us]')
+    except (TypeError, ValueError):
+        # Horodatage illisible (données anciennes) : NaT pour ce vote seulement
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(value, 'us'))
+            except (TypeError, ValueError):
+                parsed.append(np.datetime64('NaT', 'us'))
+        return np.array(parsed, dtype='datetime64[us]')
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def _flatten(votes: dict, task_keys, task_index: dict, user_index: dict) -> tuple:
+    """Colonnes ``(task_codes, user_codes, scores, ts)`` des tâches ``task_keys`` ; les index sont complétés."""
+    task_codes, user_codes, scores, stamps = [], [], [], []
+    for task_key in task_keys:
+        task_votes = (votes or {}).get(task_key) or {}
+        if not task_votes:
+            continue
+        task_code = task_index.setdefault(task_key, len(task_index))
+        for user_id, user_votes in task_votes.items():
+            user_code = None
+            for vote in _stored_votes(user_votes):
+                if user_code is None:
+                    user_code = user_index.setdefault(user_id, len(user_index))
+                task_codes.append(task_code)
+                user_codes.append(user_code)
+                if isinstance(vote, dict):
+                    scores.append(vote.get('score') or 0)
+                    stamps.append(vote.get('timestamp'))
+                else:
+                    scores.append(0)
+                    stamps.append(None)
+    return (np.array(task_codes, dtype=np.int32), np.array(user_codes, dtype=np.int32),
+            np.array(scores, dtype=np.int8), _timestamps(stamps))
+
+
+class VoteTable:
+    """Votes aplatis en colonnes NumPy ; immuable (``patched`` retourne une nouvelle table).
+
+    ``task_keys[task_codes[i]]`` et ``user_ids[user_codes[i]]`` identifient le vote ``i``,
+    de note ``scores[i]`` et d'horodatage ``ts[i]``. Les tableaux sont en lecture seule :
+    l'interface peut les lire directement, sans copie."""
+
+    __slots__ = ('task_keys', 'user_ids', 'task_codes', 'user_codes', 'scores', 'ts')
+
+    def __init__(self, task_keys=(), user_ids=(), columns=None):
+        self.task_keys = tuple(task_keys)
+        self.user_ids = tuple(user_ids)
+        if columns is None:
+            columns = _flatten({}, (), {}, {})
+        self.task_codes, self.user_codes, self.scores, self.ts = (_readonly(c) for c in columns)
+
+    @classmethod
+    def build(cls, votes: dict) -> 'VoteTable':
+        task_index, user_index = {}, {}
+        columns = _flatten(votes, (votes or {}).keys(), task_index, user_index)
+        return cls(task_index, user_index, columns)
+
+    def patched(self, votes: dict, changed_task_keys) -> 'VoteTable':
+        """Nouvelle table où seules les tâches ``changed_task_keys`` sont relues depuis ``votes``."""
+        changed = list(changed_task_keys or ())
+        if not changed:
+            return self
+        task_index = {key: code for code, key in enumerate(self.task_keys)}
+        user_index = {user_id: code for code, user_id in enumerate(self.user_ids)}
+        dropped = [task_index[key] for key in changed if key in task_index]
+        kept = ~np.isin(self.task_codes, dropped)
+        fresh = _flatten(votes, changed, task_index, user_index)
+        columns = [np.concatenate([old[kept], new])
+                   for old, new in zip((self.task_codes, self.user_codes, self.scores, self.ts), fresh)]
+        return VoteTable(task_index, user_index, columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Taille des colonnes (hors chaînes internées)."""
+        return sum(c.nbytes for c in (self.task_codes, self.user_codes, self.scores, self.ts))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vue pandas ``VOTE_COLUMNS`` (colonnes catégorielles construites sur les codes)."""
+        return pd.DataFrame({
+            'task_key': pd.Categorical.from_codes(self.task_codes, categories=list(self.task_keys)),
+            'user_id': pd.Categorical.from_codes(self.user_codes, categories=list(self.user_ids)),
+            'score': self.scores,
+            'ts': self.ts,
+        })
+
+    def __len__(self):
+        return len(self.task_codes)
+
+
+def leaderboard(tasks: list, table: VoteTable, key_positions: dict = None) -> pd.DataFrame:
+    """Une ligne par tâche (ordre de ``tasks``) : name, source, total_stars, num_votes, avg_score,
+    hist_1..hist_5 et rank (1 = premier par total d'étoiles, puis nombre de votes).
+    ``key_positions`` (clé de vote -> position dans ``tasks``, cf. ``TaskCatalog``) évite de le recalculer."""
+    n = len(tasks)
+    alias_to_pos = _alias_positions(tasks, key_positions)
+
+    # Position de tâche par clé internée (une recherche par clé distincte), puis par vote
+    key_pos = np.array([alias_to_pos.get(key, -1) for key in table.task_keys], dtype=np.int64)
+    pos = key_pos[table.task_codes] if len(key_pos) else np.empty(0, dtype=np.int64)
+    matched = pos >= 0
+    pos = pos[matched]
+    scores = table.scores[matched].astype(np.int64)
+
+    num_votes = np.bincount(pos, minlength=n)
+    total_stars = np.bincount(pos, weights=scores, minlength=n).astype(np.int64)
+    in_range = (scores >= SCORES[0]) & (scores <= SCORES[-1])
+    hist = np.bincount(pos[in_range] * len(SCORES) + (scores[in_range] - SCORES[0]),
+                       minlength=n * len(SCORES)).reshape(n, len(SCORES))
+    return _board(tasks, total_stars, num_votes, hist)
+
+
+def leaderboard_from_counters(tasks: list, counters: dict, key_positions: dict = None) -> pd.DataFrame:
+    """Même tableau que ``leaderboard``, calculé sur les compteurs serveur ``{task_key: {sum, count, histogram}}``."""
+    n = len(tasks)
+    alias_to_pos = _alias_positions(tasks, key_positions)
+    keys = [key for key in (counters or {}) if key in alias_to_pos]
+    pos = np.array([alias_to_pos[key] for key in keys], dtype=np.int64)
+    values = [counter_values(counters[key]) for key in keys]
+    sums = np.array([v[0] for v in values], dtype=np.int64)
+    counts = np.array([v[1] for v in values], dtype=np.int64)
+    hists = np.array([v[2] for v in values], dtype=np.int64).reshape(len(keys), len(SCORES))
+
+    # Plusieurs clés historiques d'une même tâche : cumul par position
+    num_votes = np.bincount(pos, weights=counts, minlength=n).astype(np.int64)
+    total_stars = np.bincount(pos, weights=sums, minlength=n).astype(np.int64)
+    hist = np.zeros((n, len(SCORES)), dtype=np.int64)
+    np.add.at(hist, pos, hists)
+    return _board(tasks, total_stars, num_votes, hist)
+
+
+def snapshot_leaderboard(tasks: list, table: VoteTable, counters: dict = None, key_positions: dict = None) -> pd.DataFrame:
+    """Classement d'un snapshot : sur les compteurs serveur s'ils sont complets (``counters`` non None),
+    sinon sur la table de votes."""
+    if counters is not None:
+        return leaderboard_from_counters(tasks, counters, key_positions)
+    return leaderboard(tasks, table, key_positions)
+
+
+def _alias_positions(tasks: list, key_positions: dict = None) -> dict:
+    if key_positions is not None:
+        return key_positions
+    alias_to_pos = {}
+    for pos, task in enumerate(tasks):
+        for key in task_key_aliases(task):
+            alias_to_pos.setdefault(key, pos)
+    return alias_to_pos
+
+
+def _board(tasks: list, total_stars: np.ndarray, num_votes: np.ndarray, hist: np.ndarray) -> pd.DataFrame:
+    n = len(tasks)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_score = np.where(num_votes > 0, total_stars / np.maximum(num_votes, 1), 0.0)
+
+    # Tri stable : total d'étoiles puis nombre de votes, décroissants
+    order = np.lexsort((-num_votes, -total_stars))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(1, n + 1)
+
+    board = pd.DataFrame({
+        'name': [t['name'] for t in tasks],
+        'source': [t.get('source', '') for t in tasks],
+        'total_stars': total_stars,
+        'num_votes': num_votes,
+        'avg_score': avg_score,
+        'rank': rank,
+    })
+    for i, column in enumerate(HIST_COLUMNS):
+        board[column] = hist[:, i]
+    return board
+
+
+def ranked(board: pd.DataFrame) -> pd.DataFrame:
+    """Classement trié par rang."""
+    return board.sort_values('rank', kind='stable').reset_index(drop=True)
+
+
+def top_by_votes(board: pd.DataFrame, n: int = 5) -> pd.DataFrame:
+    """Tâches ayant des votes, par nombre de votes puis score moyen."""
+    voted = board[board['num_votes'] > 0]
+    return voted.sort_values(['num_votes', 'avg_score'], ascending=False, kind='stable').head(n)
@@ -0,0 +1,166 @@
+"""Mises à jour poussées par la base au lieu d'un polling de ``last_updated``.
+
+Un ``LiveEventHub`` (un par processus) s'abonne à une source d'événements —
+``listen()`` de firebase-admin sur le nœud ``sync`` en production, ou n'importe
+quel objet exposant ``listen(callback)`` comme ``FakeRTDB`` ou
+``LocalEventSource`` hors ligne. Les événements arrivent sur le thread de la
+source, passent par une file partagée et sont traduits en « sujets » par un
+thread de répartition :
+
+    ('votes', task_key)      un vote a changé sur une tâche
+    ('users', user_id)       un utilisateur a changé (tokens, nom, création)
+    ('additional_tasks', '') une tâche a été proposée
+    ('*', '')                tout a pu changer (événement initial, remplacement)
+
+Les sessions mémorisent le numéro de séquence déjà vu et demandent
+``changes_since(seq)`` pour décider elles-mêmes si un réaffichage est utile.
+``on_change(sujets)`` est appelé avant que la séquence n'avance : quand une
+session voit un nouveau numéro, l'invalidation correspondante est déjà faite.
+"""
+import queue
+import threading
+from collections import deque
+
+ALL = ('*', '')
+_AREAS = ('votes', 'users')
+
+
+def event_topics(path: str, data) -> set:
+    """Traduit un événement reçu sur le nœud ``sync`` en ensemble de sujets."""
+    parts = [p for p in (path or '').split('/') if p]
+    if not parts:
+        if not isinstance(data, dict):
+            return {ALL}
+        # Patch à la racine du nœud : chaque clé est un chemin relatif
+        topics = set()
+        for key, value in data.items():
+            topics |= event_topics(key, value)
+        return topics
+    area = parts[0]
+    if area == 'additional_tasks':
+        return {('additional_tasks', '')}
+    if area in _AREAS:
+        if len(parts) >= 2:
+            return {(area, parts[1])}
+        if isinstance(data, dict):
+            return {(area, key) for key in data}
+        return {(area, '*')}
+    return set()
+
+
+class LocalEventSource:
+    """Source d'événements locale : ``emit`` simule un événement du flux ``listen()``."""
+
+    class _Registration:
+        def __init__(self, source, callback):
+            self._source = source
+            self._callback = callback
+
+        def close(self):
+            with self._source._lock:
+                if self._callback in self._source._callbacks:
+                    self._source._callbacks.remove(self._callback)
+
+    class _Event:
+        def __init__(self, event_type, path, data):
+            self.event_type = event_type
+            self.path = path
+            self.data = data
+
+    def __init__(self):
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def listen(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+        return LocalEventSource._Registration(self, callback)
+
+    def emit(self, path: str, data, event_type: str = 'put'):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(LocalEventSource._Event(event_type, path, data))
+
+
+class LiveEventHub:
+    """File partagée d'événements de la base, consommée par toutes les sessions."""
+
+    def __init__(self, source, on_change=None, history: int = 1000):
+        self._source = source
+        self._on_change = on_change
+        self._queue = queue.Queue()
+        self._history = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._registration = None
+        self._thread = None
+        self.sequence = 0
+        self.error = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._dispatch, name='spring-live-events', daemon=True)
+        self._thread.start()
+        try:
+            self._registration = self._source.listen(self._queue.put)
+        except Exception as e:
+            self.error = e
+
+    def stop(self):
+        if self._registration is not None:
+            self._registration.close()
+            self._registration = None
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self.error is None
+
+    def _dispatch(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            try:
+                topics = event_topics(event.path, event.data)
+            except Exception:
+                topics = {ALL}
+            if not topics:
+                continue
+            # Invalidation d'abord : une session qui voit la nouvelle séquence et se
+            # resynchronise ne doit pas tomber sur un cache encore considéré comme frais
+            if self._on_change is not None:
+                try:
+                    self._on_change(topics)
+                except Exception:
+                    pass
+            with self._cond:
+                self.sequence += 1
+                self._history.append((self.sequence, frozenset(topics)))
+                self._cond.notify_all()
+
+    def changes_since(self, seq: int):
+        """Retourne ``(séquence courante, sujets touchés depuis seq)``."""
+        with self._cond:
+            current = self.sequence
+            if seq >= current:
+                return current, set()
+            oldest = self._history[0][0] if self._history else current + 1
+            if seq + 1 < oldest:
+                # Historique dépassé : on ne sait plus ce qui a changé
+                return current, {ALL}
+            topics = set()
+            for s, t in self._history:
+                if s > seq:
+                    topics |= t
+            return current, topics
+
+    def wait_for(self, seq: int, timeout: float = None) -> int:
+        """Bloque jusqu'à ce que la séquence dépasse ``seq`` (ou timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.sequence > seq, timeout=timeout)
+            return self.sequence
@@ -0,0 +1,178 @@
+"""Synchronisation incrémentale de l'arbre de votes Firebase.
+
+Chaque écriture horodate, en plus de ``last_updated``, le sous-arbre qu'elle
+modifie sous ``sync/`` :
+
+    sync/votes/{task_key}      -> horodatage du dernier vote sur la tâche
+    sync/users/{user_id}       -> horodatage de la dernière modif. utilisateur
+    sync/additional_tasks      -> horodatage du dernier ajout de tâche
+
+Un client qui possède déjà un snapshot lit ``last_updated`` (quelques octets),
+puis le nœud ``sync`` (O(tâches + utilisateurs)), et ne télécharge que les
+sous-arbres dont l'horodatage a changé. Le snapshot est modifié en place.
+Une fois les compteurs serveur complets (cf. ``aggregates``), les compteurs
+``aggregates/{task_key}`` des tâches relues le sont aussi.
+"""
+from datetime import datetime
+
+from spring_vote.aggregates import AGGREGATES_COMPLETE, AGGREGATES_ROOT
+
+SYNC_ROOT = 'sync'
+
+
+def sync_stamp_updates(task_keys=(), user_ids=(), tasks: bool = False, stamp: str = None) -> dict:
+    """Chemins à ajouter à un ``update`` multi-chemins pour signaler une modification."""
+    stamp = stamp or datetime.now().isoformat()
+    updates = {'last_updated': stamp}
+    for task_key in task_keys:
+        updates[f'{SYNC_ROOT}/votes/{task_key}'] = stamp
+    for user_id in user_ids:
+        updates[f'{SYNC_ROOT}/users/{user_id}'] = stamp
+    if tasks:
+        updates[f'{SYNC_ROOT}/additional_tasks'] = stamp
+    return updates
+
+
+def _tasks_as_dict(raw) -> dict:
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, list):
+        return {str(t.get('id', i)): t for i, t in enumerate(raw) if isinstance(t, dict)}
+    return {}
+
+
+class LiveSnapshot:
+    """Copie locale de la base, tenue à jour par ``sync_snapshot``."""
+
+    def __init__(self):
+        self.votes = {}
+        self.users = {}
+        self.additional_tasks = []
+        self.last_updated = ''
+        self.versions = {'votes': {}, 'users': {}, 'additional_tasks': ''}
+        self.loaded = False
+        # Clés votes/{task_key} relues lors de la dernière synchronisation (None = tout rechargé)
+        self.changed_votes = None
+        # Table de votes maintenue par le propriétaire du snapshot (cf. SharedSnapshotCache)
+        self.vote_table = None
+        # Compteurs serveur par clé de tâche, None tant qu'ils ne sont pas complets
+        self.aggregates = None
+        self.full_loads = 0
+        self.delta_loads = 0
+
+    def clone(self) -> 'LiveSnapshot':
+        """Copie superficielle : les sous-arbres sont partagés, les index de premier niveau copiés.
+        Comme ``sync_snapshot`` remplace les sous-arbres au lieu de les modifier, patcher le clone
+        ne touche pas les lecteurs de l'original."""
+        other = LiveSnapshot()
+        other.votes = dict(self.votes)
+        other.users = dict(self.users)
+        other.additional_tasks = list(self.additional_tasks)
+        other.last_updated = self.last_updated
+        other.versions = {
+            'votes': dict(self.versions['votes']),
+            'users': dict(self.versions['users']),
+            'additional_tasks': self.versions['additional_tasks'],
+        }
+        other.loaded = self.loaded
+        other.changed_votes = self.changed_votes
+        other.vote_table = self.vote_table
+        other.aggregates = None if self.aggregates is None else dict(self.aggregates)
+        other.full_loads = self.full_loads
+        other.delta_loads = self.delta_loads
+        return other
+
+    def _replace_tasks(self, raw):
+        # additional_tasks peut être dict (par id) ou liste
+        self.additional_tasks[:] = list(_tasks_as_dict(raw).values())
+
+
+def _newest_stamp(versions: dict) -> str:
+    stamps = [versions.get('additional_tasks') or '']
+    stamps.extend((versions.get('votes') or {}).values())
+    stamps.extend((versions.get('users') or {}).values())
+    return max(str(s) for s in stamps)
+
+
+def _remember_versions(snapshot: LiveSnapshot, versions: dict, last_updated: str):
+    versions = versions or {}
+    snapshot.versions = {
+        'votes': dict(versions.get('votes') or {}),
+        'users': dict(versions.get('users') or {}),
+        'additional_tasks': versions.get('additional_tasks') or '',
+    }
+    # Le curseur est la valeur lue telle quelle : des écritures concurrentes peuvent arriver
+    # dans le désordre (last_updated plus ancien qu'un marqueur), et un curseur « avancé »
+    # ne correspondrait plus jamais à la base, ce qui relirait sync/ à chaque vérification.
+    snapshot.last_updated = last_updated or _newest_stamp(snapshot.versions)
+
+
+def full_load(firebase_ref, snapshot: LiveSnapshot):
+    """Télécharge toute la racine et remplace le contenu du snapshot."""
+    data = firebase_ref.get() or {}
+    snapshot.votes.clear()
+    snapshot.votes.update(data.get('votes') or {})
+    snapshot.users.clear()
+    snapshot.users.update(data.get('users') or {})
+    snapshot._replace_tasks(data.get('additional_tasks'))
+    snapshot.aggregates = dict(data.get(AGGREGATES_ROOT) or {}) if data.get(AGGREGATES_COMPLETE) else None
+    _remember_versions(snapshot, data.get(SYNC_ROOT), data.get('last_updated', ''))
+    snapshot.loaded = True
+    snapshot.changed_votes = None
+    snapshot.full_loads += 1
+
+
+def _patch_subtree(firebase_ref, target: dict, name: str, local: dict, remote: dict) -> set:
+    changed = set()
+    for key in set(local) | set(remote):
+        if local.get(key) == remote.get(key):
+            continue
+        value = firebase_ref.child(name).child(key).get()
+        if value is None:
+            target.pop(key, None)
+        else:
+            target[key] = value
+        changed.add(key)
+    return changed
+
+
+def sync_snapshot(firebase_ref, snapshot: LiveSnapshot, force: bool = False) -> bool:
+    """Met à jour le snapshot avec le minimum de lectures. Retourne True si des données ont changé."""
+    if not snapshot.loaded or force:
+        full_load(firebase_ref, snapshot)
+        return True
+
+    last_updated = firebase_ref.child('last_updated').get() or ''
+    if last_updated == snapshot.last_updated:
+        return False
+
+    remote = firebase_ref.child(SYNC_ROOT).get() or {}
+    remote_votes = remote.get('votes') or {}
+    remote_users = remote.get('users') or {}
+    remote_tasks = remote.get('additional_tasks') or ''
+
+    changed_votes = _patch_subtree(firebase_ref, snapshot.votes, 'votes', snapshot.versions['votes'], remote_votes)
+    changed = bool(changed_votes)
+    if snapshot.aggregates is not None:
+        for task_key in changed_votes:
+            counters = firebase_ref.child(AGGREGATES_ROOT).child(task_key).get()
+            if counters is None:
+                snapshot.aggregates.pop(task_key, None)
+            else:
+                snapshot.aggregates[task_key] = counters
+    changed |= bool(_patch_subtree(firebase_ref, snapshot.users, 'users', snapshot.versions['users'], remote_users))
+    if remote_tasks != snapshot.versions['additional_tasks']:
+        snapshot._replace_tasks(firebase_ref.child('additional_tasks').get())
+        changed = True
+
+    if not changed and last_updated > _newest_stamp(remote):
+        # last_updated a bougé sans marqueur : écriture d'un client qui ne connaît
+        # pas les marqueurs de synchronisation, on retombe sur un rechargement complet.
+        full_load(firebase_ref, snapshot)
+        return True
+
+    # (Sans changement : toutes les écritures étaient déjà appliquées localement, cf. apply_* du cache)
+    _remember_versions(snapshot, remote, last_updated)
+    snapshot.changed_votes = changed_votes
+    snapshot.delta_loads += 1
+    return changed
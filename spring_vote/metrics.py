@@ -0,0 +1,291 @@
+"""Métriques au format texte Prometheus, sans dépendance ni service externe.
+
+Un ``MetricsRegistry`` détient des compteurs, jauges et histogrammes
+(étiquetés ou non) et les rend au format d'exposition texte (0.0.4). Deux
+façons de les publier :
+
+    serve(port)                  endpoint HTTP local ``/metrics`` (thread démon)
+    start_textfile_writer(path)  fichier réécrit périodiquement (et atomiquement)
+                                 pour le textfile collector de node_exporter
+
+``ServiceMetrics`` définit les métriques de l'application de vote. Il écoute
+le ``Profiler`` (appels Firebase, relances) et reçoit directement les
+résultats d'écriture de vote :
+
+    spring_votes_committed_total{path}          votes écrits (direct / background)
+    spring_vote_commit_failures_total{path,reason}  échecs (rejected / error), par tentative
+    spring_vote_commit_seconds{path}            durée d'écriture d'un vote
+    spring_firebase_calls_total{method}         appels à la base
+    spring_firebase_errors_total{method}        appels en erreur
+    spring_firebase_call_seconds{method}        durée des appels
+    spring_firebase_bytes_total{direction}      octets échangés (down / up), si le Profiler les mesure
+    spring_token_transaction_retries_total      nouvelles tentatives de transaction
+    spring_snapshot_sync_bytes                  octets lus par synchronisation du snapshot (idem)
+    spring_rerun_seconds                        durée des relances complètes
+    spring_rerun_stage_seconds{stage}           durée des étapes de ``main()``
+    spring_active_sessions                      sessions actives (relance récente)
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ACTIVE_SESSION_WINDOW = 300.0
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} : étiquettes attendues {self.labelnames}, reçues {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> list:
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("un compteur ne peut que croître")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Jauge ; ``fn`` (sans étiquettes) est évaluée à chaque rendu."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), fn=None):
+        super().__init__(name, documentation, labelnames)
+        self._fn = fn
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list:
+        if self._fn is not None:
+            try:
+                self.set(self._fn())
+            except Exception:
+                pass
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ((0,) * len(self.buckets), 0.0))
+            # Nouveau tuple : un rendu en cours garde une copie cohérente
+            counts = tuple(c + (value <= bound) for c, bound in zip(counts, self.buckets))
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _samples(self, key, value) -> list:
+        counts, total = value
+        lines = []
+        for bound, count in zip(self.buckets, counts):
+            le = 'le="%s"' % _number(bound)
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {count}')
+        lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+        lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble de métriques rendues ensemble ; les noms sont uniques."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.server = None
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"métrique déjà déclarée : {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), fn=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, fn))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+    def write_textfile(self, path: str):
+        """Écrit le rendu dans ``path`` via un fichier temporaire (le collecteur ne lit jamais un fichier partiel)."""
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def start_textfile_writer(self, path: str, interval: float = 15.0) -> threading.Thread:
+        def loop():
+            while True:
+                try:
+                    self.write_textfile(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name='metrics-textfile', daemon=True)
+        thread.start()
+        return thread
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Sert ``/metrics`` sur ``host:port`` dans un thread démon. Lève ``OSError`` si le port est pris."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+        return self.server
+
+
+class ServiceMetrics:
+    """Métriques de l'application ; s'abonne au ``Profiler`` pour les appels Firebase et les relances."""
+
+    def __init__(self, profiler=None, registry: MetricsRegistry = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.votes_committed = r.counter('spring_votes_committed_total', "Votes écrits dans le stockage", ('path',))
+        self.vote_failures = r.counter('spring_vote_commit_failures_total',
+                                       "Écritures de vote en échec, par tentative", ('path', 'reason'))
+        self.vote_seconds = r.histogram('spring_vote_commit_seconds', "Durée d'écriture d'un vote", ('path',))
+        self.firebase_calls = r.counter('spring_firebase_calls_total', "Appels à la Realtime Database", ('method',))
+        self.firebase_errors = r.counter('spring_firebase_errors_total', "Appels à la base en erreur", ('method',))
+        self.firebase_seconds = r.histogram('spring_firebase_call_seconds', "Durée des appels à la base",
+                                            ('method',))
+        self.firebase_bytes = r.counter('spring_firebase_bytes_total', "Octets échangés avec la base",
+                                        ('direction',))
+        self.transaction_retries = r.counter('spring_token_transaction_retries_total',
+                                             "Nouvelles tentatives de transactions (conflits)")
+        self.snapshot_bytes = r.histogram('spring_snapshot_sync_bytes',
+                                          "Octets lus par synchronisation du snapshot partagé",
+                                          buckets=BYTES_BUCKETS)
+        self.rerun_seconds = r.histogram('spring_rerun_seconds', "Durée des relances complètes de la page")
+        self.stage_seconds = r.histogram('spring_rerun_stage_seconds', "Durée des étapes d'une relance",
+                                         ('stage',))
+        r.gauge('spring_active_sessions', f"Sessions avec une relance depuis moins de {ACTIVE_SESSION_WINDOW:.0f} s",
+                fn=(lambda: profiler.active_sessions(ACTIVE_SESSION_WINDOW)) if profiler is not None else None)
+        if profiler is not None:
+            profiler.add_listener(self)
+
+    # Écouteur du Profiler
+    def on_call(self, method: str, ms: float, down: int, up: int, error: bool, retries: int):
+        self.firebase_calls.inc(method=method)
+        self.firebase_seconds.observe(ms / 1000, method=method)
+        if error:
+            self.firebase_errors.inc(method=method)
+        if down:
+            self.firebase_bytes.inc(down, direction='down')
+        if up:
+            self.firebase_bytes.inc(up, direction='up')
+        if retries:
+            self.transaction_retries.inc(retries)
+
+    def on_rerun(self, profile):
+        self.rerun_seconds.observe(profile.total_ms / 1000)
+        for stage, ms in profile.stages.items():
+            self.stage_seconds.observe(ms / 1000, stage=stage)
+
+    @contextmanager
+    def vote_commit(self, path: str, rejected=()):
+        """Mesure une écriture de vote ; ``rejected`` : exceptions comptées comme refus (et non erreurs)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        except tuple(rejected):
+            self.vote_failures.inc(path=path, reason='rejected')
+            raise
+        except Exception:
+            self.vote_failures.inc(path=path, reason='error')
+            raise
+        self.vote_seconds.observe(time.perf_counter() - t0, path=path)
+        self.votes_committed.inc(path=path)
@@ -0,0 +1,148 @@
+"""Fusionne les votes stockés sous des clés historiques dans la clé canonique de leur tâche.
+
+Les anciennes versions écrivaient ``votes/{nom}`` (nom brut ou nettoyé) en
+mode local et ``votes/{task_key_from_task(tâche)}`` en mode cloud. Après
+migration, chaque tâche n'a plus qu'une clé : la recherche des votes d'une
+tâche est un seul accès au dictionnaire.
+
+Si un participant a voté sous plusieurs clés d'une même tâche, seul son vote
+le plus récent est conservé (un vote par participant et par tâche) ; les
+tokens débités pour les votes écartés lui sont rendus.
+
+Usage : python -m spring_vote.migrate_task_keys [--secrets .streamlit/secrets.toml] [--local DIR]
+                                                [--csv FICHIER] [--dry-run]
+"""
+import argparse
+from collections import Counter
+
+from spring_vote.aggregates import AGGREGATES_ROOT, server_aggregates_from_votes
+from spring_vote.csv_ingest import read_tasks_csv
+from spring_vote.live_sync import sync_stamp_updates
+from spring_vote.task_catalog import TaskCatalog
+from spring_vote.user_votes import USER_VOTES_ROOT, index_entry
+from spring_vote.vote_utils import flatten_user_votes
+
+DEFAULT_CSV = "Evaluation_Taches_SPRING - Copie.csv"
+
+
+def _latest_timestamp(user_votes) -> str:
+    stamps = [v.get('timestamp') or '' for v in flatten_user_votes(user_votes) if isinstance(v, dict)]
+    return max(stamps, default='')
+
+
+def _refund(refunds: dict, user_id: str, dropped):
+    counts = refunds.setdefault(user_id, Counter())
+    for vote in flatten_user_votes(dropped):
+        if isinstance(vote, dict) and vote.get('score') is not None:
+            counts[f"votes_{int(vote['score'])}"] += 1
+
+
+def plan_migration(votes: dict, catalog: TaskCatalog) -> dict:
+    """``{clé canonique: (clés historiques, votes fusionnés par utilisateur, remboursements)}`` pour les
+    tâches à migrer ; remboursements : ``{user_id: {type de vote: nombre}}`` des votes écartés."""
+    plan = {}
+    for legacy, canonical in sorted(catalog.legacy_keys(votes).items()):
+        if canonical not in plan:
+            plan[canonical] = ([], dict((votes or {}).get(canonical) or {}), {})
+        legacy_keys, merged, refunds = plan[canonical]
+        legacy_keys.append(legacy)
+        for user_id, user_votes in ((votes or {}).get(legacy) or {}).items():
+            current = merged.get(user_id)
+            if current is None or _latest_timestamp(user_votes) > _latest_timestamp(current):
+                merged[user_id] = user_votes
+                if current is not None:
+                    _refund(refunds, user_id, current)
+            else:
+                _refund(refunds, user_id, user_votes)
+    return plan
+
+
+def refunds(plan: dict) -> dict:
+    """Tokens à rendre par utilisateur, toutes tâches confondues : ``{user_id: {type de vote: nombre}}``."""
+    totals = {}
+    for _, _, task_refunds in plan.values():
+        for user_id, counts in task_refunds.items():
+            totals.setdefault(user_id, Counter()).update(counts)
+    return {user_id: dict(counts) for user_id, counts in totals.items() if counts}
+
+
+def _task_keys(plan: dict) -> list:
+    return [k for canonical, (legacy_keys, _, _) in plan.items() for k in (canonical, *legacy_keys)]
+
+
+def firebase_updates(plan: dict) -> dict:
+    """Un seul ``update`` multi-chemins : votes déplacés, compteurs serveur, index ``user_votes``,
+    tokens rendus (par incréments) et marqueurs de synchronisation."""
+    updates = {}
+    for canonical, (legacy_keys, merged, _) in plan.items():
+        updates[f'votes/{canonical}'] = merged
+        updates[f'{AGGREGATES_ROOT}/{canonical}'] = server_aggregates_from_votes({canonical: merged}).get(canonical)
+        for legacy in legacy_keys:
+            updates[f'votes/{legacy}'] = None
+            updates[f'{AGGREGATES_ROOT}/{legacy}'] = None
+        # Tout votant d'une clé historique figure dans ``merged``
+        for user_id, user_votes in merged.items():
+            updates[f'{USER_VOTES_ROOT}/{user_id}/{canonical}'] = index_entry(user_votes)
+            for legacy in legacy_keys:
+                updates[f'{USER_VOTES_ROOT}/{user_id}/{legacy}'] = None
+    to_refund = refunds(plan)
+    for user_id, counts in to_refund.items():
+        for vote_type, n in counts.items():
+            updates[f'users/{user_id}/tokens/{vote_type}'] = {'.sv': {'increment': n}}
+    updates.update(sync_stamp_updates(task_keys=_task_keys(plan), user_ids=list(to_refund)))
+    return updates
+
+
+def local_changes(plan: dict) -> list:
+    """Changements ``(chemin, valeur)`` pour ``JournalStore`` / ``SqliteStore`` ; les tokens à rendre
+    (``refunds(plan)``) sont passés à part en ``token_deltas``, appliqués dans la même transaction."""
+    changes = []
+    for canonical, (legacy_keys, merged, _) in plan.items():
+        changes += [(('votes', legacy), None) for legacy in legacy_keys]
+        changes += [(('votes', canonical, user_id), user_votes) for user_id, user_votes in merged.items()]
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--secrets', default='.streamlit/secrets.toml')
+    parser.add_argument('--local', metavar='DIR', help="migre le stockage local de ce dossier au lieu de Firebase")
+    parser.add_argument('--backend', choices=('sqlite', 'journal'), default='sqlite')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--dry-run', action='store_true', help="affiche les fusions sans rien écrire")
+    args = parser.parse_args()
+
+    if args.local:
+        if args.backend == 'sqlite':
+            from spring_vote.sqlite_store import SqliteStore
+            backend = SqliteStore(args.local)
+        else:
+            from spring_vote.journal_store import JournalStore
+            backend = JournalStore(args.local)
+        votes, _, additional_tasks = backend.load()
+    else:
+        from spring_vote.firebase_setup import init_from_secrets_file
+        root = init_from_secrets_file(args.secrets)
+        votes = root.child('votes').get() or {}
+        raw_tasks = root.child('additional_tasks').get() or {}
+        additional_tasks = list(raw_tasks.values()) if isinstance(raw_tasks, dict) else raw_tasks
+
+    catalog = TaskCatalog.build(read_tasks_csv(args.csv), additional_tasks)
+    plan = plan_migration(votes, catalog)
+    for canonical, (legacy_keys, merged, task_refunds) in plan.items():
+        print(f"{', '.join(legacy_keys)} -> {canonical} ({len(merged)} votant(s), "
+              f"{len(task_refunds)} doublon(s) remboursé(s))")
+    print(f"{len(plan)} tâche(s) à migrer")
+
+    if plan and not args.dry_run:
+        if args.local:
+            backend.apply(local_changes(plan), refunds(plan))
+        else:
+            root.update(firebase_updates(plan))
+        print("Votes migrés.")
+    if args.local:
+        backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Instrumentation du chemin chaud : durée de chaque relance, étapes et appels Firebase.
+
+Un ``Profiler`` (un par processus) mesure :
+
+    étapes        blocs ``with profiler.stage(nom)`` de ``main()`` (durée murale)
+    appels        ``get``/``set``/``update``/``push``/``delete``/``transaction`` d'une
+                  référence enveloppée par ``profiler.wrap(ref)`` : nombre, durée et,
+                  si ``measure_bytes``, octets reçus et envoyés (même mesure que ``FakeRTDB``)
+
+Mesurer les octets sérialise chaque réponse en JSON, ce qui coûte presque
+autant que la lecture elle-même sur un chargement complet : c'est désactivé
+par défaut, les compteurs d'octets restent alors à zéro.
+
+La relance en cours est propre au thread qui l'exécute (Streamlit exécute
+chaque session dans son thread) : ``with profiler.rerun(session_id)`` ouvre
+un ``RerunProfile`` et le range, à la fin, dans l'historique de la session et
+dans les totaux du processus. Les appels faits hors relance (file
+d'écritures, préchargement, écoute temps réel) sont comptés à part dans
+``background``.
+
+Des écouteurs (``add_listener``) reçoivent aussi chaque appel
+(``on_call``) et chaque relance terminée (``on_rerun``), par ex.
+``ServiceMetrics`` pour l'export Prometheus.
+
+Chaque relance terminée peut être ajoutée à un fichier JSON lines
+(``log_path``) ; ``jsonl()`` exporte l'historique gardé en mémoire.
+"""
+import json
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from spring_vote.fake_rtdb import payload_size
+
+HISTORY_PER_SESSION = 50
+MAX_SESSIONS = 200
+
+
+def _size(value) -> int:
+    try:
+        return payload_size(value)
+    except (TypeError, ValueError):
+        # Valeur non sérialisable en JSON (sentinelle du SDK) : non comptée
+        return 0
+
+
+class CallStats:
+    """Appels à la base regroupés par méthode : nombre, durée, octets."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.ms = Counter()
+        self.errors = Counter()
+        self.bytes_down = 0
+        self.bytes_up = 0
+        self.transaction_retries = 0
+
+    def record(self, method: str, ms: float, down: int, up: int, error: bool = False, retries: int = 0):
+        self.calls[method] += 1
+        self.ms[method] += ms
+        if error:
+            self.errors[method] += 1
+        self.bytes_down += down
+        self.bytes_up += up
+        self.transaction_retries += retries
+
+    def merge(self, other: 'CallStats'):
+        self.calls.update(other.calls)
+        self.ms.update(other.ms)
+        self.errors.update(other.errors)
+        self.bytes_down += other.bytes_down
+        self.bytes_up += other.bytes_up
+        self.transaction_retries += other.transaction_retries
+
+    def as_dict(self) -> dict:
+        return {
+            'calls': dict(self.calls),
+            'round_trips': sum(self.calls.values()),
+            'errors': sum(self.errors.values()),
+            'db_ms': round(sum(self.ms.values()), 3),
+            'bytes_down': self.bytes_down,
+            'bytes_up': self.bytes_up,
+            'transaction_retries': self.transaction_retries,
+        }
+
+
+class RerunProfile:
+    """Mesures d'une relance de page."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.started_at = datetime.now().isoformat()
+        self.total_ms = 0.0
+        self.stages = Counter()
+        self.db = CallStats()
+
+    def as_dict(self) -> dict:
+        return {
+            'session': self.session_id,
+            'started_at': self.started_at,
+            'total_ms': round(self.total_ms, 3),
+            'stages': {name: round(ms, 3) for name, ms in self.stages.items()},
+            **self.db.as_dict(),
+        }
+
+
+class SessionStats:
+    """Totaux d'une session et ses dernières relances."""
+
+    def __init__(self):
+        self.reruns = 0
+        self.total_ms = 0.0
+        self.stages = Counter()
+        self.db = CallStats()
+        self.history = deque(maxlen=HISTORY_PER_SESSION)
+        self.last_seen = 0.0
+
+    def add(self, profile: RerunProfile):
+        self.last_seen = time.monotonic()
+        self.reruns += 1
+        self.total_ms += profile.total_ms
+        self.stages.update(profile.stages)
+        self.db.merge(profile.db)
+        self.history.append(profile)
+
+    def as_dict(self) -> dict:
+        return {
+            'reruns': self.reruns,
+            'total_ms': round(self.total_ms, 3),
+            'stages': {name: round(ms, 3) for name, ms in self.stages.items()},
+            **self.db.as_dict(),
+        }
+
+
+class Profiler:
+    """Point de collecte partagé par les sessions ; sans relance ouverte, les étapes ne coûtent rien."""
+
+    def __init__(self, log_path: str = None, measure_bytes: bool = False):
+        self.log_path = log_path
+        self.measure_bytes = measure_bytes
+        self.sessions = OrderedDict()
+        self.totals = SessionStats()
+        self.background = CallStats()
+        self.listeners = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """``listener.on_call(method, ms, down, up, error, retries)`` et ``listener.on_rerun(profile)``."""
+        self.listeners.append(listener)
+
+    @property
+    def current(self) -> RerunProfile:
+        return getattr(self._local, 'profile', None)
+
+    @contextmanager
+    def rerun(self, session_id: str):
+        """Mesure une relance complète ; enregistrée même si elle est interrompue par ``st.rerun()``."""
+        profile = RerunProfile(session_id)
+        self._local.profile = profile
+        t0 = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.total_ms = (time.perf_counter() - t0) * 1000
+            self._local.profile = None
+            self._finish(profile)
+
+    @contextmanager
+    def stage(self, name: str):
+        profile = self.current
+        if profile is None:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            profile.stages[name] += (time.perf_counter() - t0) * 1000
+
+    def record_call(self, method: str, ms: float, down: int = 0, up: int = 0, error: bool = False,
+                    retries: int = 0):
+        for listener in self.listeners:
+            listener.on_call(method, ms, down, up, error, retries)
+        profile = self.current
+        if profile is not None:
+            profile.db.record(method, ms, down, up, error, retries)
+            return
+        with self._lock:
+            self.background.record(method, ms, down, up, error, retries)
+
+    def wrap(self, ref) -> 'ProfiledReference':
+        return ProfiledReference(ref, self)
+
+    def _finish(self, profile: RerunProfile):
+        with self._lock:
+            session = self.sessions.pop(profile.session_id, None) or SessionStats()
+            session.add(profile)
+            self.sessions[profile.session_id] = session
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+            self.totals.add(profile)
+            for listener in self.listeners:
+                listener.on_rerun(profile)
+            if self.log_path:
+                try:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(profile.as_dict(), ensure_ascii=False) + '\n')
+                except OSError:
+                    self.log_path = None
+
+    def active_sessions(self, window: float) -> int:
+        """Sessions ayant terminé une relance dans les ``window`` dernières secondes."""
+        since = time.monotonic() - window
+        with self._lock:
+            return sum(1 for session in self.sessions.values() if session.last_seen >= since)
+
+    def session(self, session_id: str) -> SessionStats:
+        with self._lock:
+            return self.sessions.get(session_id) or SessionStats()
+
+    def jsonl(self, session_id: str = None) -> str:
+        """Relances gardées en mémoire (d'une session ou de toutes), une ligne JSON par relance."""
+        with self._lock:
+            sessions = [self.sessions[session_id]] if session_id in self.sessions else (
+                [] if session_id else list(self.sessions.values()))
+            profiles = sorted((p for s in sessions for p in s.history), key=lambda p: p.started_at)
+        return ''.join(json.dumps(p.as_dict(), ensure_ascii=False) + '\n' for p in profiles)
+
+
+class ProfiledReference:
+    """Enveloppe d'une référence firebase-admin (ou ``FakeRTDB``) qui chronomètre chaque appel à la base."""
+
+    def __init__(self, ref, profiler: Profiler):
+        self._ref = ref
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        # key, path, listen, order_by_*... : délégués tels quels
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._ref, name)
+
+    def child(self, path) -> 'ProfiledReference':
+        return ProfiledReference(self._ref.child(path), self._profiler)
+
+    def _size(self, value) -> int:
+        return _size(value) if self._profiler.measure_bytes else 0
+
+    def _timed(self, method, fn, up=0):
+        t0 = time.perf_counter()
+        try:
+            result = fn()
+        except Exception:
+            self._profiler.record_call(method, (time.perf_counter() - t0) * 1000, 0, up, error=True)
+            raise
+        ms = (time.perf_counter() - t0) * 1000
+        # get(etag=True) retourne (valeur, etag)
+        down = self._size(result[0] if isinstance(result, tuple) else result) if method == 'get' else 0
+        self._profiler.record_call(method, ms, down, up)
+        return result
+
+    def get(self, *args, **kwargs):
+        return self._timed('get', lambda: self._ref.get(*args, **kwargs))
+
+    def set(self, value):
+        return self._timed('set', lambda: self._ref.set(value), self._size(value))
+
+    def update(self, value):
+        return self._timed('update', lambda: self._ref.update(value), self._size(value))
+
+    def push(self, value=''):
+        ref = self._timed('push', lambda: self._ref.push(value), self._size(value))
+        return ProfiledReference(ref, self._profiler)
+
+    def delete(self):
+        return self._timed('delete', self._ref.delete)
+
+    def transaction(self, transaction_update):
+        # La fonction est rappelée à chaque nouvelle tentative ; une exception levée par elle
+        # (refus métier, ex. tokens insuffisants) n'est pas une erreur de la base
+        state = {'down': 0, 'up': 0, 'attempts': 0, 'aborted': False}
+
+        def measured(current):
+            state['down'] += self._size(current)
+            state['attempts'] += 1
+            try:
+                new_value = transaction_update(current)
+            except Exception:
+                state['aborted'] = True
+                raise
+            state['up'] += self._size(new_value)
+            return new_value
+
+        t0 = time.perf_counter()
+        failed = False
+        try:
+            return self._ref.transaction(measured)
+        except Exception:
+            failed = not state['aborted']
+            raise
+        finally:
+            self._profiler.record_call('transaction', (time.perf_counter() - t0) * 1000, state['down'], state['up'],
+                                       error=failed, retries=max(state['attempts'] - 1, 0))
@@ -0,0 +1,36 @@
+"""Recalcule les compteurs serveur ``aggregates/{task_key}`` à partir des votes bruts.
+
+Usage : python -m spring_vote.rebuild_aggregates [--secrets .streamlit/secrets.toml] [--dry-run]
+"""
+import argparse
+
+from spring_vote.aggregates import AGGREGATES_COMPLETE, AGGREGATES_ROOT, aggregate_drift, rebuild_server_aggregates, \
+    server_aggregates_from_votes
+from spring_vote.firebase_setup import init_from_secrets_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--secrets', default='.streamlit/secrets.toml')
+    parser.add_argument('--dry-run', action='store_true', help="affiche les écarts sans rien écrire")
+    args = parser.parse_args()
+
+    root = init_from_secrets_file(args.secrets)
+    expected = server_aggregates_from_votes(root.child('votes').get() or {})
+    current = root.child(AGGREGATES_ROOT).get() or {}
+
+    drifted = aggregate_drift(expected, current)
+    for task_key in drifted:
+        print(f"{task_key}: {current.get(task_key)} -> {expected.get(task_key)}")
+    print(f"{len(drifted)} tâche(s) à corriger sur {len(expected)}")
+
+    complete = bool(root.child(AGGREGATES_COMPLETE).get())
+    if not complete:
+        print("Compteurs jamais recalculés : le classement est encore calculé sur les votes.")
+    if (drifted or not complete) and not args.dry_run:
+        rebuild_server_aggregates(root)
+        print("Compteurs réécrits.")
+
+
+if __name__ == '__main__':
+    main()
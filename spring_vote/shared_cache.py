@@ -0,0 +1,164 @@
+"""Snapshot partagé par toutes les sessions Streamlit d'un même processus.
+
+Une seule instance (créée via ``st.cache_resource``) détient le snapshot de
+référence. Les sessions le lisent sans le copier et ne déclenchent une
+synchronisation réseau que si la dernière vérification date de plus de
+``max_age`` secondes ; les autres sessions réutilisent le résultat.
+
+Le snapshot publié n'est jamais modifié : une synchronisation travaille sur un
+clone (copie des index de premier niveau seulement) puis le publie d'un bloc,
+et ``generation`` est incrémenté pour signaler aux sessions qu'il faut
+réafficher. La table de votes (``VoteTable``) du snapshot est mise à jour au
+même moment en ne réaplatissant que les tâches relues, comme ses compteurs
+serveur (d'où le classement est calculé quand ils sont complets).
+
+Le classement lui-même (``leaderboard``) est calculé une fois par génération
+et par catalogue de tâches, puis servi tel quel à toutes les sessions ; toute
+publication (synchronisation, vote appliqué localement) l'invalide.
+"""
+import threading
+import time
+
+from spring_vote.aggregates import AGGREGATES_ROOT, apply_counter_updates
+from spring_vote.leaderboard import VoteTable, snapshot_leaderboard
+from spring_vote.live_sync import LiveSnapshot, sync_snapshot
+
+DEFAULT_MAX_AGE = 2.0
+
+
+class SharedSnapshotCache:
+    """Snapshot de référence unique, rafraîchi au plus une fois par changement."""
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.snapshot = LiveSnapshot()
+        self.generation = 0
+        self.syncs = 0
+        self.skipped = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        # (génération, catalogue, classement) du dernier classement calculé
+        self._board = None
+
+    def invalidate(self):
+        """Force une vérification réseau au prochain ``refresh`` (appelé sur événement de la base)."""
+        with self._lock:
+            self._last_check = 0.0
+
+    def refresh(self, firebase_ref, max_age: float = None, full: bool = False) -> int:
+        """Synchronise le snapshot si nécessaire et retourne la génération courante."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            now = time.monotonic()
+            if not full and self.snapshot.loaded and now - self._last_check < max_age:
+                self.skipped += 1
+                return self.generation
+
+            candidate = self.snapshot.clone()
+            changed = sync_snapshot(firebase_ref, candidate, force=full)
+            self._last_check = time.monotonic()
+            self.syncs += 1
+            if changed:
+                candidate.vote_table = _updated_vote_table(candidate)
+                return self._publish(candidate)
+            # Sans changement, le contenu est identique mais le curseur de synchronisation a pu avancer
+            self.snapshot = candidate
+            return self.generation
+
+    def apply_vote_commit(self, result):
+        """Applique localement un vote déjà écrit (cf. ``VoteCommitResult``), sans relire la base.
+        Les marqueurs de synchronisation ne sont pas avancés : un autre participant a pu voter sur la même
+        tâche entre-temps, la prochaine synchronisation relira donc ces deux petits sous-arbres."""
+        with self._lock:
+            candidate = self.snapshot.clone()
+            task_votes = dict(candidate.votes.get(result.task_key) or {})
+            task_votes[result.user_id] = result.user_task_votes
+            candidate.votes[result.task_key] = task_votes
+            if result.previous_key:
+                # Vote déplacé depuis une clé historique
+                old_votes = dict(candidate.votes.get(result.previous_key) or {})
+                old_votes.pop(result.user_id, None)
+                if old_votes:
+                    candidate.votes[result.previous_key] = old_votes
+                else:
+                    candidate.votes.pop(result.previous_key, None)
+            user = dict(candidate.users.get(result.user_id) or {})
+            user['tokens'] = dict(result.tokens)
+            candidate.users[result.user_id] = user
+            if candidate.aggregates is not None:
+                candidate.aggregates = apply_counter_updates(candidate.aggregates, result.vote_updates)
+            candidate.changed_votes = set(result.task_keys)
+            candidate.vote_table = _updated_vote_table(candidate)
+            return self._publish(candidate)
+
+    def reload_votes(self, firebase_ref, user_id: str, task_keys) -> int:
+        """Relit l'état réel des votes de ``user_id`` sur ``task_keys``, de leurs compteurs et de ses tokens, sans
+        toucher au reste du snapshot : annule un vote optimiste dont l'écriture a échoué (quelques petites lectures)."""
+        task_keys = list(task_keys)
+        fetched = {k: firebase_ref.child('votes').child(k).child(user_id).get() for k in task_keys}
+        tokens = firebase_ref.child('users').child(user_id).child('tokens').get()
+        counters = None
+        if self.snapshot.aggregates is not None:
+            counters = {k: firebase_ref.child(AGGREGATES_ROOT).child(k).get() for k in task_keys}
+        with self._lock:
+            if not self.snapshot.loaded:
+                return self.generation
+            candidate = self.snapshot.clone()
+            if candidate.aggregates is not None and counters is not None:
+                for task_key, value in counters.items():
+                    if value is None:
+                        candidate.aggregates.pop(task_key, None)
+                    else:
+                        candidate.aggregates[task_key] = value
+            for task_key, user_votes in fetched.items():
+                task_votes = dict(candidate.votes.get(task_key) or {})
+                if user_votes is None:
+                    task_votes.pop(user_id, None)
+                else:
+                    task_votes[user_id] = user_votes
+                if task_votes:
+                    candidate.votes[task_key] = task_votes
+                else:
+                    candidate.votes.pop(task_key, None)
+            if user_id in candidate.users:
+                user = dict(candidate.users[user_id])
+                user['tokens'] = tokens or {}
+                candidate.users[user_id] = user
+            candidate.changed_votes = set(task_keys)
+            candidate.vote_table = _updated_vote_table(candidate)
+            return self._publish(candidate)
+
+    def apply_tasks(self, tasks: list):
+        """Ajoute localement des tâches proposées déjà écrites, sans relire la base (même principe que
+        ``apply_vote_commit`` : la prochaine synchronisation relira seulement ``additional_tasks``)."""
+        with self._lock:
+            candidate = self.snapshot.clone()
+            candidate.additional_tasks.extend(tasks)
+            return self._publish(candidate)
+
+    def leaderboard(self, catalog):
+        """Classement du snapshot publié pour ``catalog`` (``TaskCatalog``), partagé par toutes les sessions :
+        à ne pas modifier. Calculé hors du verrou, au plus une fois par génération et par catalogue."""
+        with self._lock:
+            snapshot, generation, cached = self.snapshot, self.generation, self._board
+        if cached is not None and cached[0] == generation and cached[1] is catalog:
+            return cached[2]
+        board = snapshot_leaderboard(catalog.tasks, snapshot.vote_table or VoteTable(), snapshot.aggregates,
+                                     catalog.key_positions)
+        with self._lock:
+            if self.generation == generation:
+                self._board = (generation, catalog, board)
+        return board
+
+    def _publish(self, candidate: LiveSnapshot) -> int:
+        # Publication atomique (sous le verrou) : les lecteurs gardent l'ancien objet intact
+        self.snapshot = candidate
+        self.generation += 1
+        self._board = None
+        return self.generation
+
+
+def _updated_vote_table(snapshot: LiveSnapshot) -> VoteTable:
+    if snapshot.vote_table is None or snapshot.changed_votes is None:
+        return VoteTable.build(snapshot.votes)
+    return snapshot.vote_table.patched(snapshot.votes, snapshot.changed_votes)
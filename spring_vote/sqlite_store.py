@@ -0,0 +1,215 @@
+"""Stockage local SQLite (mode hors cloud), interchangeable avec ``JournalStore``.
+
+Même interface : ``load()`` retourne ``(votes, users, additional_tasks)`` au
+format de la RTDB et ``apply(changes)`` applique une liste de
+``(chemin, valeur)`` (valeur None = suppression), ici dans une seule
+transaction SQL. Le fichier est ouvert en mode WAL : plusieurs sessions (ou
+processus) écrivent sans s'écraser, les lectures ne bloquent pas les écritures.
+
+Schéma :
+
+    votes(task_key, user_id, score, ts, user_name, vote_id)  UNIQUE(task_key, user_id)
+    users(user_id PRIMARY KEY, name, created_at, tokens)      tokens en JSON
+    tasks(id PRIMARY KEY, name, data)                         data = tâche complète en JSON
+
+La règle « un vote par utilisateur et par tâche » est portée par la clé unique
+(upsert), et les compteurs du classement sont calculés par un ``GROUP BY``
+(``aggregates``, même forme que les compteurs serveur ``aggregates/``).
+Au premier lancement, une base vide est initialisée depuis les fichiers JSON
+(et le journal) existants.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from spring_vote.aggregates import SCORES
+from spring_vote.journal_store import JOURNAL_FILE, SNAPSHOT_FILES, JournalStore
+from spring_vote.token_ledger import apply_deltas
+from spring_vote.vote_utils import flatten_user_votes
+
+DB_FILE = "spring_meeting.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS votes (
+    task_key  TEXT NOT NULL,
+    user_id   TEXT NOT NULL,
+    score     INTEGER NOT NULL,
+    ts        TEXT,
+    user_name TEXT,
+    vote_id   TEXT,
+    UNIQUE (task_key, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_votes_user ON votes (user_id);
+CREATE TABLE IF NOT EXISTS users (
+    user_id    TEXT PRIMARY KEY,
+    name       TEXT,
+    created_at TEXT,
+    tokens     TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id   TEXT PRIMARY KEY,
+    name TEXT,
+    data TEXT NOT NULL
+);
+"""
+
+# L'index UNIQUE (task_key, user_id) sert aussi les recherches et GROUP BY par task_key
+_UPSERT_VOTE = """
+INSERT INTO votes (task_key, user_id, score, ts, user_name, vote_id) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (task_key, user_id) DO UPDATE SET
+    score = excluded.score, ts = excluded.ts, user_name = excluded.user_name, vote_id = excluded.vote_id
+"""
+
+_AGGREGATES = """
+SELECT task_key, SUM(score), COUNT(*),
+       SUM(score = 1), SUM(score = 2), SUM(score = 3), SUM(score = 4), SUM(score = 5)
+FROM votes GROUP BY task_key
+"""
+
+
+def _latest_vote(user_votes):
+    votes = [v for v in flatten_user_votes(user_votes) if isinstance(v, dict) and v.get('score') is not None]
+    if not votes:
+        return None
+    return max(votes, key=lambda v: v.get('timestamp') or '')
+
+
+def _user_record(name, created_at, tokens) -> dict:
+    record = {'name': name, 'tokens': json.loads(tokens) if tokens else {}}
+    if created_at:
+        record['created_at'] = created_at
+    return record
+
+
+class SqliteStore:
+    """Base SQLite partagée par les sessions d'un processus (une connexion, verrouillée)."""
+
+    def __init__(self, directory: str = '.', filename: str = DB_FILE, busy_timeout: float = 5.0):
+        self.directory = directory
+        self.path = os.path.join(directory, filename)
+        self._lock = threading.RLock()
+        is_new = not os.path.exists(self.path)
+        self._conn = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if is_new:
+            self._import_legacy_files()
+
+    def _import_legacy_files(self):
+        legacy = [os.path.join(self.directory, f) for f in (*SNAPSHOT_FILES.values(), JOURNAL_FILE)]
+        if not any(os.path.exists(p) for p in legacy):
+            return
+        journal = JournalStore(self.directory)
+        votes, users, additional_tasks = journal.load()
+        journal.close()
+        changes = [(('votes', tk, uid), uv) for tk, tv in votes.items() for uid, uv in (tv or {}).items()]
+        changes += [(('users', uid), rec) for uid, rec in users.items()]
+        changes += [(('additional_tasks', str(t.get('id'))), t) for t in additional_tasks if isinstance(t, dict)]
+        self.apply(changes)
+
+    # ---- Lecture ----
+    def load(self):
+        """Retourne ``(votes, users, additional_tasks)`` au format de la RTDB (un vote par liste)."""
+        with self._lock:
+            vote_rows = self._conn.execute(
+                "SELECT task_key, user_id, score, ts, user_name, vote_id FROM votes").fetchall()
+            user_rows = self._conn.execute("SELECT user_id, name, created_at, tokens FROM users").fetchall()
+            task_rows = self._conn.execute("SELECT data FROM tasks ORDER BY rowid").fetchall()
+        votes = {}
+        for task_key, user_id, score, ts, user_name, vote_id in vote_rows:
+            vote = {'score': score, 'timestamp': ts, 'user_name': user_name}
+            if vote_id:
+                vote['vote_id'] = vote_id
+            votes.setdefault(task_key, {})[user_id] = [vote]
+        users = {user_id: _user_record(*rest) for user_id, *rest in user_rows}
+        additional_tasks = [json.loads(data) for (data,) in task_rows]
+        return votes, users, additional_tasks
+
+    def user(self, user_id: str):
+        """Enregistrement d'un utilisateur, ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, created_at, tokens FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return _user_record(*row) if row is not None else None
+
+    def user_votes(self, user_id: str) -> dict:
+        """Votes d'un utilisateur ``{task_key: {vote_id, score}}`` (index ``idx_votes_user``)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_key, vote_id, score FROM votes WHERE user_id = ?", (user_id,)).fetchall()
+        return {task_key: {'vote_id': vote_id, 'score': score} for task_key, vote_id, score in rows}
+
+    def aggregates(self) -> dict:
+        """Compteurs par clé de tâche ``{task_key: {sum, count, histogram}}`` calculés par la base
+        (``GROUP BY task_key``)."""
+        with self._lock:
+            rows = self._conn.execute(_AGGREGATES).fetchall()
+        return {task_key: {'sum': total or 0, 'count': count,
+                           'histogram': {str(score): n for score, n in zip(SCORES, histogram) if n}}
+                for task_key, total, count, *histogram in rows}
+
+    # ---- Écriture ----
+    def apply(self, changes, token_deltas: dict = None) -> dict:
+        """Applique ``[(chemin, valeur ou None)]`` dans une seule transaction. ``token_deltas``
+        ``{user_id: {type de vote: variation}}`` est appliqué aux tokens lus dans cette même transaction
+        (``InsufficientTokens`` : tout est annulé). Retourne les nouveaux tokens par utilisateur."""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for path, value in changes:
+                    self._apply_change(cur, [str(p) for p in path], value)
+                tokens = {}
+                for user_id, deltas in (token_deltas or {}).items():
+                    row = cur.execute("SELECT tokens FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                    tokens[user_id] = apply_deltas(json.loads(row[0]) if row and row[0] else {}, deltas)
+                    self._apply_change(cur, ['users', user_id, 'tokens'], tokens[user_id])
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+        return tokens
+
+    def _apply_change(self, cur, path, value):
+        area, rest = path[0], path[1:]
+        if area == 'votes' and len(rest) == 2:
+            task_key, user_id = rest
+            vote = _latest_vote(value) if value is not None else None
+            if vote is None:
+                cur.execute("DELETE FROM votes WHERE task_key = ? AND user_id = ?", (task_key, user_id))
+            else:
+                cur.execute(_UPSERT_VOTE, (task_key, user_id, int(vote['score']), vote.get('timestamp'),
+                                           vote.get('user_name'), vote.get('vote_id')))
+        elif area == 'votes' and len(rest) == 1 and value is None:
+            cur.execute("DELETE FROM votes WHERE task_key = ?", (rest[0],))
+        elif area == 'users' and len(rest) == 1:
+            if value is None:
+                cur.execute("DELETE FROM users WHERE user_id = ?", (rest[0],))
+            else:
+                cur.execute(
+                    "INSERT INTO users (user_id, name, created_at, tokens) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET "
+                    "name = excluded.name, created_at = excluded.created_at, tokens = excluded.tokens",
+                    (rest[0], value.get('name'), value.get('created_at'), json.dumps(value.get('tokens') or {})))
+        elif area == 'users' and len(rest) == 2 and rest[1] == 'tokens':
+            cur.execute(
+                "INSERT INTO users (user_id, tokens) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET tokens = excluded.tokens",
+                (rest[0], json.dumps(value or {})))
+        elif area == 'additional_tasks' and len(rest) == 1:
+            if value is None:
+                cur.execute("DELETE FROM tasks WHERE id = ?", (rest[0],))
+            else:
+                cur.execute(
+                    "INSERT INTO tasks (id, name, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET name = excluded.name, data = excluded.data",
+                    (rest[0], value.get('name'), json.dumps(value, ensure_ascii=False)))
+        else:
+            raise ValueError(f"Chemin non pris en charge par le stockage SQLite : {'/'.join(path)}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
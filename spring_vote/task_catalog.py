@@ -0,0 +1,134 @@
+"""Catalogue des tâches (CSV + tâches proposées), construit une fois par version.
+
+Le catalogue est immuable : l'application le mémorise par
+``(version du CSV, version des tâches proposées)`` et ne le reconstruit que
+lorsque l'une des deux change. Les colonnes du CSV sont lues en bloc (pas de
+``iterrows``) et les tâches proposées converties par pandas.
+
+Recherches disponibles sans parcours de la liste :
+
+    canonical_keys[key]       clé de vote canonique (``task_key_from_task``) d'une clé historique
+    alias_keys[canonical]     clés de vote d'une tâche, la canonique d'abord (votes non migrés)
+    key_positions[key]        position de la tâche dans ``tasks`` (classement)
+"""
+import os
+
+import pandas as pd
+
+from spring_vote.vote_utils import sanitize_key, task_key_aliases, task_key_from_task
+
+CSV_DESCRIPTION_FALLBACK = "Description non fournie dans le CSV."
+_CSV_COLUMNS = {
+    'cost_score': 'Score_Prix',
+    'complexity_score': 'Score_Complexité',
+    'interest_score': 'Score_Intérêt',
+    'total_score': 'Score_Total',
+}
+_PROPOSED_SCORES = ('cost', 'complexity', 'interest')
+
+
+def file_version(path: str):
+    """Version d'un fichier (mtime en ns, taille), ou None s'il n'existe pas."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def tasks_version(additional_tasks) -> tuple:
+    """Version des tâches proposées : leurs identifiants, dans l'ordre du stockage."""
+    return tuple(str(t.get('id')) for t in additional_tasks or () if isinstance(t, dict))
+
+
+def _latin1_name(name: str) -> str:
+    """Nom tel que le lisaient les versions qui décodaient le CSV (cp1252) en ISO-8859-1 (ex. « – » -> ``\\x96``)."""
+    try:
+        return name.encode('cp1252').decode('latin-1')
+    except UnicodeError:
+        return name
+
+
+def _latin1_keys(name: str) -> list:
+    """Clés de vote historiques d'un nom dont l'orthographe ISO-8859-1 diffère : nom brut et nettoyé
+    (mode local), et identifiant écrit avec le nom correctement décodé."""
+    legacy = _latin1_name(name)
+    if legacy == name:
+        return []
+    return sorted({sanitize_key(legacy), legacy, sanitize_key(f"csv_{name}")})
+
+
+def _csv_tasks(df: pd.DataFrame) -> list:
+    if df is None or 'Nouveau_Nom' not in df.columns:
+        return []
+    names = df['Nouveau_Nom'].tolist()
+    columns = {
+        'name': names,
+        'description': (df['Description'].tolist() if 'Description' in df.columns
+                        else [CSV_DESCRIPTION_FALLBACK] * len(names)),
+    }
+    for field, column in _CSV_COLUMNS.items():
+        columns[field] = df[column].tolist()
+    columns['source'] = ['csv'] * len(names)
+    # Identifiant dérivé du nom tel qu'il a toujours été lu : les clés de vote existantes restent canoniques
+    columns['id'] = [f"csv_{_latin1_name(name)}" for name in names]
+    columns['legacy_keys'] = [_latin1_keys(name) for name in names]
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def _proposed_tasks(additional_tasks) -> list:
+    rows = [t for t in additional_tasks or () if isinstance(t, dict)]
+    if not rows:
+        return []
+    frame = pd.DataFrame(rows)
+    scores = frame[list(_PROPOSED_SCORES)].astype(float)
+    columns = {
+        'name': frame['name'].tolist(),
+        'description': frame['description'].tolist(),
+        'cost_score': scores['cost'].tolist(),
+        'complexity_score': scores['complexity'].tolist(),
+        'interest_score': scores['interest'].tolist(),
+        'total_score': (scores.sum(axis=1) / len(_PROPOSED_SCORES)).tolist(),
+        'source': ['proposed'] * len(rows),
+        'proposed_by': frame['proposed_by'].tolist(),
+        'id': frame['id'].tolist(),
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+class TaskCatalog:
+    """Tâches triées par nom (ordre fixe du vote collectif) et leurs index de recherche."""
+
+    def __init__(self, tasks: list):
+        self.tasks = sorted(tasks, key=lambda t: t['name'].lower())
+        self.names = [t['name'] for t in self.tasks]
+        self.canonical_keys = {}
+        self.key_positions = {}
+        for pos, task in enumerate(self.tasks):
+            canonical = task_key_from_task(task)
+            for key in task_key_aliases(task):
+                self.canonical_keys.setdefault(key, canonical)
+                self.key_positions.setdefault(key, pos)
+        self.alias_keys = {}
+        for key, canonical in self.canonical_keys.items():
+            keys = self.alias_keys.setdefault(canonical, [canonical])
+            if key != canonical:
+                keys.append(key)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, additional_tasks) -> 'TaskCatalog':
+        return cls(_csv_tasks(df) + _proposed_tasks(additional_tasks))
+
+    def legacy_keys(self, votes: dict) -> dict:
+        """Clés de ``votes`` à fusionner dans leur clé canonique : ``{clé historique: clé canonique}``."""
+        return {key: self.canonical_keys[key] for key in votes or {}
+                if key in self.canonical_keys and self.canonical_keys[key] != key}
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __getitem__(self, index):
+        return self.tasks[index]
+
+    def __iter__(self):
+        return iter(self.tasks)
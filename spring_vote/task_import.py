@@ -0,0 +1,110 @@
+"""Import en lot de tâches proposées (fichier CSV ou JSON déposé par l'admin).
+
+Formats acceptés :
+
+    CSV    une ligne par tâche, séparateur ``;`` ou ``,`` (détecté), encodage
+           UTF-8 ou cp1252 ; en-têtes ``nom``/``name``, ``description``,
+           ``cout``/``cost``, ``complexite``/``complexity``, ``interet``/``interest``
+    JSON   liste d'objets avec les mêmes champs, ou ``{"tasks": [...]}``, ou
+           ``{id: tâche}`` (export du nœud ``additional_tasks``)
+
+Chaque tâche doit avoir un nom et une description ; les notes vont de 1 à 5
+(3 si absentes, comme dans le formulaire). Les doublons de nom (dans le
+fichier ou avec le catalogue existant, sans tenir compte de la casse) sont
+écartés. Les tâches retenues s'écrivent ensuite en une seule écriture via
+``VoteStore.add_tasks``.
+"""
+import io
+import json
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from spring_vote.csv_ingest import column_id, decode_csv
+
+DEFAULT_SCORE = 3
+SCORE_FIELDS = ('cost', 'complexity', 'interest')
+_FIELD_ALIASES = {
+    'name': ('name', 'nom', 'nouveau_nom', 'tache'),
+    'description': ('description', 'desc'),
+    'cost': ('cost', 'cout', 'score_prix'),
+    'complexity': ('complexity', 'complexite', 'score_complexite'),
+    'interest': ('interest', 'interet', 'score_interet'),
+}
+_FIELDS_BY_ID = {alias: field for field, aliases in _FIELD_ALIASES.items() for alias in aliases}
+
+
+class TaskImport:
+    """Résultat de l'analyse d'un fichier : tâches prêtes à écrire et lignes écartées."""
+
+    def __init__(self, tasks: list, rejected: list):
+        self.tasks = tasks
+        # [(numéro de ligne ou d'élément, nom, raison)]
+        self.rejected = rejected
+
+
+def _records(filename: str, raw: bytes) -> list:
+    if filename.lower().endswith('.json'):
+        data = json.loads(decode_csv(raw))
+        if isinstance(data, dict):
+            data = data.get('tasks', list(data.values()))
+        if not isinstance(data, list):
+            raise ValueError("Le JSON doit contenir une liste de tâches")
+        return [item if isinstance(item, dict) else {} for item in data]
+    frame = pd.read_csv(io.StringIO(decode_csv(raw)), sep=None, engine='python', dtype=str,
+                        keep_default_na=False)
+    return frame.to_dict('records')
+
+
+def _normalized(record: dict) -> dict:
+    fields = {}
+    for key, value in record.items():
+        field = _FIELDS_BY_ID.get(column_id(key))
+        if field and field not in fields:
+            fields[field] = value
+    return fields
+
+
+def _score(value):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return DEFAULT_SCORE
+    score = float(str(value).replace(',', '.'))
+    if score != int(score) or not 1 <= score <= 5:
+        raise ValueError
+    return int(score)
+
+
+def parse_task_file(filename: str, raw: bytes, existing_names=(), proposed_by: str = 'admin') -> TaskImport:
+    """Lit, valide et dédoublonne les tâches d'un fichier déposé. Lève ``ValueError`` si le fichier est illisible."""
+    seen = {str(name).strip().casefold() for name in existing_names}
+    timestamp = datetime.now().isoformat()
+    tasks, rejected = [], []
+    for line, record in enumerate(_records(filename, raw), start=1):
+        fields = _normalized(record)
+        name = str(fields.get('name') or '').strip()
+        description = str(fields.get('description') or '').strip()
+        if not name:
+            rejected.append((line, name, "nom manquant"))
+            continue
+        if not description:
+            rejected.append((line, name, "description manquante"))
+            continue
+        if name.casefold() in seen:
+            rejected.append((line, name, "nom déjà présent"))
+            continue
+        try:
+            scores = {field: _score(fields.get(field)) for field in SCORE_FIELDS}
+        except (TypeError, ValueError, OverflowError):
+            rejected.append((line, name, "note hors de 1 à 5"))
+            continue
+        seen.add(name.casefold())
+        tasks.append({
+            'id': str(uuid.uuid4()),
+            'name': name,
+            'description': description,
+            **scores,
+            'proposed_by': proposed_by,
+            'timestamp': timestamp,
+        })
+    return TaskImport(tasks, rejected)
@@ -0,0 +1,109 @@
+"""Registre des tokens de vote : opérations atomiques sur ``users/{id}/tokens``.
+
+Toutes les variations d'une opération (par ex. remboursement d'un ``votes_3``
+et débit d'un ``votes_5`` lors d'une correction) sont appliquées dans une seule
+transaction sur le nœud ``tokens`` de l'utilisateur. Le résultat
+(``applied``, ``tokens``) est déterminé dans la transaction elle-même : pas de
+relecture après coup, donc pas de course avec une autre session.
+
+Un débit qui ferait passer un compteur sous zéro annule toute l'opération
+(rien n'est écrit). Un remboursement ne dépasse jamais la dotation initiale.
+"""
+
+
+class LedgerResult:
+    """Issue d'une opération : ``applied``, l'état des tokens après (ou au moment du refus) et les
+    variations réellement appliquées (``deltas`` : un remboursement plafonné compte pour ce qu'il a rendu)."""
+
+    __slots__ = ('applied', 'tokens', 'deltas')
+
+    def __init__(self, applied: bool, tokens: dict, deltas: dict = None):
+        self.applied = applied
+        self.tokens = tokens
+        self.deltas = deltas or {}
+
+    def __iter__(self):
+        return iter((self.applied, self.tokens))
+
+    def __repr__(self):
+        return f"LedgerResult(applied={self.applied}, tokens={self.tokens}, deltas={self.deltas})"
+
+
+class InsufficientTokens(Exception):
+    """Un débit ferait passer un compteur sous zéro ; ``tokens`` : état au moment du refus."""
+
+    def __init__(self, tokens):
+        super().__init__('insufficient tokens')
+        self.tokens = tokens
+
+
+def _as_int(value) -> int:
+    try:
+        return int(value) if value is not None else 0
+    except Exception:
+        return 0
+
+
+def apply_deltas(tokens, deltas: dict, limits: dict = None) -> dict:
+    """Applique des variations à un état de tokens. Lève ``InsufficientTokens`` si un compteur deviendrait négatif."""
+    current = {k: _as_int(v) for k, v in tokens.items()} if isinstance(tokens, dict) else {}
+    updated = dict(current)
+    for vote_type, delta in deltas.items():
+        value = current.get(vote_type, 0) + delta
+        if value < 0:
+            raise InsufficientTokens(current)
+        if delta > 0 and limits and vote_type in limits:
+            # Ne pas incrémenter au-delà du maximum défini
+            value = min(value, max(limits[vote_type], current.get(vote_type, 0)))
+        updated[vote_type] = value
+    return updated
+
+
+class TokenLedger:
+    """Opérations groupées sur les tokens d'un utilisateur, en une transaction chacune."""
+
+    def __init__(self, firebase_ref, limits: dict = None):
+        self._ref = firebase_ref
+        self.limits = limits or {}
+
+    def _tokens_ref(self, user_id: str):
+        return self._ref.child('users').child(user_id).child('tokens')
+
+    def apply(self, user_id: str, deltas: dict) -> LedgerResult:
+        """Applique toutes les variations ``{vote_type: delta}`` atomiquement, ou aucune."""
+        deltas = {k: d for k, d in deltas.items() if d}
+        if not deltas:
+            return LedgerResult(True, None)
+        outcome = {}
+
+        def _txn(cur):
+            # Peut être rejouée par le SDK en cas de conflit : seul le dernier passage compte
+            try:
+                updated = apply_deltas(cur, deltas, self.limits)
+            except InsufficientTokens as e:
+                outcome['rejected'] = e.tokens
+                raise
+            outcome.pop('rejected', None)
+            before = cur if isinstance(cur, dict) else {}
+            outcome['deltas'] = {t: updated[t] - _as_int(before.get(t)) for t in deltas
+                                 if updated[t] != _as_int(before.get(t))}
+            return updated
+
+        try:
+            new_tokens = self._tokens_ref(user_id).transaction(_txn)
+        except InsufficientTokens:
+            return LedgerResult(False, outcome.get('rejected', {}))
+        return LedgerResult(True, new_tokens, outcome.get('deltas'))
+
+    def debit(self, user_id: str, vote_type: str) -> LedgerResult:
+        return self.apply(user_id, {vote_type: -1})
+
+    def refund(self, user_id: str, vote_type: str) -> LedgerResult:
+        return self.apply(user_id, {vote_type: 1})
+
+    def swap(self, user_id: str, debit_type: str, refund_type: str = None) -> LedgerResult:
+        """Correction de vote : rembourse ``refund_type`` et débite ``debit_type`` en une transaction."""
+        deltas = {debit_type: -1}
+        if refund_type:
+            deltas[refund_type] = deltas.get(refund_type, 0) + 1
+        return self.apply(user_id, deltas)
@@ -0,0 +1,70 @@
+"""Enregistrements utilisateur déjà vérifiés, partagés par les sessions d'un processus.
+
+``VoteStore.ensure_user`` coûte une lecture (et parfois une écriture) de
+``users/{id}``. Une fois l'enregistrement vérifié, les relances suivantes de
+la page n'ont pas à le relire : le registre retient ``user_id -> nom`` et
+l'appel est évité tant que l'entrée est valide.
+
+Une entrée est revalidée :
+
+    à la connexion                  ``ensure(..., force=True)``
+    sur événement ``users/{id}``    ``invalidate_topics(topics)`` (flux ``listen()``)
+    après ``ttl`` secondes          filet de sécurité si aucun événement n'est reçu
+
+``stats()`` compte les lectures effectuées et celles évitées.
+"""
+import threading
+import time
+
+from spring_vote.live_events import ALL
+
+DEFAULT_TTL = 600.0
+
+
+class UserRegistry:
+    """Cache TTL des enregistrements utilisateur vérifiés dans le stockage."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self.fetches = 0
+        self.avoided = 0
+        self.invalidations = 0
+        self._verified = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, store, user_id: str, user_name: str, tokens: dict, force: bool = False) -> bool:
+        """Crée l'utilisateur ou met son nom à jour si nécessaire. Retourne True si le stockage a été lu."""
+        with self._lock:
+            entry = self._verified.get(user_id)
+            if (not force and entry is not None and entry[0] == user_name
+                    and time.monotonic() - entry[1] < self.ttl):
+                self.avoided += 1
+                return False
+        store.ensure_user(user_id, user_name, tokens)
+        with self._lock:
+            self._verified[user_id] = (user_name, time.monotonic())
+            self.fetches += 1
+        return True
+
+    def invalidate(self, user_id: str = None):
+        """Oublie un utilisateur (ou tous) : la prochaine vérification relira le stockage."""
+        with self._lock:
+            if user_id is None:
+                self._verified.clear()
+            else:
+                self._verified.pop(user_id, None)
+            self.invalidations += 1
+
+    def invalidate_topics(self, topics):
+        """Invalide les utilisateurs touchés par des sujets d'événements (cf. ``event_topics``)."""
+        for topic in topics:
+            if topic == ALL or topic == ('users', '*'):
+                self.invalidate()
+                return
+            if topic[0] == 'users':
+                self.invalidate(topic[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'fetches': self.fetches, 'avoided': self.avoided,
+                    'invalidations': self.invalidations, 'cached': len(self._verified)}
@@ -0,0 +1,67 @@
+"""Index secondaire des votes par participant.
+
+Chaque écriture de vote maintient, dans le même ``update`` multi-chemins :
+
+    user_votes/{user_id}/{task_key} -> {vote_id, score}
+
+Les votes d'un participant (vote existant, réinitialisation admin) se lisent
+alors dans son seul sous-arbre au lieu de parcourir tout le nœud ``votes``.
+La note est gardée à côté du push id : la réinitialisation peut retirer les
+votes des compteurs ``aggregates`` sans relire chaque vote.
+
+``user_vote_index_from_votes`` reconstruit l'index à partir des votes bruts
+(données écrites avant l'index). Tant que ``rebuild_user_vote_index`` n'a pas
+été exécuté, l'index peut être partiel : ``index_complete`` le dit (marqueur
+``user_votes_complete`` écrit avec l'index reconstruit).
+"""
+from datetime import datetime
+
+from spring_vote.aggregates import aggregate_delta_updates
+from spring_vote.vote_utils import flatten_user_votes
+
+USER_VOTES_ROOT = 'user_votes'
+USER_VOTES_COMPLETE = 'user_votes_complete'
+
+
+def index_entry(user_votes) -> dict:
+    """Entrée d'index du vote le plus récent d'un participant sur une tâche, ou None."""
+    votes = [v for v in flatten_user_votes(user_votes) if isinstance(v, dict) and v.get('score') is not None]
+    if not votes:
+        return None
+    latest = max(votes, key=lambda v: v.get('timestamp') or '')
+    return {'vote_id': latest.get('vote_id'), 'score': latest['score']}
+
+
+def user_vote_index_from_votes(votes: dict) -> dict:
+    """Nœud ``user_votes`` complet recalculé depuis ``votes/{task_key}/{user_id}``."""
+    node = {}
+    for task_key, task_votes in (votes or {}).items():
+        for user_id, user_votes in (task_votes or {}).items():
+            entry = index_entry(user_votes)
+            if entry is not None:
+                node.setdefault(user_id, {})[task_key] = entry
+    return node
+
+
+def removal_updates(user_id: str, entries: dict) -> dict:
+    """``update`` supprimant tous les votes indexés d'un participant, leurs compteurs serveur et son index."""
+    updates = {}
+    for task_key, entry in (entries or {}).items():
+        updates[f'votes/{task_key}/{user_id}'] = None
+        score = entry.get('score') if isinstance(entry, dict) else None
+        updates.update(aggregate_delta_updates(task_key, removed_scores=[score]))
+    updates[f'{USER_VOTES_ROOT}/{user_id}'] = None
+    return updates
+
+
+def index_complete(firebase_ref) -> bool:
+    """L'index couvre-t-il tous les votes (reconstruit depuis ``votes`` au moins une fois) ?"""
+    return bool(firebase_ref.child(USER_VOTES_COMPLETE).get())
+
+
+def rebuild_user_vote_index(firebase_ref) -> dict:
+    """Relit tous les votes et réécrit ``user_votes`` et son marqueur de complétude en une seule écriture.
+    Retourne le nouveau nœud."""
+    node = user_vote_index_from_votes(firebase_ref.child('votes').get() or {})
+    firebase_ref.update({USER_VOTES_ROOT: node, USER_VOTES_COMPLETE: datetime.now().isoformat()})
+    return node
@@ -0,0 +1,161 @@
+"""Enregistrement d'un vote (ou de sa correction) en une seule écriture atomique.
+
+Un changement de vote touche le vote de l'utilisateur, ses tokens (remboursement
+de l'ancienne note, débit de la nouvelle), les compteurs ``aggregates``, l'index
+``user_votes`` et les marqueurs de synchronisation. Tout est regroupé dans un seul ``update``
+multi-chemins : le nouveau vote reçoit un push id généré localement et remplace
+le nœud ``votes/{task_key}/{user_id}`` entier (ce qui supprime l'ancien vote
+sans avoir à relire sa clé), et les tokens sont ajustés par incréments serveur.
+Soit tout est appliqué, soit rien. Une correction d'un vote stocké sous une clé
+historique (``previous_key``, données non migrées) supprime aussi cet ancien
+nœud : le vote passe sous la clé canonique sans être compté deux fois.
+
+Le disponible en tokens est vérifié avant l'écriture sur l'état connu du client.
+Le résultat décrit le nouvel état, ce qui évite de relire la base ensuite.
+
+``commit_vote_checked`` est la variante contrôlée côté serveur : les tokens
+passent d'abord par une transaction du ``TokenLedger`` (refus explicite si le
+solde réel est épuisé), puis le reste du vote est écrit en un ``update``. Si
+cet ``update`` lève une erreur, l'écriture a pu aboutir malgré tout (réponse
+perdue) : les tokens ne sont remboursés que si le vote est absent de la base.
+Dans le doute, ils restent débités et une nouvelle tentative ne les débite
+pas une seconde fois.
+"""
+from datetime import datetime
+
+from spring_vote.aggregates import aggregate_delta_updates
+from spring_vote.live_sync import sync_stamp_updates
+from spring_vote.user_votes import USER_VOTES_ROOT
+from spring_vote.vote_utils import generate_push_id
+
+
+class VoteRejected(Exception):
+    """Le vote ne peut pas être enregistré (plus de tokens de ce type)."""
+
+
+class VoteCommitResult:
+    """Nouvel état après un vote : à appliquer tel quel aux données en cache."""
+
+    def __init__(self, task_key, user_id, score, previous_score, vote_id, vote, tokens, token_deltas, stamp, vote_updates,
+                 previous_key=None):
+        self.task_key = task_key
+        self.previous_key = previous_key
+        self.user_id = user_id
+        self.score = score
+        self.previous_score = previous_score
+        self.vote_id = vote_id
+        self.vote = vote
+        self.tokens = tokens
+        self.token_deltas = token_deltas
+        self.stamp = stamp
+        self.vote_updates = vote_updates
+        # Variation de tokens déjà appliquée par le ``TokenLedger`` (cf. ``commit_vote_checked``), et
+        # telle qu'appliquée (remboursement plafonné à la dotation)
+        self.tokens_applied = False
+        self.applied_deltas = {}
+
+    @property
+    def updates(self) -> dict:
+        """``update`` multi-chemins complet : vote, compteurs, index, marqueurs et tokens (par incréments)."""
+        updates = dict(self.vote_updates)
+        for t, delta in self.token_deltas.items():
+            updates[f'users/{self.user_id}/tokens/{t}'] = _increment(delta)
+        return updates
+
+    @property
+    def user_task_votes(self) -> dict:
+        """Contenu de ``votes/{task_key}/{user_id}`` après le vote."""
+        return {self.vote_id: self.vote}
+
+    @property
+    def task_keys(self) -> list:
+        """Clés de vote touchées : la clé du vote et, s'il a été déplacé, sa clé historique."""
+        return [self.task_key, self.previous_key] if self.previous_key else [self.task_key]
+
+
+def _increment(delta):
+    return {'.sv': {'increment': delta}}
+
+
+def build_vote_commit(task_key: str, user_id: str, user_name: str, vote_value: int,
+                      tokens: dict, previous_score: int = None, previous_key: str = None) -> VoteCommitResult:
+    """Prépare l'``update`` multi-chemins d'un vote sans rien écrire. ``previous_key`` : clé sous
+    laquelle le vote corrigé est stocké, si ce n'est pas ``task_key``."""
+    vote_type = f"votes_{vote_value}"
+    if (tokens or {}).get(vote_type, 0) <= 0:
+        raise VoteRejected(vote_type)
+
+    stamp = datetime.now().isoformat()
+    vote_id = generate_push_id()
+    vote = {'score': vote_value, 'timestamp': stamp, 'user_name': user_name}
+
+    new_tokens = dict(tokens)
+    new_tokens[vote_type] -= 1
+    token_deltas = {vote_type: -1}
+    if previous_score is not None:
+        old_type = f"votes_{previous_score}"
+        new_tokens[old_type] = new_tokens.get(old_type, 0) + 1
+        token_deltas[old_type] = token_deltas.get(old_type, 0) + 1
+
+    token_deltas = {t: d for t, d in token_deltas.items() if d}
+    if previous_key == task_key:
+        previous_key = None
+    updates = {f'votes/{task_key}/{user_id}': {vote_id: vote}}
+    updates[f'{USER_VOTES_ROOT}/{user_id}/{task_key}'] = {'vote_id': vote_id, 'score': vote_value}
+    if previous_key:
+        updates[f'votes/{previous_key}/{user_id}'] = None
+        updates[f'{USER_VOTES_ROOT}/{user_id}/{previous_key}'] = None
+        updates.update(aggregate_delta_updates(previous_key, removed_scores=[previous_score]))
+        updates.update(aggregate_delta_updates(task_key, added_scores=[vote_value]))
+    else:
+        updates.update(aggregate_delta_updates(task_key, added_scores=[vote_value], removed_scores=[previous_score]))
+    task_keys = [task_key, previous_key] if previous_key else [task_key]
+    updates.update(sync_stamp_updates(task_keys=task_keys, user_ids=[user_id], stamp=stamp))
+
+    return VoteCommitResult(task_key, user_id, vote_value, previous_score, vote_id, vote, new_tokens, token_deltas, stamp, updates,
+                            previous_key)
+
+
+def commit_vote(firebase_ref, task_key: str, user_id: str, user_name: str, vote_value: int,
+                tokens: dict, previous_score: int = None, previous_key: str = None) -> VoteCommitResult:
+    """Enregistre le vote en un seul aller-retour et retourne le nouvel état."""
+    result = build_vote_commit(task_key, user_id, user_name, vote_value, tokens, previous_score, previous_key)
+    firebase_ref.update(result.updates)
+    return result
+
+
+def commit_vote_checked(firebase_ref, result: VoteCommitResult, ledger) -> VoteCommitResult:
+    """Écrit un vote préparé en laissant le serveur arbitrer les tokens (``TokenLedger``).
+    Lève ``VoteRejected`` si le solde réel ne permet pas le vote. Si l'écriture du vote échoue
+    ensuite, la variation de tokens n'est annulée que si le vote n'a certainement pas été écrit ;
+    rappelée pour le même ``result`` (nouvelle tentative), elle ne débite pas deux fois."""
+    if not result.tokens_applied:
+        outcome = ledger.apply(result.user_id, result.token_deltas)
+        if not outcome.applied:
+            raise VoteRejected(f"votes_{result.score}")
+        result.tokens_applied = True
+        result.applied_deltas = outcome.deltas
+        if outcome.tokens is not None:
+            result.tokens = outcome.tokens
+    try:
+        firebase_ref.update(result.vote_updates)
+    except Exception as error:
+        try:
+            landed = vote_commit_landed(firebase_ref, result)
+        except Exception:
+            # Issue inconnue : les tokens restent débités (jamais de vote sans débit)
+            raise error
+        if landed:
+            return result
+        # Annuler ce qui a été appliqué, pas ce qui était demandé : un remboursement plafonné n'a rien rendu
+        ledger.apply(result.user_id, {t: -d for t, d in result.applied_deltas.items()})
+        result.tokens_applied = False
+        result.applied_deltas = {}
+        raise
+    return result
+
+
+def vote_commit_landed(firebase_ref, result: VoteCommitResult) -> bool:
+    """Vérifie si l'écriture d'un vote a été appliquée (utile avant de la retenter)."""
+    vote_ref = firebase_ref.child('votes').child(result.task_key).child(result.user_id).child(result.vote_id)
+    return vote_ref.get() is not None
@@ -0,0 +1,255 @@
+"""Interface de stockage des votes, indépendante de Streamlit.
+
+Un ``VoteStore`` regroupe les opérations dont l'application a besoin :
+
+    load_snapshot()                 état complet (``LiveSnapshot``)
+    ensure_user(...)                crée l'utilisateur s'il n'existe pas
+    commit_vote(...)                vote ou correction -> ``VoteCommitResult``
+    add_task(task)                  tâche proposée
+    add_tasks(tasks)                plusieurs tâches proposées, en une écriture
+    user_votes(user_id)             votes d'un participant ``{task_key: {vote_id, score}}``
+    reset_user(user_id, tokens)     supprime les votes d'un participant
+    merge_task_keys(plan)           fusionne les clés historiques (cf. ``migrate_task_keys``)
+    watch(callback)                 événements de changement (format ``listen()``)
+
+Implémentations : ``FirebaseVoteStore`` (une référence firebase-admin),
+``LocalVoteStore`` (``JournalStore`` ou ``SqliteStore``) et ``MemoryVoteStore``
+(``FakeRTDB`` en mémoire, latence simulée facultative) pour mesurer le chemin
+de vote hors ligne. ``stats()`` expose les allers-retours effectués.
+"""
+import abc
+from collections import Counter
+from datetime import datetime
+
+from spring_vote.aggregates import aggregate_delta_updates
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.live_events import LocalEventSource
+from spring_vote.live_sync import SYNC_ROOT, LiveSnapshot, full_load, sync_stamp_updates
+from spring_vote.migrate_task_keys import firebase_updates, local_changes, refunds
+from spring_vote.token_ledger import InsufficientTokens
+from spring_vote.user_votes import USER_VOTES_ROOT, index_complete, removal_updates
+from spring_vote.vote_commit import VoteRejected, build_vote_commit, commit_vote
+from spring_vote.vote_utils import flatten_user_votes, sanitize_key
+
+
+class VoteStore(abc.ABC):
+    """Opérations de stockage communes à tous les modes."""
+
+    name = ''
+
+    @abc.abstractmethod
+    def load_snapshot(self) -> LiveSnapshot:
+        """État complet de la base."""
+
+    @abc.abstractmethod
+    def ensure_user(self, user_id: str, user_name: str, tokens: dict):
+        """Crée l'utilisateur avec ``tokens`` s'il n'existe pas, sinon met son nom à jour."""
+
+    @abc.abstractmethod
+    def commit_vote(self, task_key: str, user_id: str, user_name: str, vote_value: int,
+                    tokens: dict, previous_score: int = None, previous_key: str = None):
+        """Vote ou correction en une seule écriture ; retourne le ``VoteCommitResult``."""
+
+    def add_task(self, task: dict):
+        self.add_tasks([task])
+
+    @abc.abstractmethod
+    def add_tasks(self, tasks: list):
+        """Ajoute des tâches proposées en une seule écriture."""
+
+    @abc.abstractmethod
+    def user_votes(self, user_id: str) -> dict:
+        """Votes d'un participant par tâche, lus dans son seul sous-arbre d'index."""
+
+    @abc.abstractmethod
+    def reset_user(self, user_id: str, tokens: dict) -> list:
+        """Supprime tous les votes de l'utilisateur et rétablit ses tokens. Retourne les tâches touchées."""
+
+    @abc.abstractmethod
+    def merge_task_keys(self, plan: dict):
+        """Applique un plan de ``migrate_task_keys.plan_migration`` en une seule écriture."""
+
+    @abc.abstractmethod
+    def watch(self, callback):
+        """Abonne ``callback(event)`` aux changements ; retourne un objet avec ``close()``."""
+
+    def listen(self, callback):
+        # Permet d'utiliser le store comme source d'un ``LiveEventHub``
+        return self.watch(callback)
+
+    def stats(self) -> dict:
+        return {}
+
+    def reset_stats(self):
+        pass
+
+
+def _new_user(user_name: str, tokens: dict) -> dict:
+    return {'name': user_name, 'tokens': dict(tokens), 'created_at': datetime.now().isoformat()}
+
+
+class FirebaseVoteStore(VoteStore):
+    """Realtime Database : chaque opération est un seul ``update`` multi-chemins quand c'est possible."""
+
+    name = 'firebase'
+
+    def __init__(self, firebase_ref):
+        self.ref = firebase_ref
+
+    def load_snapshot(self) -> LiveSnapshot:
+        snapshot = LiveSnapshot()
+        full_load(self.ref, snapshot)
+        return snapshot
+
+    def ensure_user(self, user_id: str, user_name: str, tokens: dict):
+        user_ref = self.ref.child('users').child(user_id)
+        data = user_ref.get()
+        if not data:
+            # Création + marqueur de synchronisation en une seule écriture
+            updates = sync_stamp_updates(user_ids=[user_id])
+            updates[f'users/{user_id}'] = _new_user(user_name, tokens)
+            self.ref.update(updates)
+        elif data.get('name') != user_name:
+            user_ref.child('name').set(user_name)
+
+    def commit_vote(self, task_key, user_id, user_name, vote_value, tokens, previous_score=None, previous_key=None):
+        return commit_vote(self.ref, task_key, user_id, user_name, vote_value, tokens, previous_score, previous_key)
+
+    def add_tasks(self, tasks: list):
+        updates = sync_stamp_updates(tasks=True)
+        for task in tasks:
+            updates[f"additional_tasks/{sanitize_key(task['id'])}"] = task
+        self.ref.update(updates)
+
+    def user_votes(self, user_id: str) -> dict:
+        return self.ref.child(USER_VOTES_ROOT).child(user_id).get() or {}
+
+    def reset_user(self, user_id: str, tokens: dict) -> list:
+        if index_complete(self.ref):
+            # Suppression multi-chemins construite depuis l'index, sans lire le nœud votes
+            entries = self.user_votes(user_id)
+            updates = removal_updates(user_id, entries)
+            task_keys = list(entries)
+        else:
+            updates, task_keys = self._unindexed_removal(user_id)
+        updates[f'users/{user_id}/tokens'] = dict(tokens)
+        updates.update(sync_stamp_updates(task_keys=task_keys, user_ids=[user_id]))
+        self.ref.update(updates)
+        return task_keys
+
+    def _unindexed_removal(self, user_id: str):
+        # Index pas encore reconstruit (votes écrits avant lui) : parcours complet du nœud votes,
+        # qui couvre aussi les votes indexés
+        votes = {task_key: user_votes[user_id] for task_key, user_votes in (self.ref.child('votes').get() or {}).items()
+                 if user_id in (user_votes or {})}
+        updates = removal_updates(user_id, {task_key: None for task_key in votes})
+        for task_key, stored in votes.items():
+            # Retirer aussi ces votes des compteurs serveur
+            removed = [v.get('score') for v in flatten_user_votes(stored) if isinstance(v, dict)]
+            updates.update(aggregate_delta_updates(task_key, removed_scores=removed))
+        return updates, list(votes)
+
+    def merge_task_keys(self, plan: dict):
+        self.ref.update(firebase_updates(plan))
+
+    def watch(self, callback):
+        return self.ref.child(SYNC_ROOT).listen(callback)
+
+
+class MemoryVoteStore(FirebaseVoteStore):
+    """Même logique que ``FirebaseVoteStore`` sur une base en mémoire (benchmarks, essais hors ligne)."""
+
+    name = 'memory'
+
+    def __init__(self, data: dict = None, latency: float = 0.0):
+        self.db = FakeRTDB(data, latency=latency)
+        super().__init__(self.db.reference())
+
+    def stats(self) -> dict:
+        return self.db.stats()
+
+    def reset_stats(self):
+        self.db.reset_stats()
+
+
+class LocalVoteStore(VoteStore):
+    """Stockage local (``JournalStore`` / ``SqliteStore``) ; les changements sont diffusés dans le processus."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = f'local-{type(backend).__name__}'
+        self._events = LocalEventSource()
+        self.calls = Counter()
+
+    def _apply(self, changes, stamps: dict, token_deltas: dict = None) -> dict:
+        self.calls['apply'] += 1
+        tokens = self.backend.apply(changes, token_deltas)
+        # Même forme que les événements du nœud sync/ en mode cloud
+        prefix = SYNC_ROOT + '/'
+        self._events.emit('', {k[len(prefix):]: v for k, v in stamps.items() if k.startswith(prefix)}, 'patch')
+        return tokens
+
+    def load_snapshot(self) -> LiveSnapshot:
+        self.calls['load'] += 1
+        snapshot = LiveSnapshot()
+        snapshot.votes, snapshot.users, snapshot.additional_tasks = self.backend.load()
+        snapshot.loaded = True
+        if hasattr(self.backend, 'aggregates'):
+            # SQLite : compteurs du classement calculés par la base (GROUP BY) plutôt que sur les votes
+            self.calls['aggregates'] += 1
+            snapshot.aggregates = self.backend.aggregates()
+        return snapshot
+
+    def ensure_user(self, user_id: str, user_name: str, tokens: dict):
+        self.calls['user'] += 1
+        data = self.backend.user(user_id)
+        if not data:
+            self._apply([(('users', user_id), _new_user(user_name, tokens))],
+                        sync_stamp_updates(user_ids=[user_id]))
+        elif data.get('name') != user_name:
+            data['name'] = user_name
+            self._apply([(('users', user_id), data)], sync_stamp_updates(user_ids=[user_id]))
+
+    def commit_vote(self, task_key, user_id, user_name, vote_value, tokens, previous_score=None, previous_key=None):
+        result = build_vote_commit(task_key, user_id, user_name, vote_value, tokens, previous_score, previous_key)
+        changes = [(('votes', task_key, user_id), result.user_task_votes)]
+        if result.previous_key:
+            changes.append((('votes', result.previous_key, user_id), None))
+        # Variations appliquées aux tokens stockés, dans la même transaction que le vote : une autre session
+        # du même utilisateur a pu voter depuis que ``tokens`` a été lu
+        try:
+            new_tokens = self._apply(changes, sync_stamp_updates(task_keys=result.task_keys, user_ids=[user_id],
+                                                                 stamp=result.stamp),
+                                     {user_id: result.token_deltas})
+        except InsufficientTokens:
+            raise VoteRejected(f"votes_{vote_value}")
+        result.tokens = new_tokens[user_id]
+        return result
+
+    def add_tasks(self, tasks: list):
+        self._apply([(('additional_tasks', task['id']), task) for task in tasks], sync_stamp_updates(tasks=True))
+
+    def user_votes(self, user_id: str) -> dict:
+        self.calls['user_votes'] += 1
+        return self.backend.user_votes(user_id)
+
+    def reset_user(self, user_id: str, tokens: dict) -> list:
+        task_keys = list(self.user_votes(user_id))
+        changes = [(('votes', tk, user_id), None) for tk in task_keys]
+        changes.append((('users', user_id, 'tokens'), dict(tokens)))
+        self._apply(changes, sync_stamp_updates(task_keys=task_keys, user_ids=[user_id]))
+        return task_keys
+
+    def merge_task_keys(self, plan: dict):
+        to_refund = refunds(plan)
+        task_keys = [k for canonical, (legacy_keys, _, _) in plan.items() for k in (canonical, *legacy_keys)]
+        self._apply(local_changes(plan), sync_stamp_updates(task_keys=task_keys, user_ids=list(to_refund)), to_refund)
+
+    def watch(self, callback):
+        return self._events.listen(callback)
+
+    def stats(self) -> dict:
+        return {'calls': dict(self.calls), 'round_trips': sum(self.calls.values())}
+
+    def reset_stats(self):
+        self.calls.clear()
@@ -0,0 +1,83 @@
+"""Clés Firebase des tâches et lecture des votes stockés (sans dépendance Streamlit)."""
+import random
+import threading
+import time
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+_push_lock = threading.Lock()
+_last_push_time = 0
+_last_rand_chars = [0] * 12
+
+
+def sanitize_key(key: str) -> str:
+    """Sanitize a string to be a valid Firebase RTDB key by replacing forbidden characters.
+    Forbidden: '.', '#', '$', '[', ']', '/', '\\'"""
+    if not isinstance(key, str):
+        key = str(key)
+    forbidden = ['.', '#', '$', '[', ']', '/', '\\']
+    for ch in forbidden:
+        key = key.replace(ch, '_')
+    return key.strip()
+
+
+def task_key_from_task(task: dict) -> str:
+    """Get a stable Firebase key for a task using its id if present, else its name, sanitized."""
+    base = task.get('id') or task.get('name') or 'unknown_task'
+    return sanitize_key(base)
+
+
+def task_key_aliases(task: dict) -> set:
+    """All keys a task's votes may be stored under (id-based, sanitized name, raw name, legacy keys)."""
+    keys = set(task.get('legacy_keys') or ())
+    try:
+        keys.add(task_key_from_task(task))
+    except Exception:
+        pass
+    try:
+        if 'name' in task:
+            keys.add(sanitize_key(task['name']))
+            keys.add(task['name'])
+    except Exception:
+        pass
+    keys.discard('')
+    return keys
+
+
+def flatten_user_votes(user_votes) -> list:
+    """Return a list of vote objects from either a list or a dict of pushIds, including the vote_id."""
+    if isinstance(user_votes, list):
+        # Pour les données legacy qui n'ont pas de vote_id, on ne peut rien faire
+        return user_votes
+    if isinstance(user_votes, dict):
+        # Ajoute la clé du vote (pushId) comme 'vote_id' dans l'objet
+        return [{**v, 'vote_id': k} for k, v in user_votes.items() if isinstance(v, dict)]
+    return []
+
+
+def generate_push_id() -> str:
+    """Generate a chronologically sortable Firebase push id locally (same algorithm as the client SDKs),
+    so that a new child can be written inside a multi-path ``update`` without a ``push()`` round-trip."""
+    global _last_push_time, _last_rand_chars
+    with _push_lock:
+        now = int(time.time() * 1000)
+        duplicate_time = now == _last_push_time
+        _last_push_time = now
+
+        time_chars = []
+        t = now
+        for _ in range(8):
+            time_chars.append(PUSH_CHARS[t % 64])
+            t //= 64
+        push_id = ''.join(reversed(time_chars))
+
+        if not duplicate_time:
+            _last_rand_chars = [random.randrange(64) for _ in range(12)]
+        else:
+            # Même milliseconde : incrémenter les caractères aléatoires pour garder l'ordre
+            i = 11
+            while i >= 0 and _last_rand_chars[i] == 63:
+                _last_rand_chars[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand_chars[i] += 1
+        return push_id + ''.join(PUSH_CHARS[c] for c in _last_rand_chars)
@@ -0,0 +1,160 @@
+"""File d'écritures en arrière-plan (write-behind) pour les votes optimistes.
+
+Le vote est appliqué tout de suite aux données en cache et l'écriture Firebase
+est confiée à un thread unique : les écritures d'un même processus partent dans
+l'ordre de soumission. La file est bornée ; quand elle est pleine, ``submit``
+retourne None et l'appelant écrit de façon synchrone.
+
+Une écriture en échec est retentée avec un délai croissant. Avant chaque
+nouvelle tentative, ``landed`` (facultatif) vérifie si la précédente n'a pas en
+fait abouti (réponse perdue), pour ne pas appliquer deux fois des incréments.
+Les sessions consultent ``status(ticket)`` pour confirmer ou annuler leur
+affichage optimiste, puis ``forget(ticket)``.
+
+Une écriture en échec (ou annulée) appelle son ``rollback`` (facultatif) depuis
+le thread de fond : l'état optimiste est défait même si la session qui l'a
+soumise a disparu (onglet fermé, page rechargée).
+
+Une écriture soumise avec une ``key`` (ex. ``(user_id, task_key)``) a été
+préparée sur l'état optimiste laissé par les précédentes de même clé : une
+correction rembourse le token du vote qu'elle remplace. Quand l'une d'elles
+échoue, celles de même clé soumises avant la fin de son ``rollback`` sont
+annulées sans être tentées (``WriteCancelled``) ; les suivantes, préparées sur
+l'état réel, sont écrites normalement.
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class WriteCancelled(Exception):
+    """Écriture non tentée : elle reposait sur une écriture précédente de même clé qui a échoué."""
+
+
+class WriteBehindQueue:
+    """File bornée d'écritures, traitées dans l'ordre par un thread de fond."""
+
+    def __init__(self, max_pending: int = 256, max_attempts: int = 3, retry_delay: float = 0.2,
+                 non_retryable=(), max_outcomes: int = 4096):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.non_retryable = tuple(non_retryable)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._outcomes = OrderedDict()
+        self._max_outcomes = max_outcomes
+        self._lock = threading.Lock()
+        self._next_ticket = 1
+        # Par clé : premier ticket préparé après le dernier échec (les précédents sont annulés)
+        self._watermarks = {}
+        self._thread = None
+        self.retries = 0
+        self.failures = 0
+        self.rollback_failures = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='spring-write-behind', daemon=True)
+            self._thread.start()
+
+    def submit(self, write, landed=None, key=None, rollback=None):
+        """Met ``write()`` en file. Retourne un ticket, ou None si la file est pleine."""
+        with self._lock:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._outcomes[ticket] = (PENDING, None)
+        try:
+            self._queue.put_nowait((ticket, write, landed, key, rollback))
+        except queue.Full:
+            with self._lock:
+                self._outcomes.pop(ticket, None)
+            return None
+        return ticket
+
+    def status(self, ticket):
+        """``(état, erreur)`` d'une écriture : PENDING, DONE ou FAILED."""
+        with self._lock:
+            return self._outcomes.get(ticket, (DONE, None))
+
+    def forget(self, ticket):
+        """Libère un ticket consulté."""
+        with self._lock:
+            self._outcomes.pop(ticket, None)
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def drain(self, timeout: float = None) -> bool:
+        """Attend que toutes les écritures en file soient traitées (outils et benchmarks)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _cancelled(self, ticket, key) -> bool:
+        with self._lock:
+            return key is not None and ticket < self._watermarks.get(key, 0)
+
+    def _record(self, ticket, outcome):
+        with self._lock:
+            if ticket in self._outcomes:
+                self._outcomes[ticket] = outcome
+            # Les sessions abandonnées ne consultent jamais leurs tickets : on borne l'historique
+            while len(self._outcomes) > self._max_outcomes:
+                self._outcomes.popitem(last=False)
+
+    def _run(self):
+        while True:
+            ticket, write, landed, key, rollback = self._queue.get()
+            try:
+                cancelled = self._cancelled(ticket, key)
+                if cancelled:
+                    outcome = (FAILED, WriteCancelled(key))
+                else:
+                    outcome = self._attempt(write, landed)
+                if outcome[0] == FAILED:
+                    self._roll_back(rollback)
+                    if not cancelled and key is not None:
+                        # État réel rétabli : seules les écritures déjà soumises reposaient sur l'échec
+                        with self._lock:
+                            self._watermarks[key] = self._next_ticket
+                self._record(ticket, outcome)
+            finally:
+                self._queue.task_done()
+
+    def _roll_back(self, rollback):
+        if rollback is None:
+            return
+        try:
+            rollback()
+        except Exception:
+            # La session (si elle est encore là) rechargera l'état réel à sa prochaine relance
+            self.rollback_failures += 1
+
+    def _attempt(self, write, landed):
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+                time.sleep(self.retry_delay * (2 ** (attempt - 1)))
+                try:
+                    if landed is not None and landed():
+                        return (DONE, None)
+                except Exception:
+                    pass
+            try:
+                write()
+                return (DONE, None)
+            except self.non_retryable as e:
+                error = e
+                break
+            except Exception as e:
+                error = e
+        self.failures += 1
+        return (FAILED, error)
@@ -1,15 +1,33 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import json
-import os
+import copy
+import functools
 from datetime import datetime
+import threading
 import uuid
 import time
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import db
+
+from spring_vote.aggregates import rebuild_server_aggregates, total_count
+from spring_vote.csv_ingest import load_tasks_csv
+from spring_vote.firebase_setup import credentials_dict
+from spring_vote.journal_store import JournalStore
+from spring_vote.leaderboard import HIST_COLUMNS, VoteTable, ranked, snapshot_leaderboard, top_by_votes
+from spring_vote.live_events import LiveEventHub
+from spring_vote.live_sync import SYNC_ROOT, LiveSnapshot
+from spring_vote.metrics import ServiceMetrics
+from spring_vote.migrate_task_keys import plan_migration
+from spring_vote.profiling import Profiler
+from spring_vote.shared_cache import SharedSnapshotCache
+from spring_vote.sqlite_store import SqliteStore
+from spring_vote.task_catalog import TaskCatalog, file_version, tasks_version
+from spring_vote.task_import import parse_task_file
+from spring_vote.token_ledger import TokenLedger
+from spring_vote.user_registry import UserRegistry
+from spring_vote.user_votes import rebuild_user_vote_index
+from spring_vote.vote_commit import VoteRejected, build_vote_commit, commit_vote_checked, vote_commit_landed
+from spring_vote.vote_store import FirebaseVoteStore, LocalVoteStore
+from spring_vote.vote_utils import flatten_user_votes, task_key_from_task
+from spring_vote.write_behind import FAILED, PENDING, WriteBehindQueue, WriteCancelled
 
 # Configuration de la page
 st.set_page_config(
@@ -19,6 +37,31 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Votes optimistes : affichage immédiat, écriture Firebase confiée à une file d'arrière-plan
+OPTIMISTIC_VOTES = True
+
+# Stockage du mode local : "sqlite" (base WAL, votes indexés) ou "journal" (fichiers JSON + journal)
+LOCAL_BACKEND = "sqlite"
+
+# Mesure des relances (panneau Performance de l'admin) ; fichier JSON lines facultatif, ex. "spring_profile.jsonl"
+PROFILE_LOG_FILE = None
+# Octets reçus/envoyés par appel Firebase : chaque réponse est sérialisée pour être mesurée (~30 ms par Mo)
+PROFILE_BYTES = False
+
+# Métriques Prometheus (votes, appels Firebase, relances) : endpoint local /metrics sur ce port (ex. 9108)
+# et/ou fichier pour le textfile collector de node_exporter (ex. "/var/lib/node_exporter/spring.prom")
+METRICS_PORT = None
+METRICS_TEXTFILE = None
+
+# Fichier CSV des tâches évaluées
+CSV_FILE = "Evaluation_Taches_SPRING - Copie.csv"
+
+# Classement : nombre de tâches affichées par page (bouton « Afficher plus »)
+LEADERBOARD_PAGE_SIZE = 20
+
+# Intervalle de vérification de la file d'événements (en mémoire, sans requête réseau)
+LIVE_CHECK_INTERVAL = 1
+
 # Configuration des tokens de vote par utilisateur (réduits)
 TOKENS_CONFIG = {
     "votes_5": 3,  # 2 votes à 5/5
@@ -32,23 +75,16 @@ TOKENS_CONFIG = {
 def init_firebase():
     """Initialise Firebase avec les credentials du secret Streamlit"""
     try:
+        # Récupérer les credentials depuis les secrets Streamlit
+        firebase_credentials = st.secrets["firebase"]
+
+        # Import différé : le client Firebase n'est chargé qu'en mode cloud
+        import firebase_admin
+        from firebase_admin import credentials, db
+
         if not firebase_admin._apps:
-            # Récupérer les credentials depuis les secrets Streamlit
-            firebase_credentials = st.secrets["firebase"]
-            
             # Créer un dictionnaire de credentials
-            cred_dict = {
-                "type": firebase_credentials["type"],
-                "project_id": firebase_credentials["project_id"],
-                "private_key_id": firebase_credentials["private_key_id"],
-                "private_key": firebase_credentials["private_key"].replace('\\n', '\n'),
-                "client_email": firebase_credentials["client_email"],
-                "client_id": firebase_credentials["client_id"],
-                "auth_uri": firebase_credentials["auth_uri"],
-                "token_uri": firebase_credentials["token_uri"],
-                "auth_provider_x509_cert_url": firebase_credentials["auth_provider_x509_cert_url"],
-                "client_x509_cert_url": firebase_credentials["client_x509_cert_url"]
-            }
+            cred_dict = credentials_dict(firebase_credentials)
             
             # Initialiser Firebase
             cred = credentials.Certificate(cred_dict)
@@ -56,251 +92,244 @@ def init_firebase():
                 'databaseURL': firebase_credentials["database_url"]
             })
         
-        return db.reference()
+        # Appels à la base chronométrés pour le panneau Performance
+        return get_profiler().wrap(db.reference())
     except Exception as e:
         st.error(f"Erreur initialisation Firebase: {str(e)}")
         # Fallback vers stockage local en cas d'erreur
         return None
 
+@st.cache_resource
+def get_profiler():
+    """Mesures des relances et des appels Firebase, partagées par les sessions du processus"""
+    return Profiler(PROFILE_LOG_FILE, measure_bytes=PROFILE_BYTES)
+
+@st.cache_resource
+def get_metrics():
+    """Registre de métriques du processus, publié sur METRICS_PORT et/ou METRICS_TEXTFILE"""
+    metrics = ServiceMetrics(get_profiler())
+    if METRICS_PORT:
+        try:
+            metrics.registry.serve(METRICS_PORT)
+        except OSError:
+            # Port déjà pris (autre processus) : métriques toujours disponibles via le fichier texte
+            pass
+    if METRICS_TEXTFILE:
+        metrics.registry.start_textfile_writer(METRICS_TEXTFILE)
+    return metrics
+
+def profile_session_id() -> str:
+    if 'profile_session_id' not in st.session_state:
+        st.session_state.profile_session_id = str(uuid.uuid4())
+    return st.session_state.profile_session_id
+
+def profiled_fragment(func):
+    """Mesure la relance partielle d'un fragment comme une relance de la session (sans quoi ses appels
+    seraient comptés en arrière-plan) ; appelé pendant une relance complète, il est mesuré par celle-ci"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = get_profiler()
+        if profiler.current is not None:
+            return func(*args, **kwargs)
+        with profiler.rerun(profile_session_id()), profiler.stage(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+@st.cache_resource
+def warm_up(_firebase_ref):
+    """Premier passage du processus : le snapshot partagé se télécharge en arrière-plan pendant la lecture du CSV"""
+    if _firebase_ref is not None:
+        shared = get_shared_cache()
+        threading.Thread(target=_warm_shared_snapshot, args=(shared, _firebase_ref),
+                         name="warm-up", daemon=True).start()
+    load_csv_data(file_version(CSV_FILE))
+    return True
+
+def _warm_shared_snapshot(shared, firebase_ref):
+    try:
+        shared.refresh(firebase_ref)
+    except Exception:
+        # refresh_live_data retentera et affichera l'erreur dans la session
+        pass
+
+@st.cache_resource
+def get_shared_cache():
+    """Snapshot Firebase unique partagé (en lecture seule) par toutes les sessions du processus"""
+    return SharedSnapshotCache()
+
+@st.cache_resource
+def get_event_hub(_firebase_ref):
+    """Écoute unique (par processus) du nœud sync/ via listen() ; alimente la file d'événements partagée"""
+    shared = get_shared_cache()
+    registry = get_user_registry()
+
+    def on_change(topics):
+        shared.invalidate()
+        registry.invalidate_topics(topics)
+
+    hub = LiveEventHub(_firebase_ref.child(SYNC_ROOT), on_change=on_change)
+    hub.start()
+    return hub
+
+@st.cache_resource
+def get_user_registry():
+    """Utilisateurs déjà vérifiés dans le stockage, partagés par les sessions du processus"""
+    return UserRegistry()
+
+@st.cache_resource
+def get_write_queue():
+    """File d'écritures Firebase en arrière-plan, partagée par toutes les sessions du processus"""
+    write_queue = WriteBehindQueue(non_retryable=(VoteRejected,))
+    write_queue.start()
+    return write_queue
+
 # (Ancien) chargement/écriture Firebase globaux supprimés au profit d'opérations granulaires
 
-def load_data_local():
-    """Charge les données depuis les fichiers locaux (fallback)"""
-    votes = {}
-    users = {}
-    additional_tasks = []
-    
-    # Charger les votes
-    if os.path.exists("votes_spring_meeting.json"):
-        with open("votes_spring_meeting.json", 'r', encoding='utf-8') as f:
-            votes = json.load(f)
-    
-    # Charger les utilisateurs
-    if os.path.exists("users_spring_meeting.json"):
-        with open("users_spring_meeting.json", 'r', encoding='utf-8') as f:
-            users = json.load(f)
-    
-    # Charger les nouvelles tâches
-    if os.path.exists("tasks_spring_meeting.json"):
-        with open("tasks_spring_meeting.json", 'r', encoding='utf-8') as f:
-            additional_tasks = json.load(f)
-    
-    return votes, users, additional_tasks
+@st.cache_resource
+def get_local_store():
+    """Stockage local (base SQLite ou snapshot JSON + journal), partagé par les sessions du processus"""
+    if LOCAL_BACKEND == "sqlite":
+        return SqliteStore('.')
+    return JournalStore('.')
+
+@st.cache_resource
+def get_vote_store(_firebase_ref):
+    """Stockage des votes : Firebase si disponible, sinon stockage local"""
+    if _firebase_ref is not None:
+        return FirebaseVoteStore(_firebase_ref)
+    return LocalVoteStore(get_local_store())
 
-def save_data_local(votes, users, additional_tasks):
-    """Sauvegarde locale (fallback)"""
+# ---- Opérations de stockage (cloud ou local, via VoteStore) ----
+def ensure_user_record(store, user_id: str, user_name: str, force: bool = False):
+    """Ensure a user record with tokens exists in the store and keep its name up to date.
+    Skipped when the user was already verified by this process (unless `force`, e.g. at login).
+    Returns True if the record is known to exist."""
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        files_data = [
-            ("votes_spring_meeting.json", votes),
-            ("users_spring_meeting.json", users),
-            ("tasks_spring_meeting.json", additional_tasks)
-        ]
-        
-        for filename, data in files_data:
-            # Backup du fichier existant
-            if os.path.exists(filename):
-                backup_name = f"{filename}.backup_{timestamp}"
-                os.rename(filename, backup_name)
-            
-            # Sauvegarder les nouvelles données
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        
+        get_user_registry().ensure(store, user_id, user_name, TOKENS_CONFIG, force=force)
         return True
     except Exception as e:
-        st.error(f"Erreur sauvegarde locale: {str(e)}")
+        st.warning(f"Impossible de vérifier/initialiser l'utilisateur: {e}")
         return False
 
-# ---- Utilitaires clés Firebase et opérations granulaires ----
-def sanitize_key(key: str) -> str:
-    """Sanitize a string to be a valid Firebase RTDB key by replacing forbidden characters.
-    Forbidden: '.', '#', '$', '[', ']', '/', '\\'"""
-    if not isinstance(key, str):
-        key = str(key)
-    forbidden = ['.', '#', '$', '[', ']', '/', '\\']
-    for ch in forbidden:
-        key = key.replace(ch, '_')
-    return key.strip()
-
-def task_key_from_task(task: dict) -> str:
-    """Get a stable Firebase key for a task using its id if present, else its name, sanitized."""
-    base = task.get('id') or task.get('name') or 'unknown_task'
-    return sanitize_key(base)
-
-def ensure_user_record(firebase_ref, user_id: str, user_name: str):
-    """Ensure a user record with tokens exists in Firebase. Do nothing in local mode."""
+def record_vote(store, task_key: str, user_id: str, user_name: str, vote_value: int, tokens: dict, previous_vote: dict = None):
+    """Record a vote, replacing a previous one and swapping its token, in a single atomic write.
+    Returns the new state (VoteCommitResult) so no reload is needed, or None on failure."""
     try:
-        if firebase_ref is None:
-            return
-        user_ref = firebase_ref.child('users').child(user_id)
-        data = user_ref.get()
-        if not data:
-            user_ref.set({
-                'name': user_name,
-                'tokens': TOKENS_CONFIG.copy(),
-                'created_at': datetime.now().isoformat()
-            })
-        else:
-            # Keep name up to date
-            if data.get('name') != user_name:
-                user_ref.child('name').set(user_name)
+        previous_score = previous_vote.get('score') if previous_vote else None
+        previous_key = previous_vote.get('task_key') if previous_vote else None
+        with get_metrics().vote_commit('direct', rejected=(VoteRejected,)):
+            return store.commit_vote(task_key, user_id, user_name, vote_value, tokens, previous_score, previous_key)
+    except VoteRejected:
+        st.error("Plus de tokens disponibles pour ce type de vote.")
+        return None
     except Exception as e:
-        st.warning(f"Impossible de vérifier/initialiser l'utilisateur dans le cloud: {e}")
+        st.error(f"Erreur d'enregistrement du vote: {e}")
+        return None
 
-def decrement_token(firebase_ref, user_id: str, vote_type: str) -> bool:
-    """Decrement a user's token counter in Firebase safely. Returns True if decremented."""
+def record_vote_optimistic(firebase_ref, task_key: str, user_id: str, user_name: str, vote_value: int, tokens: dict, previous_vote: dict = None) -> str:
+    """Apply the vote to the shared cache right away and hand the Firebase write to the background queue.
+    Returns 'queued', 'rejected' (no token left) or 'full' (queue saturated: write synchronously instead)."""
+    previous_score = previous_vote.get('score') if previous_vote else None
+    previous_key = previous_vote.get('task_key') if previous_vote else None
     try:
-        if firebase_ref is None:
-            return True  # local mode handled elsewhere
-        tok_ref = firebase_ref.child('users').child(user_id).child('tokens').child(vote_type)
+        result = build_vote_commit(task_key, user_id, user_name, vote_value, tokens, previous_score, previous_key)
+    except VoteRejected:
+        st.error("Plus de tokens disponibles pour ce type de vote.")
+        return 'rejected'
 
-        # Transaction-like decrement
-        def _txn(cur):
-            try:
-                val = int(cur) if cur is not None else 0
-            except Exception:
-                val = 0
-            if val > 0:
-                return val - 1
-            return val
-
-        new_val = tok_ref.transaction(_txn)
-        # If token was 0, it remains 0 -> not decremented
-        try:
-            return int(new_val) >= 0 and int(new_val) != int((tok_ref.get() or 0) + 1)
-        except Exception:
-            return False
-    except Exception:
-        return False
+    # En arrière-plan, les tokens sont arbitrés par une transaction serveur : un solde réellement
+    # épuisé (autre onglet, autre session) est refusé et le vote optimiste annulé
+    ledger = TokenLedger(firebase_ref, TOKENS_CONFIG)
+    metrics = get_metrics()
 
-def increment_token(firebase_ref, user_id: str, vote_type: str) -> bool:
-    """Increment a user's token counter in Firebase safely."""
-    try:
-        if firebase_ref is None:
-            return True  # local mode
-        tok_ref = firebase_ref.child('users').child(user_id).child('tokens').child(vote_type)
+    def write():
+        with metrics.vote_commit('background', rejected=(VoteRejected,)):
+            return commit_vote_checked(firebase_ref, result, ledger)
 
-        def _txn(cur):
-            try:
-                val = int(cur) if cur is not None else 0
-            except Exception:
-                val = 0
-            # Ne pas incrémenter au-delà du maximum défini
-            max_val = TOKENS_CONFIG.get(vote_type, 0)
-            if val < max_val:
-                return val + 1
-            return val
-
-        tok_ref.transaction(_txn)
-        return True
-    except Exception:
-        return False
+    def rollback():
+        # État réel de ce seul vote et des tokens, relu depuis la base
+        shared.reload_votes(firebase_ref, user_id, result.task_keys)
 
-def record_vote(firebase_ref, task_key: str, user_id: str, user_name: str, vote_value: int, previous_vote: dict = None) -> bool:
-    """Record a vote, potentially removing a previous one in a robust way."""
-    try:
-        if firebase_ref is None:
-            return False
-        
-        user_votes_ref = firebase_ref.child('votes').child(task_key).child(user_id)
+    # Affiché avant d'être mis en file : un échec (même très rapide) trouve le vote optimiste à annuler.
+    # Clé (participant, tâche) : si ce vote échoue, les corrections qui le supposent écrit sont annulées
+    shared = get_shared_cache()
+    shared.apply_vote_commit(result)
+    ticket = get_write_queue().submit(write, landed=lambda: vote_commit_landed(firebase_ref, result),
+                                      key=(user_id, task_key), rollback=rollback)
+    if ticket is None:
+        rollback()
+        return 'full'
 
-        # Si un vote précédent existe, le supprimer de manière robuste
-        if previous_vote:
-            # Récupérer tous les votes de l'utilisateur pour cette tâche pour trouver la clé à supprimer
-            existing_votes_snapshot = user_votes_ref.get()
-            
-            # La snapshot peut être un dictionnaire de votes {push_id: vote_obj}
-            if isinstance(existing_votes_snapshot, dict):
-                # Prendre la première clé de vote trouvée (il ne devrait y en avoir qu'une)
-                vote_id_to_delete = next(iter(existing_votes_snapshot), None)
-                
-                if vote_id_to_delete:
-                    # Préparer la suppression atomique
-                    updates = {
-                        f'votes/{task_key}/{user_id}/{vote_id_to_delete}': None
-                    }
-                    firebase_ref.update(updates)
-
-        # Pousser le nouveau vote
-        vote_obj = {
-            'score': vote_value,
-            'timestamp': datetime.now().isoformat(),
-            'user_name': user_name
-        }
-        user_votes_ref.push(vote_obj)
-        
-        # Mettre à jour le timestamp global
-        firebase_ref.child('last_updated').set(datetime.now().isoformat())
-        return True
+    st.session_state.setdefault('pending_writes', {})[ticket] = (f"{vote_value}/5", user_id, result.task_keys)
+    return 'queued'
+
+def reconcile_pending_writes(firebase_ref):
+    """Confirme ou annule les votes optimistes de la session selon le résultat des écritures en arrière-plan"""
+    write_queue = get_write_queue()
+    pending = st.session_state.get('pending_writes', {})
+    failed = []
+    for ticket, (label, user_id, task_keys) in list(pending.items()):
+        state, error = write_queue.status(ticket)
+        if state == PENDING:
+            continue
+        del pending[ticket]
+        write_queue.forget(ticket)
+        if state != FAILED:
+            continue
+        failed.append((user_id, task_keys))
+        if isinstance(error, VoteRejected):
+            st.error(f"Le vote {label} a été refusé (plus de tokens disponibles), il a été annulé.")
+        elif isinstance(error, WriteCancelled):
+            st.error(f"Le vote {label} a été annulé : il corrigeait un vote qui n'a pas pu être enregistré.")
+        else:
+            st.error(f"Le vote {label} n'a pas pu être enregistré, il a été annulé : {error}")
+    if failed:
+        # Annulation déjà faite par la file (rollback) ; relire ces seuls votes et tokens couvre le cas
+        # où elle n'a pas pu joindre la base, sans retélécharger toute la racine
+        try:
+            for user_id, task_keys in failed:
+                get_shared_cache().reload_votes(firebase_ref, user_id, task_keys)
+        except Exception as e:
+            st.error(f"Erreur chargement live: {str(e)}")
+        refresh_live_data(firebase_ref)
+
+def add_additional_tasks(store, firebase_ref, tasks: list) -> bool:
+    """Add tasks under additional_tasks/{id} and update last_updated, in one multi-path write,
+    then apply them to the cached data without reloading the tree."""
+    try:
+        store.add_tasks(tasks)
     except Exception as e:
-        st.error(f"Erreur d'enregistrement du vote (cloud): {e}")
+        st.error(f"Erreur d'ajout de tâche: {e}")
         return False
+    if firebase_ref is not None:
+        get_shared_cache().apply_tasks(tasks)
+    refresh_live_data(firebase_ref)
+    return True
 
-def add_additional_task(firebase_ref, task: dict) -> bool:
-    """Add a new task in Firebase under additional_tasks/{id} and update last_updated."""
+def reset_user_votes(store, user_id: str) -> bool:
+    """Delete all votes of a user and restore their tokens, in one write."""
     try:
-        if firebase_ref is None:
-            return False
-        tid = task.get('id') or str(uuid.uuid4())
-        firebase_ref.child('additional_tasks').child(sanitize_key(tid)).set(task)
-        firebase_ref.child('last_updated').set(datetime.now().isoformat())
+        store.reset_user(user_id, TOKENS_CONFIG.copy())
         return True
     except Exception as e:
-        st.error(f"Erreur d'ajout de tâche (cloud): {e}")
+        st.error(f"Une erreur est survenue lors de la réinitialisation : {e}")
         return False
 
-def _flatten_user_votes(user_votes) -> list:
-    """Return a list of vote objects from either a list or a dict of pushIds, including the vote_id."""
-    if isinstance(user_votes, list):
-        # Pour les données legacy qui n'ont pas de vote_id, on ne peut rien faire
-        return user_votes
-    if isinstance(user_votes, dict):
-        # Ajoute la clé du vote (pushId) comme 'vote_id' dans l'objet
-        return [{**v, 'vote_id': k} for k, v in user_votes.items() if isinstance(v, dict)]
-    return []
-
-def collect_votes_for_task(votes_store: dict, task: dict) -> list:
-    """Collect all vote objects for a given task across possible keys (id-based, sanitized name, raw name)."""
-    keys = set()
-    try:
-        keys.add(task_key_from_task(task))
-    except Exception:
-        pass
-    try:
-        if 'name' in task:
-            keys.add(sanitize_key(task['name']))
-            keys.add(task['name'])
-    except Exception:
-        pass
-    all_votes = []
-    for k in keys:
-        if k and k in votes_store:
-            for uv in votes_store[k].values():
-                all_votes.extend(_flatten_user_votes(uv))
-    return all_votes
-
-def collect_user_votes_for_task(votes_store: dict, task: dict, user_id: str) -> list:
-    """Collect votes for a given task filtered by a specific user_id across possible keys."""
-    keys = set()
-    try:
-        keys.add(task_key_from_task(task))
-    except Exception:
-        pass
-    try:
-        if 'name' in task:
-            keys.add(sanitize_key(task['name']))
-            keys.add(task['name'])
-    except Exception:
-        pass
-    all_votes = []
-    for k in keys:
-        if k and k in votes_store:
-            user_votes = votes_store[k].get(user_id)
-            if user_votes:
-                all_votes.extend(_flatten_user_votes(user_votes))
-    return all_votes
+def collect_user_votes_for_task(votes_store: dict, task_keys: list, user_id: str) -> list:
+    """Collect a user's votes stored under any of a task's keys (legacy keys until migrate_task_keys has run),
+    most recent first; each vote carries the 'task_key' it is stored under."""
+    user_votes = []
+    for key in task_keys:
+        user_votes.extend({**v, 'task_key': key}
+                          for v in flatten_user_votes((votes_store.get(key) or {}).get(user_id)) if isinstance(v, dict))
+    return sorted(user_votes, key=lambda v: v.get('timestamp') or '', reverse=True)
+
+def merge_legacy_task_keys(store, votes: dict, catalog) -> int:
+    """Fusionne les votes stockés sous des clés historiques dans la clé canonique de leur tâche."""
+    plan = plan_migration(votes, catalog)
+    if plan:
+        store.merge_task_keys(plan)
+    return len(plan)
 
 def get_user_tokens(user_id, users):
     """Récupère les tokens restants pour un utilisateur"""
@@ -355,106 +384,515 @@ def format_text_for_hover(text, line_width=90):
     
     return "<br>".join(formatted_lines)
 
-@st.cache_data(ttl=300)  # Cache le CSV pendant 5 minutes (il ne change pas souvent)
-def load_csv_data():
-    """Charge les données du CSV"""
+@st.cache_data(max_entries=2)  # Invalidé par ``csv_version`` (date de modification et taille du fichier)
+def load_csv_data(csv_version=None):
+    """Charge les données du CSV typées et validées, depuis le snapshot binaire si le fichier n'a pas changé"""
     try:
-        df = pd.read_csv('Evaluation_Taches_SPRING - Copie.csv', 
-                        sep=';', 
-                        encoding='iso-8859-1')
-        
-        # Nettoyer les données numériques
-        numeric_cols = ['Cout', 'Score_Prix', 'Score_Complexité', 'Score_Intérêt', 'Score_Total']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.replace(',', '.').astype(float)
-        
-        return df
+        return load_tasks_csv(CSV_FILE)
     except Exception as e:
         st.error(f"Erreur lors du chargement du CSV : {e}")
         return None
 
-def load_live_data(firebase_ref):
-    """Charge les données en temps réel sans cache"""
+def refresh_live_data(firebase_ref, max_age=None) -> bool:
+    """Met à jour les données de session. En mode cloud, elles pointent vers le snapshot partagé,
+    resynchronisé (en delta) au plus une fois toutes les `max_age` secondes pour tout le processus.
+    Retourne True si les données ont changé depuis le dernier affichage de la session."""
+    if firebase_ref is None:
+        # Mode local : copie privée de la session, rechargée depuis le stockage
+        try:
+            snapshot = get_vote_store(firebase_ref).load_snapshot()
+        except Exception as e:
+            st.error(f"Erreur chargement local: {str(e)}")
+            snapshot = LiveSnapshot()
+        st.session_state.votes_data = snapshot.votes
+        st.session_state.users_data = snapshot.users
+        st.session_state.additional_tasks_data = snapshot.additional_tasks
+        st.session_state.last_data_timestamp = snapshot.last_updated
+        st.session_state.vote_table = VoteTable.build(snapshot.votes)
+        st.session_state.vote_counters = snapshot.aggregates
+        return True
+
+    shared = get_shared_cache()
+    profile = get_profiler().current
+    syncs, bytes_before = shared.syncs, profile.db.bytes_down if profile else 0
     try:
-        if firebase_ref is None:
-            return load_data_local()
-        
-        # Charger directement depuis Firebase sans cache
-        data = firebase_ref.get() or {}
-        
-        votes = data.get('votes', {})  # votes par task_key -> user_id -> pushId -> vote
-        users = data.get('users', {})
-        # additional_tasks peut être dict (par id) ou liste
-        additional_tasks_raw = data.get('additional_tasks', {})
-        if isinstance(additional_tasks_raw, dict):
-            additional_tasks = list(additional_tasks_raw.values())
-        else:
-            additional_tasks = additional_tasks_raw or []
-        last_updated = data.get('last_updated', '')
-        
-        return votes, users, additional_tasks, last_updated
+        generation = shared.refresh(firebase_ref, max_age=max_age)
     except Exception as e:
         st.error(f"Erreur chargement live: {str(e)}")
-        return {}, {}, [], ""
+        return False
+    if profile is not None and shared.syncs != syncs and PROFILE_BYTES:
+        # Taille de la synchronisation faite par cette session (les autres réutilisent le snapshot)
+        get_metrics().snapshot_bytes.observe(profile.db.bytes_down - bytes_before)
 
-def check_for_updates(firebase_ref):
-    """Vérifie s'il y a des mises à jour sans recharger la page"""
-    if 'last_data_timestamp' not in st.session_state:
-        st.session_state.last_data_timestamp = ""
+    changed = generation != st.session_state.get('snapshot_generation')
+    st.session_state.snapshot_generation = generation
+
+    # Lecture seule : ces objets sont partagés avec les autres sessions
+    snapshot = shared.snapshot
+    st.session_state.votes_data = snapshot.votes
+    st.session_state.users_data = snapshot.users
+    st.session_state.additional_tasks_data = snapshot.additional_tasks
+    st.session_state.last_data_timestamp = snapshot.last_updated
+    st.session_state.vote_table = snapshot.vote_table or VoteTable()
+    st.session_state.vote_counters = snapshot.aggregates
+    return changed
+
+def current_leaderboard(firebase_ref, catalog, vote_table, vote_counters):
+    """Classement affiché : calculé une fois par génération du snapshot partagé en mode cloud,
+    mémorisé dans la session jusqu'au prochain rechargement en mode local"""
+    if firebase_ref is not None:
+        return get_shared_cache().leaderboard(catalog)
+    memo = st.session_state.get('leaderboard_memo')
+    if memo is None or memo[0] is not vote_table or memo[1] is not vote_counters or memo[2] is not catalog:
+        board = snapshot_leaderboard(catalog.tasks, vote_table, vote_counters, catalog.key_positions)
+        memo = (vote_table, vote_counters, catalog, board)
+        st.session_state.leaderboard_memo = memo
+    return memo[3]
+
+def displayed_data_changed(topics, user_id, users) -> bool:
+    """Indique si des sujets d'événements touchent une donnée affichée par la session"""
+    for area, key in topics:
+        if area in ('*', 'votes', 'additional_tasks'):
+            return True
+        # Les tokens des autres participants ne sont pas affichés, seul leur nombre l'est
+        if area == 'users' and (key == user_id or key not in users):
+            return True
+    return False
+
+@st.fragment(run_every=LIVE_CHECK_INTERVAL)
+@profiled_fragment
+def live_update_watcher(hub):
+    """Fragment léger : relance la page uniquement si un événement touche les données affichées"""
+    seq, topics = hub.changes_since(st.session_state.live_event_seq)
+    if not topics:
+        return
+    st.session_state.live_event_seq = seq
+    user_name = st.session_state.user_name
+    user_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, user_name)) if user_name else None
+    if displayed_data_changed(topics, user_id, st.session_state.users_data):
+        st.session_state.live_update_notice = True
+        st.rerun()
+
+@st.cache_resource(max_entries=4)
+def get_task_catalog(csv_version, proposed_version, _additional_tasks):
+    """Catalogue des tâches (CSV + nouvelles), reconstruit seulement quand le CSV ou les tâches proposées changent"""
+    return TaskCatalog.build(load_csv_data(csv_version), _additional_tasks)
+
+# Verrou anti double-clic (générique)
+LOCK_WINDOW_SEC = 0.5
+
+def is_locked(lock_key: str) -> bool:
+    t = st.session_state.click_locks.get(lock_key)
+    return bool(t and (time.time() - t) < LOCK_WINDOW_SEC)
+
+def lock_now(lock_key: str):
+    st.session_state.click_locks[lock_key] = time.time()
+
+# Panneaux en fragments : un clic dans l'un ne relance que lui. Les données
+# viennent des arguments calculés par main() ; une écriture (vote, tâche,
+# réinitialisation) relance toute la page pour que tous les panneaux la voient.
+
+def go_to_task(index: int):
+    st.session_state.current_task_index = index
+    st.session_state.task_selector = index
+
+def task_selected():
+    st.session_state.current_task_index = st.session_state.task_selector
+
+def show_more_tasks():
+    st.session_state.leaderboard_limit = st.session_state.get('leaderboard_limit', LEADERBOARD_PAGE_SIZE) + LEADERBOARD_PAGE_SIZE
+
+@st.fragment
+@profiled_fragment
+def voting_panel(store, firebase_ref, catalog, votes, user_id, user_name, user_tokens):
+    """Tokens restants, navigation entre les tâches et boutons de vote"""
+    # Affichage des tokens restants
+    st.subheader("🪙 Vos tokens restants :")
+    if st.session_state.get('pending_writes'):
+        st.caption(f"⏳ {len(st.session_state.pending_writes)} vote(s) en cours d'enregistrement…")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"**{user_tokens['votes_5']}** votes ⭐⭐⭐⭐⭐")
+        st.write(f"**{user_tokens['votes_4']}** votes ⭐⭐⭐⭐")
+        st.write(f"**{user_tokens['votes_3']}** votes ⭐⭐⭐")
+    with col2:
+        st.write(f"**{user_tokens['votes_2']}** votes ⭐⭐")
+        st.write(f"**{user_tokens['votes_1']}** votes ⭐")
     
-    try:
-        if firebase_ref is not None:
-            # Vérifier seulement le timestamp de dernière mise à jour
-            last_updated = firebase_ref.child('last_updated').get()
+    st.markdown("---")
+    
+    # Interface de vote avec ordre fixe
+    st.subheader("📊 Vote Collectif - Ordre Fixe")
+    
+    # S'assurer que l'index est dans les limites
+    if st.session_state.current_task_index >= len(catalog):
+        st.session_state.current_task_index = 0
+    
+    current_task = catalog[st.session_state.current_task_index]
+    
+    # Navigation (callbacks : l'index est à jour dès la relance du fragment)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("⬅️ Précédent", disabled=st.session_state.current_task_index == 0,
+                  on_click=go_to_task, args=(st.session_state.current_task_index - 1,))
+    
+    with col2:
+        st.write(f"**Tâche {st.session_state.current_task_index + 1}/{len(catalog)}**")
+    
+    with col3:
+        st.button("➡️ Suivant", disabled=st.session_state.current_task_index == len(catalog) - 1,
+                  on_click=go_to_task, args=(st.session_state.current_task_index + 1,))
+    
+    # Aller directement à une tâche
+    task_names = catalog.names
+    if st.session_state.get('task_selector') != st.session_state.current_task_index:
+        st.session_state.task_selector = st.session_state.current_task_index
+    st.selectbox(
+        "Aller à :", 
+        range(len(task_names)),
+        format_func=lambda x: f"{x+1}. {task_names[x]}",
+        key="task_selector",
+        on_change=task_selected
+    )
+    
+    # Affichage de la tâche actuelle
+    st.markdown("---")
+    st.subheader(f"🎯 {current_task['name']}")
+    
+    # Badge pour les nouvelles tâches
+    if current_task['source'] == 'proposed':
+        st.markdown(f"🆕 **Nouvelle tâche** proposée par *{current_task['proposed_by']}*")
+    
+    # Description
+    st.text_area("Description :", current_task['description'], height=120, disabled=True)
+    
+    # Scores actuels
+    st.write("**Scores actuels :**")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Coût", f"{current_task['cost_score']:.1f}/5")
+    with col2:
+        st.metric("Complexité", f"{current_task['complexity_score']:.1f}/5")
+    with col3:
+        st.metric("Intérêt", f"{current_task['interest_score']:.1f}/5")
+    
+    # Vérifier les votes existants pour cette tâche (clé canonique, et clés historiques non migrées)
+    task_key = task_key_from_task(current_task)
+    existing_votes = collect_user_votes_for_task(votes, catalog.alias_keys.get(task_key, [task_key]), user_id)
+    
+    if existing_votes:
+        st.info(f"Vous avez déjà voté : {[v['score'] for v in existing_votes]}")
+    
+    # Boutons de vote
+    st.subheader("Voter / Corriger :")
+    vote_cols = st.columns(5)
+    
+    for i, (vote_type, remaining) in enumerate(user_tokens.items()):
+        vote_value = int(vote_type.split('_')[1])
+        
+        with vote_cols[i]:
+            stars = "⭐" * vote_value
+            btn_key = f"vote_{vote_value}_{task_key}"
+            btn_lock_key = f"vote:{user_id}:{task_key}:{vote_value}"
             
-            if last_updated and last_updated != st.session_state.last_data_timestamp:
-                st.session_state.last_data_timestamp = last_updated
-                return True
+            # On peut voter même si on a déjà voté (pour corriger)
+            can_vote = remaining > 0 or existing_votes
+            disabled = not can_vote or is_locked(btn_lock_key)
+
+            if st.button(f"{stars}\n({remaining})", key=btn_key, use_container_width=True, disabled=disabled):
+                lock_now(btn_lock_key)
+                
+                previous_vote_obj = existing_votes[0] if existing_votes else None
+                
+                # Si le vote est identique, ne rien faire
+                if previous_vote_obj and previous_vote_obj['score'] == vote_value:
+                    st.toast("Vous avez déjà voté cette valeur.")
+                    st.rerun()
+
+                # Logique de correction de vote
+                if firebase_ref is not None:
+                    # Vote optimiste : affichage immédiat, écriture Firebase en arrière-plan
+                    outcome = record_vote_optimistic(firebase_ref, task_key, user_id, user_name, vote_value, user_tokens, previous_vote=previous_vote_obj) if OPTIMISTIC_VOTES else 'full'
+                    if outcome == 'queued':
+                        st.toast(f"Vote mis à jour : {vote_value}/5")
+                        st.rerun()
+                    elif outcome == 'full':
+                        # Écriture synchrone : remboursement de l'ancien token, débit du nouveau
+                        # et remplacement du vote en une seule écriture atomique
+                        result = record_vote(store, task_key, user_id, user_name, vote_value, user_tokens, previous_vote=previous_vote_obj)
+                        if result is not None:
+                            # Appliquer le nouvel état au cache partagé, sans relire la base
+                            get_shared_cache().apply_vote_commit(result)
+
+                            st.success(f"Vote mis à jour : {vote_value}/5")
+                            time.sleep(0.3)
+                            st.rerun()
+
+                else: # Mode local
+                    if record_vote(store, task_key, user_id, user_name, vote_value, user_tokens, previous_vote=previous_vote_obj) is not None:
+                        refresh_live_data(firebase_ref)
+                        st.success(f"Vote mis à jour : {vote_value}/5 (local)")
+                        time.sleep(0.3)
+                        st.rerun()
+            else:
+                st.button(f"{stars}\n(0)", disabled=True, key=f"vote_disabled_{vote_value}_{task_key}", use_container_width=True)
+
+@st.fragment
+@profiled_fragment
+def new_task_panel(store, firebase_ref):
+    """Formulaire de proposition d'une nouvelle tâche"""
+    st.subheader("➕ Proposer une nouvelle tâche")
+    
+    with st.form("new_task_form"):
+        new_task_name = st.text_input("Nom de la tâche :")
+        new_task_desc = st.text_area("Description détaillée :")
         
-        return False
-    except Exception:
-        return False
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            new_cost = st.slider("Coût", 1, 5, 3)
+        with col2:
+            new_complexity = st.slider("Complexité", 1, 5, 3)
+        with col3:
+            new_interest = st.slider("Intérêt", 1, 5, 3)
+        
+        form_lock_key = f"new_task_form:{st.session_state.user_name or 'anon'}"
+        submitted = st.form_submit_button("🚀 Proposer la tâche", disabled=is_locked(form_lock_key))
+        
+        if submitted and new_task_name and new_task_desc and st.session_state.user_name:
+            lock_now(form_lock_key)
+            new_task = {
+                "id": str(uuid.uuid4()),
+                "name": new_task_name,
+                "description": new_task_desc,
+                "cost": new_cost,
+                "complexity": new_complexity,
+                "interest": new_interest,
+                "proposed_by": st.session_state.user_name,
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            # Sauvegarder dans le cloud ou local
+            if add_additional_tasks(store, firebase_ref, [new_task]):
+                st.success(f"Nouvelle tâche proposée : '{new_task_name}'")
+                time.sleep(0.3)
+                st.rerun()
+
+@st.fragment
+@profiled_fragment
+def leaderboard_panel(board):
+    """Classement paginé ; le changement d'affichage et « Afficher plus » ne relancent que ce panneau"""
+    st.subheader("🏆 Classement des Tâches (par total d'étoiles)")
+
+    # Trier par total d'étoiles, puis par nombre de votes
+    df_ranked = ranked(board)
+
+    # Mode compact (un seul tableau) ou cartes détaillées, paginés
+    leaderboard_view = st.radio("Affichage :", ["Tableau compact", "Cartes"], horizontal=True, key="leaderboard_view")
+    limit = st.session_state.setdefault('leaderboard_limit', LEADERBOARD_PAGE_SIZE)
+    shown = df_ranked.head(limit)
+    max_stars = int(df_ranked['total_stars'].max()) if len(df_ranked) else 0
+
+    if leaderboard_view == "Tableau compact":
+        table = pd.DataFrame({
+            'rank': shown['rank'],
+            'type': shown['source'].map(lambda source: "🆕" if source == 'proposed' else "📋"),
+            'name': shown['name'],
+            'total_stars': shown['total_stars'],
+            'num_votes': shown['num_votes'],
+            'avg_score': shown['avg_score'],
+            'histogram': shown[list(HIST_COLUMNS)].to_numpy().tolist(),
+        })
+        st.dataframe(
+            table,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'rank': st.column_config.NumberColumn("#", width="small"),
+                'type': st.column_config.TextColumn("", width="small"),
+                'name': st.column_config.TextColumn("Tâche", width="large"),
+                'total_stars': st.column_config.ProgressColumn(
+                    "Total d'étoiles", format="%d ⭐", min_value=0, max_value=max(max_stars, 1)),
+                'num_votes': st.column_config.NumberColumn("Votes", format="%d 🗳️"),
+                'avg_score': st.column_config.NumberColumn("Score moyen", format="%.1f/5"),
+                'histogram': st.column_config.BarChartColumn("Notes 1→5", y_min=0),
+            },
+        )
+    else:
+        for row in shown.itertuples():
+            emoji = "🆕" if row.source == 'proposed' else "📋"
+            st.markdown(f"### {row.rank}. {emoji} {row.name}")
+            
+            cols = st.columns(3)
+            cols[0].metric("Total d'étoiles", f"⭐ {row.total_stars}")
+            cols[1].metric("Nombre de votes", f"🗳️ {row.num_votes}")
+            cols[2].metric("Score moyen", f"{row.avg_score:.1f}/5")
+            
+            # Barre de progression visuelle
+            if max_stars > 0:
+                st.progress(row.total_stars / max_stars)
+            
+            st.markdown("---")
+
+    remaining = len(df_ranked) - len(shown)
+    if remaining > 0:
+        st.button(f"Afficher plus ({remaining} tâche(s) restante(s))", on_click=show_more_tasks)
 
-def get_all_tasks(df, additional_tasks):
-    """Combine les tâches du CSV et les nouvelles tâches proposées"""
-    all_tasks = []
+@st.fragment
+@profiled_fragment
+def stats_panel(board, total_votes, num_users, additional_tasks):
+    """Statistiques générales, top 5 et dernières tâches proposées"""
+    st.subheader("📊 Statistiques de Vote")
     
-    # Tâches du CSV
-    if df is not None:
-        for _, row in df.iterrows():
-            # Utiliser la description du CSV si elle existe, sinon fallback
-            description = row.get('Description', "Description non fournie dans le CSV.")
+    # Statistiques générales
+    # Total votes across both legacy (lists) and new (dict pushIds) representations
+    st.metric("Total des votes", total_votes)
+    st.metric("Participants", num_users)
+    st.metric("Nouvelles tâches proposées", len(additional_tasks))
+    
+    # Top des tâches (maintenu pour info rapide)
+    if total_votes:
+        st.subheader("🏆 Top 5 (par nb de votes)")
+        # Réutiliser les agrégats déjà calculés pour le classement,
+        # triés par nombre de votes puis par score moyen
+        for i, stats in enumerate(top_by_votes(board, 5).itertuples()):
+            # Emoji pour distinguer les nouvelles tâches
+            emoji = "🆕" if stats.source == 'proposed' else "📋"
             
-            all_tasks.append({
-                'name': row['Nouveau_Nom'],
-                'description': description,
-                'cost_score': row['Score_Prix'],
-                'complexity_score': row['Score_Complexité'],
-                'interest_score': row['Score_Intérêt'],
-                'total_score': row['Score_Total'],
-                'source': 'csv',
-                'id': f"csv_{row['Nouveau_Nom']}"
-            })
+            st.write(f"**{i+1}.** {emoji} {stats.name}")
+            st.write(f"   📊 {stats.num_votes} votes - ⭐ {stats.avg_score:.1f}/5")
     
     # Nouvelles tâches proposées
-    for task in additional_tasks:
-        all_tasks.append({
-            'name': task['name'],
-            'description': task['description'],
-            'cost_score': float(task['cost']),
-            'complexity_score': float(task['complexity']),
-            'interest_score': float(task['interest']),
-            'total_score': (float(task['cost']) + float(task['complexity']) + float(task['interest'])) / 3,
-            'source': 'proposed',
-            'proposed_by': task['proposed_by'],
-            'id': task['id']
-        })
+    if additional_tasks:
+        st.subheader("💡 Nouvelles tâches proposées")
+        for task in additional_tasks[-5:]:  # 5 dernières
+            st.write(f"**{task['name']}**")
+            st.write(f"   Par: {task['proposed_by']}")
+            st.write(f"   💰{task['cost']} 🔧{task['complexity']} ⭐{task['interest']}")
+
+@st.fragment
+@profiled_fragment
+def admin_panel(store, firebase_ref, users, votes, catalog):
+    """Réinitialisation des votes d'un participant, fusion des clés historiques, recalcul des compteurs serveur
+    et index des votes"""
+    st.markdown("---")
+    st.subheader("👑 Section Admin")
     
-    # Trier par nom pour avoir un ordre fixe
-    all_tasks.sort(key=lambda x: x['name'].lower())
+    admin_pwd = st.text_input("Mot de passe admin :", type="password")
     
-    return all_tasks
+    if admin_pwd == st.secrets.get("ADMIN_PASSWORD", "admin"):
+        st.success("Accès admin autorisé")
+        
+        st.subheader("Réinitialiser les votes d'un participant")
+        
+        user_list = {uid: u.get('name', f"ID: {uid}") for uid, u in users.items()}
+        user_to_reset_id = st.selectbox("Choisir un utilisateur :", options=list(user_list.keys()), format_func=lambda x: user_list[x])
+        
+        if st.button(f"Réinitialiser TOUS les votes de {user_list.get(user_to_reset_id)}", type="primary"):
+            # Suppression des votes, de leur index, retrait des compteurs serveur et tokens rétablis en une écriture
+            if reset_user_votes(store, user_to_reset_id):
+                st.success(f"Votes de {user_list.get(user_to_reset_id)} réinitialisés avec succès.")
+
+                # Forcer le rechargement complet de l'application
+                refresh_live_data(firebase_ref, max_age=0)
+                st.session_state.clear()
+                time.sleep(1)
+                st.rerun()
+
+        legacy_keys = catalog.legacy_keys(votes)
+        if legacy_keys:
+            st.subheader("Clés de tâches historiques")
+            st.caption(f"{len(legacy_keys)} clé(s) de votes à fusionner dans la clé canonique de leur tâche.")
+            if st.button("🔀 Fusionner les clés historiques"):
+                try:
+                    merged = merge_legacy_task_keys(store, votes, catalog)
+                    refresh_live_data(firebase_ref, max_age=0)
+                    st.success(f"Votes fusionnés pour {merged} tâche(s).")
+                    time.sleep(0.3)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Erreur lors de la fusion des clés : {e}")
+
+        if firebase_ref is not None:
+            st.subheader("Compteurs serveur")
+            if st.button("🧮 Recalculer les agrégats depuis les votes"):
+                try:
+                    node = rebuild_server_aggregates(firebase_ref)
+                    st.success(f"Agrégats recalculés pour {len(node)} tâche(s).")
+                except Exception as e:
+                    st.error(f"Erreur lors du recalcul des agrégats : {e}")
+            st.subheader("Index des votes")
+            if st.button("🗂️ Reconstruire l'index des votes par participant"):
+                try:
+                    node = rebuild_user_vote_index(firebase_ref)
+                    st.success(f"Index reconstruit pour {len(node)} participant(s).")
+                except Exception as e:
+                    st.error(f"Erreur lors de la reconstruction de l'index : {e}")
+
+        st.subheader("Importer des tâches")
+        uploaded = st.file_uploader("Fichier CSV ou JSON (nom, description, coût, complexité, intérêt)",
+                                    type=["csv", "json"], key="task_import_file")
+        if uploaded is not None:
+            try:
+                # Doublons écartés par nom, y compris avec les tâches déjà présentes
+                task_import = parse_task_file(uploaded.name, uploaded.getvalue(), catalog.names,
+                                              proposed_by=st.session_state.user_name or "admin")
+            except Exception as e:
+                st.error(f"Fichier illisible : {e}")
+            else:
+                if task_import.rejected:
+                    with st.expander(f"{len(task_import.rejected)} ligne(s) écartée(s)"):
+                        for line, name, reason in task_import.rejected:
+                            st.caption(f"Tâche n°{line} ({name or '?'}) : {reason}")
+                if not task_import.tasks:
+                    st.info("Aucune nouvelle tâche à importer.")
+                elif st.button(f"📥 Importer {len(task_import.tasks)} tâche(s)", type="primary"):
+                    # Toutes les tâches en une seule écriture multi-chemins
+                    if add_additional_tasks(store, firebase_ref, task_import.tasks):
+                        st.success(f"{len(task_import.tasks)} tâche(s) importée(s).")
+                        time.sleep(0.3)
+                        st.rerun()
+
+        registry_stats = get_user_registry().stats()
+        st.caption(f"Enregistrements utilisateur : {registry_stats['fetches']} lecture(s), "
+                   f"{registry_stats['avoided']} évitée(s) par le cache")
+
+        performance_section()
+
+def performance_section():
+    """Mesures de la dernière relance de la session, de la session et du processus, export JSON lines"""
+    st.subheader("⏱️ Performance")
+    profiler = get_profiler()
+    session = profiler.session(profile_session_id())
+    if not session.history:
+        st.caption("Aucune relance mesurée pour l'instant.")
+        return
+
+    last = session.history[-1]
+    last_db = last.db.as_dict()
+    volume = (f", {last_db['bytes_down'] / 1024:.1f} Ko reçus, {last_db['bytes_up'] / 1024:.1f} Ko envoyés"
+              if profiler.measure_bytes else "")
+    st.caption(f"Dernière relance : {last.total_ms:.0f} ms, {last_db['round_trips']} appel(s) Firebase "
+               f"({last_db['db_ms']:.0f} ms{volume})")
+    stages = sorted(set(last.stages) | set(session.stages), key=lambda name: -last.stages.get(name, 0))
+    st.dataframe(pd.DataFrame({
+        'Étape': stages,
+        'Dernière relance (ms)': [round(last.stages.get(name, 0), 1) for name in stages],
+        'Moyenne session (ms)': [round(session.stages.get(name, 0) / session.reruns, 1) for name in stages],
+    }), hide_index=True, use_container_width=True)
+
+    session_db = session.db.as_dict()
+    totals = profiler.totals
+    background = profiler.background.as_dict()
+    st.caption(f"Session : {session.reruns} relance(s), {session.total_ms / session.reruns:.0f} ms en moyenne, "
+               f"{session_db['round_trips']} appel(s) Firebase {session_db['calls']}")
+    process_db = totals.db.as_dict()
+    st.caption(f"Processus : {totals.reruns} relance(s) sur {len(profiler.sessions)} session(s), "
+               f"{process_db['round_trips']} appel(s) Firebase ; "
+               f"hors relance (file d'écritures, préchargement) : {background['round_trips']} appel(s) ; "
+               f"erreurs : {process_db['errors'] + background['errors']}, nouvelles tentatives de transaction : "
+               f"{process_db['transaction_retries'] + background['transaction_retries']}")
+    st.download_button("📄 Exporter les mesures (JSON lines)", profiler.jsonl(),
+                       file_name="spring_profile.jsonl", mime="application/jsonl")
 
 def main():
     st.title("🗳️ SPRING - Système de Vote Collaboratif")
@@ -468,8 +906,14 @@ def main():
     if 'last_data_timestamp' not in st.session_state:
         st.session_state.last_data_timestamp = ""
     
+    profiler = get_profiler()
+    get_metrics()
+
     # Initialiser Firebase
-    firebase_ref = init_firebase()
+    with profiler.stage("init_firebase"):
+        firebase_ref = init_firebase()
+        store = get_vote_store(firebase_ref)
+        warm_up(firebase_ref)
     
     # Indicateur de connexion
     if firebase_ref is not None:
@@ -478,38 +922,29 @@ def main():
         st.warning("⚠️ Mode local - Les données ne seront pas synchronisées")
     
     # Initialiser les données dans session_state
-    if 'votes_data' not in st.session_state:
-        votes, users, additional_tasks, last_updated = load_live_data(firebase_ref)
-        st.session_state.votes_data = votes
-        st.session_state.users_data = users
-        st.session_state.additional_tasks_data = additional_tasks
-        st.session_state.last_data_timestamp = last_updated
-    
-    # Vérification initiale des mises à jour en arrière-plan (une seule fois par chargement)
-    if firebase_ref is not None and 'initial_load_done' not in st.session_state:
-        votes, users, additional_tasks, last_updated = load_live_data(firebase_ref)
-        st.session_state.votes_data = votes
-        st.session_state.users_data = users
-        st.session_state.additional_tasks_data = additional_tasks
-        st.session_state.initial_load_done = True
+    with profiler.stage("refresh_live_data"):
+        if 'votes_data' not in st.session_state:
+            refresh_live_data(firebase_ref)
+        
+        elif firebase_ref is not None:
+            # Se raccrocher au snapshot partagé (aucune requête s'il a été vérifié récemment)
+            refresh_live_data(firebase_ref)
+        
+        # Résultat des votes optimistes encore en cours d'écriture
+        if firebase_ref is not None and st.session_state.get('pending_writes'):
+            reconcile_pending_writes(firebase_ref)
     
     # Utiliser les données du session_state
     votes = st.session_state.votes_data
     users = st.session_state.users_data
     additional_tasks = st.session_state.additional_tasks_data
+    vote_table = st.session_state.vote_table
+    vote_counters = st.session_state.get('vote_counters')
 
-    # Verrou anti double-clic (générique)
-    LOCK_WINDOW_SEC = 0.5
+    # Verrous anti double-clic
     if 'click_locks' not in st.session_state:
         st.session_state.click_locks = {}
 
-    def is_locked(lock_key: str) -> bool:
-        t = st.session_state.click_locks.get(lock_key)
-        return bool(t and (time.time() - t) < LOCK_WINDOW_SEC)
-
-    def lock_now(lock_key: str):
-        st.session_state.click_locks[lock_key] = time.time()
-
     # Nettoyage des verrous expirés
     try:
         expired_keys = [k for k, t0 in st.session_state.click_locks.items() if (time.time() - t0) >= LOCK_WINDOW_SEC]
@@ -522,46 +957,26 @@ def main():
     col1, col2, col3, col4 = st.columns([1, 1, 2, 2])
     with col1:
         if st.button("🔄 Actualiser"):
-            # Force le rechargement des données
-            votes, users, additional_tasks, last_updated = load_live_data(firebase_ref)
-            st.session_state.votes_data = votes
-            st.session_state.users_data = users
-            st.session_state.additional_tasks_data = additional_tasks
-            st.session_state.last_data_timestamp = last_updated
+            # Synchronise les données (seuls les sous-arbres modifiés sont relus)
+            refresh_live_data(firebase_ref, max_age=0)
             st.rerun()
     
     with col2:
-        live_mode = st.checkbox("Auto-rafraîchissement (beta)", value=False, help="Active le rafraîchissement automatique toutes les 5s (peut perturber les formulaires)")
+        live_mode = st.checkbox("Auto-rafraîchissement (beta)", value=False, help="Met à jour la page dès qu'un vote ou une tâche est enregistré (écoute temps réel Firebase)")
     
-    # Mécanisme de polling intelligent
+    # Mises à jour poussées par Firebase : un seul flux listen() par processus
     if live_mode and firebase_ref is not None:
-        # Utiliser un placeholder pour déclencher le polling
-        placeholder = st.empty()
-        
-        # Vérifier s'il est temps de faire un poll
-        current_time = time.time()
-        if 'last_poll' not in st.session_state:
-            st.session_state.last_poll = current_time
-        
-        if current_time - st.session_state.last_poll > 5:  # 5 secondes
-            st.session_state.last_poll = current_time
-            
-            if check_for_updates(firebase_ref):
-                # Mettre à jour les données silencieusement
-                votes, users, additional_tasks, last_updated = load_live_data(firebase_ref)
-                st.session_state.votes_data = votes
-                st.session_state.users_data = users
-                st.session_state.additional_tasks_data = additional_tasks
-                
-                # Notification discrète de mise à jour
-                with placeholder:
-                    st.success("🔄 Nouvelles données détectées", icon="🔄")
-                    time.sleep(1)
-                    placeholder.empty()
-            
-            # Programmer le prochain poll
-            time.sleep(0.1)
-            st.rerun()
+        hub = get_event_hub(firebase_ref)
+        if hub.error is not None:
+            st.warning(f"Flux temps réel indisponible, utilisez 🔄 Actualiser ({hub.error})")
+        else:
+            if 'live_event_seq' not in st.session_state:
+                st.session_state.live_event_seq = hub.sequence
+            live_update_watcher(hub)
+    
+    # Notification discrète de mise à jour
+    if st.session_state.pop('live_update_notice', False):
+        st.toast("🔄 Nouvelles données détectées", icon="🔄")
     
     with col3:
         if st.session_state.last_data_timestamp:
@@ -577,16 +992,14 @@ def main():
         else:
             st.info("👤 Non connecté")
     
-    # Charger les données CSV (cachées plus longtemps car statiques)
-    df = load_csv_data()
+    # Toutes les tâches (CSV + nouvelles) : catalogue reconstruit seulement si le CSV ou les propositions changent
+    with profiler.stage("task_catalog"):
+        catalog = get_task_catalog(file_version(CSV_FILE), tasks_version(additional_tasks), additional_tasks)
     
-    if df is None and not additional_tasks:
+    if not len(catalog):
         st.error("Aucune donnée disponible. Vérifiez la configuration.")
         return
     
-    # Obtenir toutes les tâches (CSV + nouvelles)
-    all_tasks = get_all_tasks(df, additional_tasks)
-    
     # Sidebar pour le système de vote
     with st.sidebar:
         st.header("🎯 Système de Vote")
@@ -618,198 +1031,29 @@ def main():
             with col2:
                 if st.button("🚪 Déco"):
                     st.session_state.user_name = ""
+                    st.session_state.pop('registered_user', None)
                     st.rerun()
         
         # Section de vote - visible seulement si connecté
         if st.session_state.user_name:
             user_name = st.session_state.user_name  # Utiliser le nom de session_state
             user_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, user_name))
-            # S'assurer que l'utilisateur existe dans le cloud et le cache
-            try:
-                ensure_user_record(firebase_ref, user_id, user_name)
-            except Exception:
-                pass
+            # S'assurer que l'utilisateur existe dans le cloud : relu à la connexion, puis seulement
+            # si un événement touche users/{id} (sinon aucune requête à chaque relance)
+            with profiler.stage("ensure_user_record"):
+                if ensure_user_record(store, user_id, user_name,
+                                      force=st.session_state.get('registered_user') != user_id):
+                    st.session_state.registered_user = user_id
+            if firebase_ref is not None:
+                # Le snapshot partagé est en lecture seule : copie privée de l'enregistrement utilisateur
+                users = dict(users)
+                if user_id in users:
+                    users[user_id] = copy.deepcopy(users[user_id])
             user_tokens = get_user_tokens(user_id, users)
             users[user_id]["name"] = user_name
             
-            # Affichage des tokens restants
-            st.subheader("🪙 Vos tokens restants :")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.write(f"**{user_tokens['votes_5']}** votes ⭐⭐⭐⭐⭐")
-                st.write(f"**{user_tokens['votes_4']}** votes ⭐⭐⭐⭐")
-                st.write(f"**{user_tokens['votes_3']}** votes ⭐⭐⭐")
-            with col2:
-                st.write(f"**{user_tokens['votes_2']}** votes ⭐⭐")
-                st.write(f"**{user_tokens['votes_1']}** votes ⭐")
-            
-            st.markdown("---")
-            
-            # Interface de vote avec ordre fixe
-            st.subheader("📊 Vote Collectif - Ordre Fixe")
-            
-            # S'assurer que l'index est dans les limites
-            if st.session_state.current_task_index >= len(all_tasks):
-                st.session_state.current_task_index = 0
-            
-            current_task = all_tasks[st.session_state.current_task_index]
-            
-            # Navigation
-            col1, col2, col3 = st.columns([1, 2, 1])
-            with col1:
-                if st.button("⬅️ Précédent", disabled=st.session_state.current_task_index == 0):
-                    st.session_state.current_task_index -= 1
-                    st.rerun()
-            
-            with col2:
-                st.write(f"**Tâche {st.session_state.current_task_index + 1}/{len(all_tasks)}**")
-            
-            with col3:
-                if st.button("➡️ Suivant", disabled=st.session_state.current_task_index == len(all_tasks) - 1):
-                    st.session_state.current_task_index += 1
-                    st.rerun()
-            
-            # Aller directement à une tâche
-            task_names = [task['name'] for task in all_tasks]
-            selected_index = st.selectbox(
-                "Aller à :", 
-                range(len(task_names)),
-                format_func=lambda x: f"{x+1}. {task_names[x]}",
-                index=st.session_state.current_task_index,
-                key="task_selector"
-            )
-            
-            if selected_index != st.session_state.current_task_index:
-                st.session_state.current_task_index = selected_index
-                st.rerun()
-            
-            # Affichage de la tâche actuelle
-            st.markdown("---")
-            st.subheader(f"🎯 {current_task['name']}")
-            
-            # Badge pour les nouvelles tâches
-            if current_task['source'] == 'proposed':
-                st.markdown(f"🆕 **Nouvelle tâche** proposée par *{current_task['proposed_by']}*")
-            
-            # Description
-            st.text_area("Description :", current_task['description'], height=120, disabled=True)
-            
-            # Scores actuels
-            st.write("**Scores actuels :**")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Coût", f"{current_task['cost_score']:.1f}/5")
-            with col2:
-                st.metric("Complexité", f"{current_task['complexity_score']:.1f}/5")
-            with col3:
-                st.metric("Intérêt", f"{current_task['interest_score']:.1f}/5")
-            
-            # Vérifier les votes existants pour cette tâche
-            existing_votes = collect_user_votes_for_task(votes, current_task, user_id)
-            
-            if existing_votes:
-                st.info(f"Vous avez déjà voté : {[v['score'] for v in existing_votes]}")
-            
-            # Boutons de vote
-            st.subheader("Voter / Corriger :")
-            vote_cols = st.columns(5)
-            
-            for i, (vote_type, remaining) in enumerate(user_tokens.items()):
-                vote_value = int(vote_type.split('_')[1])
-                
-                with vote_cols[i]:
-                    stars = "⭐" * vote_value
-                    task_key = task_key_from_task(current_task)
-                    btn_key = f"vote_{vote_value}_{task_key}"
-                    btn_lock_key = f"vote:{user_id}:{task_key}:{vote_value}"
-                    
-                    # On peut voter même si on a déjà voté (pour corriger)
-                    can_vote = remaining > 0 or existing_votes
-                    disabled = not can_vote or is_locked(btn_lock_key)
-
-                    if st.button(f"{stars}\n({remaining})", key=btn_key, use_container_width=True, disabled=disabled):
-                        lock_now(btn_lock_key)
-                        
-                        previous_vote_obj = existing_votes[0] if existing_votes else None
-                        
-                        # Si le vote est identique, ne rien faire
-                        if previous_vote_obj and previous_vote_obj['score'] == vote_value:
-                            st.toast("Vous avez déjà voté cette valeur.")
-                            st.rerun()
-
-                        # Logique de correction de vote
-                        if firebase_ref is not None:
-                            # 1. Rembourser l'ancien token si un vote existait
-                            if previous_vote_obj:
-                                old_vote_type = f"votes_{previous_vote_obj['score']}"
-                                increment_token(firebase_ref, user_id, old_vote_type)
-                                # Mettre à jour le cache local
-                                users[user_id]["tokens"][old_vote_type] += 1
-
-                            # 2. Décrémenter le nouveau token
-                            ok = decrement_token(firebase_ref, user_id, vote_type)
-                            if not ok:
-                                st.error("Plus de tokens disponibles pour ce type de vote.")
-                                # Si on a remboursé, il faut annuler le remboursement
-                                if previous_vote_obj:
-                                    decrement_token(firebase_ref, user_id, f"votes_{previous_vote_obj['score']}")
-                                st.rerun()
-                            
-                            # 3. Enregistrer le vote (supprime l'ancien et ajoute le nouveau)
-                            if record_vote(firebase_ref, task_key, user_id, user_name, vote_value, previous_vote=previous_vote_obj):
-                                # Mettre à jour le cache local pour réactivité
-                                # Recharger complètement les données depuis la source de vérité (Firebase)
-                                votes, users, additional_tasks, last_updated = load_live_data(firebase_ref)
-                                st.session_state.votes_data = votes
-                                st.session_state.users_data = users
-                                st.session_state.additional_tasks_data = additional_tasks
-                                st.session_state.last_data_timestamp = last_updated
-
-                                st.success(f"Vote mis à jour : {vote_value}/5")
-                                time.sleep(0.3)
-                                st.rerun()
-                            else:
-                                st.error("Erreur lors de la mise à jour du vote.")
-
-                        else: # Mode local
-                            # Logique locale similaire
-                            if previous_vote_obj:
-                                old_vote_type = f"votes_{previous_vote_obj['score']}"
-                                users[user_id]["tokens"][old_vote_type] += 1
-                                # Supprimer l'ancien vote localement
-                                name_key = sanitize_key(current_task['name'])
-                                if name_key in votes and user_id in votes[name_key]:
-                                    # Trouver et supprimer le vote
-                                    current_user_votes = _flatten_user_votes(votes[name_key][user_id])
-                                    # Garder tous les votes sauf celui qui est corrigé
-                                    votes[name_key][user_id] = [v for v in current_user_votes if v.get('vote_id') != previous_vote_obj.get('vote_id')]
-
-                            # Décrémenter et ajouter le nouveau
-                            if users[user_id]["tokens"][vote_type] > 0:
-                                users[user_id]["tokens"][vote_type] -= 1
-                                name_key = sanitize_key(current_task['name'])
-                                if name_key not in votes: votes[name_key] = {}
-                                
-                                new_vote = {"score": vote_value, "timestamp": datetime.now().isoformat(), "user_name": user_name}
-                                
-                                # S'assurer que c'est une liste pour la mise à jour locale
-                                if user_id not in votes[name_key] or not isinstance(votes[name_key][user_id], list):
-                                    votes[name_key][user_id] = []
-
-                                votes[name_key][user_id].append(new_vote)
-
-                                if save_data_local(votes, users, additional_tasks):
-                                    st.session_state.votes_data = votes
-                                    st.session_state.users_data = users
-                                    st.success(f"Vote mis à jour : {vote_value}/5 (local)")
-                                    time.sleep(0.3)
-                                    st.rerun()
-                                else:
-                                    st.error("Erreur lors de la sauvegarde locale du vote.")
-                            else:
-                                st.warning("Plus de jetons de ce type en mode local.")
-                    else:
-                        st.button(f"{stars}\n(0)", disabled=True, key=f"vote_disabled_{vote_value}_{task_key}", use_container_width=True)
+            with profiler.stage("voting_panel"):
+                voting_panel(store, firebase_ref, catalog, votes, user_id, user_name, user_tokens)
         
         else:
             # Message d'invitation à se connecter
@@ -819,55 +1063,8 @@ def main():
         
         # Section pour ajouter une nouvelle tâche - visible seulement si connecté
         if st.session_state.user_name:
-            st.subheader("➕ Proposer une nouvelle tâche")
-            
-            with st.form("new_task_form"):
-                new_task_name = st.text_input("Nom de la tâche :")
-                new_task_desc = st.text_area("Description détaillée :")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    new_cost = st.slider("Coût", 1, 5, 3)
-                with col2:
-                    new_complexity = st.slider("Complexité", 1, 5, 3)
-                with col3:
-                    new_interest = st.slider("Intérêt", 1, 5, 3)
-                
-                form_lock_key = f"new_task_form:{st.session_state.user_name or 'anon'}"
-                submitted = st.form_submit_button("🚀 Proposer la tâche", disabled=is_locked(form_lock_key))
-                
-                if submitted and new_task_name and new_task_desc and st.session_state.user_name:
-                    lock_now(form_lock_key)
-                    new_task = {
-                        "id": str(uuid.uuid4()),
-                        "name": new_task_name,
-                        "description": new_task_desc,
-                        "cost": new_cost,
-                        "complexity": new_complexity,
-                        "interest": new_interest,
-                        "proposed_by": st.session_state.user_name,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    
-                    # Sauvegarder dans le cloud ou local
-                    if firebase_ref is not None:
-                        if add_additional_task(firebase_ref, new_task):
-                            additional_tasks.append(new_task)
-                            st.session_state.additional_tasks_data = additional_tasks
-                            st.success(f"Nouvelle tâche proposée : '{new_task_name}'")
-                            time.sleep(0.3)
-                            st.rerun()
-                        else:
-                            st.error("Erreur lors de l'ajout de la tâche (cloud)")
-                    else:
-                        additional_tasks.append(new_task)
-                        if save_data_local(votes, users, additional_tasks):
-                            st.session_state.additional_tasks_data = additional_tasks
-                            st.success(f"Nouvelle tâche proposée : '{new_task_name}' (local)")
-                            time.sleep(0.3)
-                            st.rerun()
-                        else:
-                            st.error("Erreur lors de l'ajout de la tâche (local)")
+            with profiler.stage("new_task_panel"):
+                new_task_panel(store, firebase_ref)
         else:
             # Message pour les utilisateurs non connectés
             st.info("👆 Connectez-vous pour proposer de nouvelles tâches")
@@ -876,159 +1073,27 @@ def main():
     main_col1, main_col2 = st.columns([2, 1])
     
     with main_col1:
-        st.subheader("🏆 Classement des Tâches (par total d'étoiles)")
-
-        # Calculer le score total (somme des étoiles) pour chaque tâche
-        task_scores = []
-        for task in all_tasks:
-            task_votes = collect_votes_for_task(votes, task)
-            total_stars = sum(v.get("score", 0) for v in task_votes if isinstance(v, dict))
-            num_votes = len(task_votes)
-            avg_score = total_stars / num_votes if num_votes > 0 else 0
-            
-            task_scores.append({
-                'name': task['name'],
-                'total_stars': total_stars,
-                'num_votes': num_votes,
-                'avg_score': avg_score,
-                'source': task['source']
-            })
-
-        # Trier par total d'étoiles, puis par nombre de votes
-        df_ranked = pd.DataFrame(task_scores)
-        df_ranked = df_ranked.sort_values(by=['total_stars', 'num_votes'], ascending=False).reset_index()
-
-        # Afficher le classement
-        for index, row in df_ranked.iterrows():
-            emoji = "🆕" if row['source'] == 'proposed' else "📋"
-            st.markdown(f"### {index + 1}. {emoji} {row['name']}")
-            
-            cols = st.columns(3)
-            cols[0].metric("Total d'étoiles", f"⭐ {row['total_stars']}")
-            cols[1].metric("Nombre de votes", f"🗳️ {row['num_votes']}")
-            cols[2].metric("Score moyen", f"{row['avg_score']:.1f}/5")
-            
-            # Barre de progression visuelle
-            if df_ranked['total_stars'].max() > 0:
-                progress_value = row['total_stars'] / df_ranked['total_stars'].max()
-                st.progress(progress_value)
-            
-            st.markdown("---")
+        # Total d'étoiles, votes, moyenne et rang de chaque tâche : compteurs serveur s'ils sont complets,
+        # sinon opérations groupées sur la table de votes ; recalculé seulement quand les données changent
+        with profiler.stage("leaderboard"):
+            board = current_leaderboard(firebase_ref, catalog, vote_table, vote_counters)
+        with profiler.stage("leaderboard_panel"):
+            leaderboard_panel(board)
 
     with main_col2:
-        st.subheader("📊 Statistiques de Vote")
-        
-        # Statistiques générales
-        # Total votes across both legacy (lists) and new (dict pushIds) representations
-        total_votes = 0
-        for task_map in votes.values():
-            for uv in task_map.values():
-                total_votes += len(_flatten_user_votes(uv))
-        st.metric("Total des votes", total_votes)
-        st.metric("Participants", len(users))
-        st.metric("Nouvelles tâches proposées", len(additional_tasks))
-        
-        # Affichage de la tâche actuelle dans le vote collectif
-        if st.session_state.user_name and 'current_task_index' in st.session_state:
-            current_task = all_tasks[st.session_state.current_task_index]
-            st.info(f"**Vote collectif :**\nTâche {st.session_state.current_task_index + 1}/{len(all_tasks)}\n*{current_task['name']}*")
-        
-        # Top des tâches (maintenu pour info rapide)
-        if votes:
-            st.subheader("🏆 Top 5 (par nb de votes)")
-            task_vote_counts = {}
-            # Repasser par all_tasks pour avoir un mapping stable nom<->clé
-            for task in all_tasks:
-                tv = collect_votes_for_task(votes, task)
-                count = len(tv)
-                if count > 0:
-                    avg_score = sum(v.get("score", 0) for v in tv if isinstance(v, dict)) / count
-                    task_vote_counts[task['name']] = {"count": count, "avg_score": avg_score}
-            
-            # Trier par nombre de votes puis par score moyen
-            sorted_tasks = sorted(task_vote_counts.items(), 
-                                key=lambda x: (x[1]["count"], x[1]["avg_score"]), 
-                                reverse=True)
-            
-            for i, (task_name, stats) in enumerate(sorted_tasks[:5]):
-                # Emoji pour distinguer les nouvelles tâches
-                is_new = any(task['name'] == task_name and task['source'] == 'proposed' for task in all_tasks)
-                emoji = "🆕" if is_new else "📋"
-                
-                st.write(f"**{i+1}.** {emoji} {task_name}")
-                st.write(f"   📊 {stats['count']} votes - ⭐ {stats['avg_score']:.1f}/5")
-        
-        # Nouvelles tâches proposées
-        if additional_tasks:
-            st.subheader("💡 Nouvelles tâches proposées")
-            for task in additional_tasks[-5:]:  # 5 dernières
-                st.write(f"**{task['name']}**")
-                st.write(f"   Par: {task['proposed_by']}")
-                st.write(f"   💰{task['cost']} 🔧{task['complexity']} ⭐{task['interest']}")
-        
-        # Section Admin
-        st.markdown("---")
-        st.subheader("👑 Section Admin")
-        
-        admin_pwd = st.text_input("Mot de passe admin :", type="password")
-        
-        if admin_pwd == st.secrets.get("ADMIN_PASSWORD", "admin"):
-            st.success("Accès admin autorisé")
-            
-            st.subheader("Réinitialiser les votes d'un participant")
-            
-            user_list = {uid: u.get('name', f"ID: {uid}") for uid, u in users.items()}
-            user_to_reset_id = st.selectbox("Choisir un utilisateur :", options=list(user_list.keys()), format_func=lambda x: user_list[x])
-            
-            if st.button(f"Réinitialiser TOUS les votes de {user_list.get(user_to_reset_id)}", type="primary"):
-                if firebase_ref is not None:
-                    # Opération atomique pour supprimer tous les votes et réinitialiser les tokens
-                    updates = {}
-                    
-                    # 1. Préparer la suppression de tous les votes de l'utilisateur
-                    all_votes_ref = firebase_ref.child('votes')
-                    all_task_votes = all_votes_ref.get()
-                    if all_task_votes:
-                        for task_key, user_votes in all_task_votes.items():
-                            if user_to_reset_id in user_votes:
-                                # Ajouter le chemin de suppression à la mise à jour
-                                updates[f'votes/{task_key}/{user_to_reset_id}'] = None
-                    
-                    # 2. Préparer la réinitialisation des tokens
-                    updates[f'users/{user_to_reset_id}/tokens'] = TOKENS_CONFIG.copy()
-                    
-                    try:
-                        # 3. Exécuter la mise à jour atomique
-                        firebase_ref.update(updates)
-                        
-                        st.success(f"Votes de {user_list.get(user_to_reset_id)} réinitialisés avec succès.")
-                        
-                        # 4. Forcer le rechargement complet de l'application
-                        st.session_state.clear()
-                        time.sleep(1)
-                        st.rerun()
+        with profiler.stage("stats_panel"):
+            total_votes = total_count(vote_counters) if vote_counters is not None else len(vote_table)
+            stats_panel(board, total_votes, len(users), additional_tasks)
 
-                    except Exception as e:
-                        st.error(f"Une erreur est survenue lors de la réinitialisation : {e}")
-
-                else:
-                    # Mode local
-                    for task_key in list(votes.keys()):
-                        if user_to_reset_id in votes.get(task_key, {}):
-                            del votes[task_key][user_to_reset_id]
-                    
-                    if user_to_reset_id in users:
-                        users[user_to_reset_id]['tokens'] = TOKENS_CONFIG.copy()
-                    
-                    save_data_local(votes, users, additional_tasks)
-                    st.success(f"Votes de {user_list.get(user_to_reset_id)} réinitialisés (local).")
-                    st.session_state.clear()
-                    time.sleep(1)
-                    st.rerun()
+        # Section Admin
+        with profiler.stage("admin_panel"):
+            admin_panel(store, firebase_ref, users, votes, catalog)
 
         # Indicateur de dernière mise à jour
         st.markdown("---")
         st.caption(f"Dernière actualisation: {datetime.now().strftime('%H:%M:%S')}")
 
 if __name__ == "__main__":
-    main()
+    # Chaque relance complète est mesurée (étapes et appels Firebase), même interrompue par st.rerun()
+    with get_profiler().rerun(profile_session_id()):
+        main()
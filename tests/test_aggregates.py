@@ -0,0 +1,84 @@
+"""Compteurs serveur ``aggregates/`` : maintenus par chaque vote, lus par le classement."""
+import pandas as pd
+import pytest
+
+from spring_vote.aggregates import (AGGREGATES_ROOT, aggregate_drift, apply_counter_updates, rebuild_server_aggregates,
+                                    server_aggregates_from_votes)
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.leaderboard import VoteTable, leaderboard, leaderboard_from_counters
+from spring_vote.live_sync import LiveSnapshot, sync_snapshot
+from spring_vote.shared_cache import SharedSnapshotCache
+from spring_vote.vote_commit import commit_vote
+
+TOKENS = {'votes_5': 2, 'votes_4': 2, 'votes_3': 2, 'votes_2': 2, 'votes_1': 2}
+TASKS = [{'id': 'a', 'name': 'Tâche A'}, {'id': 'b', 'name': 'Tâche B'}]
+POSITIONS = {'task_a': 0, 'legacy_a': 0, 'task_b': 1}
+
+
+@pytest.fixture
+def db():
+    # Vote écrit avant les compteurs : absent de aggregates/ tant qu'ils ne sont pas recalculés
+    legacy = {'alice': {'v0': {'score': 2, 'timestamp': '2024-05-01T09:00:00', 'user_name': 'Alice'}}}
+    return FakeRTDB({'votes': {'legacy_a': legacy},
+                     'users': {'alice': {'name': 'Alice', 'tokens': dict(TOKENS)}}})
+
+
+def _counters(db):
+    return db.reference(AGGREGATES_ROOT).get() or {}
+
+
+def test_votes_and_corrections_keep_counters_in_step(db):
+    ref = db.reference()
+    commit_vote(ref, 'task_b', 'alice', 'Alice', 4, TOKENS)
+    assert aggregate_drift(server_aggregates_from_votes(ref.child('votes').get()), _counters(db)) == ['legacy_a']
+
+    rebuild_server_aggregates(ref)
+    commit_vote(ref, 'task_b', 'alice', 'Alice', 5, TOKENS, previous_score=4)
+    # Vote déplacé depuis une clé historique : retiré de ses compteurs, ajouté à ceux de la clé canonique
+    commit_vote(ref, 'task_a', 'alice', 'Alice', 3, TOKENS, previous_score=2, previous_key='legacy_a')
+    votes = ref.child('votes').get()
+    assert set(votes) == {'task_a', 'task_b'}
+    assert aggregate_drift(server_aggregates_from_votes(votes), _counters(db)) == []
+
+
+def test_rebuild_marks_counters_complete_and_snapshot_reads_them(db):
+    ref = db.reference()
+    snapshot = LiveSnapshot()
+    sync_snapshot(ref, snapshot)
+    assert snapshot.aggregates is None
+
+    node = rebuild_server_aggregates(ref)
+    assert node == {'legacy_a': {'sum': 2, 'count': 1, 'histogram': {'2': 1}}}
+    # last_updated sans marqueur : rechargement complet, qui lit les compteurs
+    assert sync_snapshot(ref, snapshot)
+    assert snapshot.full_loads == 2 and snapshot.aggregates == node
+
+    commit_vote(ref, 'task_a', 'alice', 'Alice', 5, TOKENS)
+    assert sync_snapshot(ref, snapshot)
+    assert snapshot.aggregates['task_a'] == {'sum': 5, 'count': 1, 'histogram': {'5': 1}}
+
+
+def test_leaderboard_from_counters_matches_vote_table(db):
+    ref = db.reference()
+    commit_vote(ref, 'task_a', 'alice', 'Alice', 5, TOKENS)
+    commit_vote(ref, 'task_b', 'alice', 'Alice', 1, TOKENS)
+    votes = ref.child('votes').get()
+    node = rebuild_server_aggregates(ref)
+
+    expected = leaderboard(TASKS, VoteTable.build(votes), POSITIONS)
+    board = leaderboard_from_counters(TASKS, node, POSITIONS)
+    pd.testing.assert_frame_equal(board, expected)
+    # Clé historique legacy_a cumulée avec task_a
+    assert board.loc[0, 'num_votes'] == 2 and board.loc[0, 'total_stars'] == 7
+
+
+def test_local_application_matches_server_increments(db):
+    ref = db.reference()
+    rebuild_server_aggregates(ref)
+    shared = SharedSnapshotCache()
+    shared.refresh(ref)
+
+    result = commit_vote(ref, 'task_a', 'alice', 'Alice', 3, TOKENS, previous_score=2, previous_key='legacy_a')
+    shared.apply_vote_commit(result)
+    assert aggregate_drift(shared.snapshot.aggregates, _counters(db)) == []
+    assert apply_counter_updates({}, {'votes/task_a/alice': None}) == {}
@@ -0,0 +1,111 @@
+"""Sujets des événements ``sync/`` et répartition par ``LiveEventHub``."""
+import threading
+
+import pytest
+
+from spring_vote.live_events import ALL, LiveEventHub, LocalEventSource, event_topics
+
+
+@pytest.mark.parametrize('path, data, expected', [
+    ('/votes/task_a', '2024-05-01T10:00:00', {('votes', 'task_a')}),
+    ('/users/alice', '2024-05-01T10:00:00', {('users', 'alice')}),
+    ('/additional_tasks', '2024-05-01T10:00:00', {('additional_tasks', '')}),
+    ('/votes', {'task_a': 'x', 'task_b': 'y'}, {('votes', 'task_a'), ('votes', 'task_b')}),
+    ('/votes', None, {('votes', '*')}),
+    ('/', {'votes/task_a': 'x', 'users/bob': 'x', 'additional_tasks': 'x'},
+     {('votes', 'task_a'), ('users', 'bob'), ('additional_tasks', '')}),
+    ('/', {'votes': {'task_a': 'x'}, 'users': {'bob': 'x'}}, {('votes', 'task_a'), ('users', 'bob')}),
+    ('/', None, {ALL}),
+    ('/other/thing', 'x', set()),
+])
+def test_event_topics(path, data, expected):
+    assert event_topics(path, data) == expected
+
+
+@pytest.fixture
+def hub_factory():
+    hubs = []
+
+    def make(**kwargs):
+        source = LocalEventSource()
+        hub = LiveEventHub(source, **kwargs)
+        hub.start()
+        hubs.append(hub)
+        return source, hub
+
+    yield make
+    for hub in hubs:
+        hub.stop()
+
+
+def test_changes_since_accumulates_topics(hub_factory):
+    source, hub = hub_factory()
+    source.emit('/votes/task_a', 'x')
+    source.emit('/users/alice', 'x')
+    assert hub.wait_for(1, timeout=2) == 2
+
+    assert hub.changes_since(0) == (2, {('votes', 'task_a'), ('users', 'alice')})
+    assert hub.changes_since(1) == (2, {('users', 'alice')})
+    assert hub.changes_since(2) == (2, set())
+
+
+def test_events_without_topics_do_not_advance(hub_factory):
+    source, hub = hub_factory()
+    source.emit('/other', 'x')
+    source.emit('/votes/task_a', 'x')
+    assert hub.wait_for(0, timeout=2) == 1
+    assert hub.changes_since(0) == (1, {('votes', 'task_a')})
+
+
+def test_overflowed_history_reports_everything(hub_factory):
+    source, hub = hub_factory(history=2)
+    for i in range(4):
+        source.emit(f'/votes/task_{i}', 'x')
+    hub.wait_for(3, timeout=2)
+
+    assert hub.changes_since(0) == (4, {ALL})
+    assert hub.changes_since(2) == (4, {('votes', 'task_2'), ('votes', 'task_3')})
+
+
+def test_on_change_runs_before_the_sequence_advances(hub_factory):
+    seen = []
+    hub_ref = {}
+
+    def on_change(topics):
+        # La séquence n'est pas encore visible des sessions
+        seen.append((hub_ref['hub'].sequence, set(topics)))
+
+    source, hub = hub_factory(on_change=on_change)
+    hub_ref['hub'] = hub
+    source.emit('/votes/task_a', 'x')
+    assert hub.wait_for(0, timeout=2) == 1
+    assert seen == [(0, {('votes', 'task_a')})]
+
+
+def test_failing_on_change_does_not_stop_dispatch(hub_factory):
+    def on_change(topics):
+        raise RuntimeError('cache indisponible')
+
+    source, hub = hub_factory(on_change=on_change)
+    source.emit('/votes/task_a', 'x')
+    source.emit('/votes/task_b', 'x')
+    assert hub.wait_for(1, timeout=2) == 2
+    assert hub.alive
+
+
+def test_stop_unsubscribes_from_the_source(hub_factory):
+    source, hub = hub_factory()
+    hub.stop()
+    source.emit('/votes/task_a', 'x')
+    assert not hub.alive
+    assert hub.sequence == 0
+
+
+def test_waiters_are_woken_by_new_events(hub_factory):
+    source, hub = hub_factory()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(hub.wait_for(0, timeout=5)))
+    waiter.start()
+    source.emit('/users/bob', 'x')
+    waiter.join(timeout=5)
+    assert results == [1]
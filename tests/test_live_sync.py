@@ -0,0 +1,139 @@
+"""``sync_snapshot`` : application des deltas signalés par les marqueurs ``sync/``."""
+import pytest
+
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.live_sync import LiveSnapshot, sync_snapshot, sync_stamp_updates
+
+T0 = '2024-05-01T10:00:00'
+T1 = '2024-05-01T10:05:00'
+
+
+class RecordingReference:
+    """Référence qui note le chemin de chaque ``get``."""
+
+    def __init__(self, ref, reads: list):
+        self._ref = ref
+        self.reads = reads
+
+    def child(self, path) -> 'RecordingReference':
+        return RecordingReference(self._ref.child(path), self.reads)
+
+    def get(self, *args, **kwargs):
+        self.reads.append(self._ref.path)
+        return self._ref.get(*args, **kwargs)
+
+
+def _vote(score, stamp=T0):
+    return {'v1': {'score': score, 'timestamp': stamp, 'user_name': 'Alice'}}
+
+
+@pytest.fixture
+def db():
+    data = {
+        'votes': {'task_a': {'alice': _vote(3)}, 'task_b': {'bob': _vote(4)}},
+        'users': {'alice': {'name': 'Alice', 'tokens': {'votes_3': 0}}, 'bob': {'name': 'Bob'}},
+        'additional_tasks': {'t1': {'id': 't1', 'name': 'Tâche 1'}},
+        'last_updated': T0,
+        'sync': {'votes': {'task_a': T0, 'task_b': T0}, 'users': {'alice': T0, 'bob': T0},
+                 'additional_tasks': T0},
+    }
+    return FakeRTDB(data)
+
+
+@pytest.fixture
+def loaded(db):
+    """Snapshot chargé, et liste des lectures faites ensuite."""
+    snapshot = LiveSnapshot()
+    sync_snapshot(db.reference(), snapshot)
+    reads = []
+    return snapshot, RecordingReference(db.reference(), reads), reads
+
+
+def test_first_sync_is_a_full_load(db):
+    snapshot = LiveSnapshot()
+    assert sync_snapshot(db.reference(), snapshot)
+    assert snapshot.loaded and snapshot.full_loads == 1
+    assert snapshot.votes['task_b']['bob'] == _vote(4)
+    assert snapshot.changed_votes is None
+
+
+def test_unchanged_stamp_reads_only_last_updated(loaded):
+    snapshot, ref, reads = loaded
+    assert not sync_snapshot(ref, snapshot)
+    assert reads == ['/last_updated']
+    assert snapshot.delta_loads == 0
+
+
+def test_changed_task_rereads_only_that_subtree(db, loaded):
+    snapshot, ref, reads = loaded
+    untouched = snapshot.votes['task_b']
+    updates = sync_stamp_updates(task_keys=['task_a'], stamp=T1)
+    updates['votes/task_a/bob'] = _vote(5, T1)
+    db.reference().update(updates)
+
+    assert sync_snapshot(ref, snapshot)
+    assert reads == ['/last_updated', '/sync', '/votes/task_a']
+    assert snapshot.votes['task_a'] == {'alice': _vote(3), 'bob': _vote(5, T1)}
+    assert snapshot.votes['task_b'] is untouched
+    assert snapshot.changed_votes == {'task_a'}
+    assert snapshot.delta_loads == 1 and snapshot.full_loads == 1
+    assert snapshot.last_updated == T1
+
+
+def test_changed_user_rereads_only_that_user(db, loaded):
+    snapshot, ref, reads = loaded
+    updates = sync_stamp_updates(user_ids=['alice'], stamp=T1)
+    updates['users/alice/tokens/votes_3'] = 1
+    db.reference().update(updates)
+
+    assert sync_snapshot(ref, snapshot)
+    assert reads == ['/last_updated', '/sync', '/users/alice']
+    assert snapshot.users['alice']['tokens'] == {'votes_3': 1}
+    assert snapshot.changed_votes == set()
+
+
+def test_deleted_subtree_is_removed(db, loaded):
+    snapshot, ref, reads = loaded
+    updates = sync_stamp_updates(task_keys=['task_b'], user_ids=['bob'], stamp=T1)
+    updates['votes/task_b/bob'] = None
+    updates['users/bob'] = None
+    db.reference().update(updates)
+
+    assert sync_snapshot(ref, snapshot)
+    assert 'task_b' not in snapshot.votes
+    assert 'bob' not in snapshot.users
+    assert snapshot.changed_votes == {'task_b'}
+
+
+def test_changed_additional_tasks_are_replaced(db, loaded):
+    snapshot, ref, reads = loaded
+    updates = sync_stamp_updates(tasks=True, stamp=T1)
+    updates['additional_tasks/t2'] = {'id': 't2', 'name': 'Tâche 2'}
+    db.reference().update(updates)
+
+    assert sync_snapshot(ref, snapshot)
+    assert reads == ['/last_updated', '/sync', '/additional_tasks']
+    assert sorted(t['id'] for t in snapshot.additional_tasks) == ['t1', 't2']
+
+
+def test_write_without_stamps_falls_back_to_full_load(db, loaded):
+    snapshot, ref, reads = loaded
+    # Client qui ne connaît pas les marqueurs : seul last_updated bouge
+    db.reference().update({'votes/task_c/carol': _vote(1, T1), 'last_updated': T1})
+
+    assert sync_snapshot(ref, snapshot)
+    assert reads[-1] == '/'
+    assert snapshot.full_loads == 2
+    assert snapshot.votes['task_c']['carol'] == _vote(1, T1)
+    assert snapshot.changed_votes is None
+
+
+def test_clone_is_patched_without_touching_the_original(db, loaded):
+    snapshot, ref, reads = loaded
+    db.reference().update({**sync_stamp_updates(task_keys=['task_a'], stamp=T1), 'votes/task_a': None})
+
+    candidate = snapshot.clone()
+    assert sync_snapshot(ref, candidate)
+    assert 'task_a' not in candidate.votes
+    assert snapshot.votes['task_a'] == {'alice': _vote(3)}
+    assert snapshot.last_updated == T0
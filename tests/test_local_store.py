@@ -0,0 +1,59 @@
+"""``LocalVoteStore`` : tokens ajustés dans la transaction du vote, compteurs SQLite par ``GROUP BY``."""
+import pandas as pd
+import pytest
+
+from spring_vote.aggregates import server_aggregates_from_votes
+from spring_vote.journal_store import JournalStore
+from spring_vote.leaderboard import VoteTable, leaderboard, leaderboard_from_counters
+from spring_vote.sqlite_store import SqliteStore
+from spring_vote.vote_commit import VoteRejected
+from spring_vote.vote_store import LocalVoteStore
+
+TOKENS = {'votes_5': 2, 'votes_4': 2, 'votes_3': 2, 'votes_2': 2, 'votes_1': 2}
+
+
+@pytest.fixture(params=[SqliteStore, JournalStore])
+def store(request, tmp_path):
+    backend = request.param(str(tmp_path))
+    store = LocalVoteStore(backend)
+    store.ensure_user('alice', 'Alice', TOKENS)
+    yield store
+    backend.close()
+
+
+def test_stale_token_copies_do_not_lose_updates(store):
+    # Deux sessions de la même participante, chacune avec les tokens lus avant l'autre vote
+    stale = dict(TOKENS)
+    store.commit_vote('task_a', 'alice', 'Alice', 5, stale)
+    result = store.commit_vote('task_b', 'alice', 'Alice', 5, stale)
+
+    assert result.tokens['votes_5'] == 0
+    assert store.backend.user('alice')['tokens']['votes_5'] == 0
+
+
+def test_exhausted_tokens_reject_the_vote_and_write_nothing(store):
+    stale = dict(TOKENS)
+    store.commit_vote('task_a', 'alice', 'Alice', 5, stale)
+    store.commit_vote('task_b', 'alice', 'Alice', 5, stale)
+
+    with pytest.raises(VoteRejected):
+        store.commit_vote('task_c', 'alice', 'Alice', 5, stale)
+    assert 'task_c' not in store.user_votes('alice')
+    assert store.backend.user('alice')['tokens']['votes_5'] == 0
+
+
+def test_sqlite_counters_feed_the_ranking(tmp_path):
+    backend = SqliteStore(str(tmp_path))
+    store = LocalVoteStore(backend)
+    for user_id, score in (('alice', 5), ('bob', 3)):
+        store.ensure_user(user_id, user_id.title(), TOKENS)
+        store.commit_vote('task_a', user_id, user_id.title(), score, TOKENS)
+    store.commit_vote('task_b', 'bob', 'Bob', 1, TOKENS)
+
+    snapshot = store.load_snapshot()
+    assert snapshot.aggregates == server_aggregates_from_votes(snapshot.votes)
+    tasks = [{'id': 'a', 'name': 'Tâche A'}, {'id': 'b', 'name': 'Tâche B'}]
+    positions = {'task_a': 0, 'task_b': 1}
+    pd.testing.assert_frame_equal(leaderboard_from_counters(tasks, snapshot.aggregates, positions),
+                                  leaderboard(tasks, VoteTable.build(snapshot.votes), positions))
+    backend.close()
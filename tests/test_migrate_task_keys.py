@@ -0,0 +1,73 @@
+"""Fusion des clés historiques : un vote par participant et par tâche, tokens des doublons rendus."""
+import pytest
+
+from spring_vote.aggregates import AGGREGATES_ROOT
+from spring_vote.migrate_task_keys import plan_migration, refunds
+from spring_vote.sqlite_store import SqliteStore
+from spring_vote.task_catalog import TaskCatalog
+from spring_vote.vote_store import LocalVoteStore, MemoryVoteStore
+
+CATALOG = TaskCatalog([{'id': 'task_a', 'name': 'Tâche A', 'legacy_keys': ['old_a']}])
+TOKENS = {'votes_5': 1, 'votes_4': 1, 'votes_3': 2, 'votes_2': 1, 'votes_1': 2}
+
+
+def _vote(vote_id, score, stamp, user_name):
+    return {vote_id: {'score': score, 'timestamp': stamp, 'user_name': user_name}}
+
+
+VOTES = {
+    # Alice a voté sous les deux clés : son vote le plus récent (4) est gardé, le 2 lui est rendu
+    'task_a': {'alice': _vote('v2', 4, '2024-05-02T10:00:00', 'Alice')},
+    'old_a': {'alice': _vote('v1', 2, '2024-05-01T10:00:00', 'Alice'),
+              'bob': _vote('v3', 5, '2024-05-01T11:00:00', 'Bob')},
+}
+
+
+def test_plan_refunds_only_dropped_duplicates():
+    plan = plan_migration(VOTES, CATALOG)
+    legacy_keys, merged, task_refunds = plan['task_a']
+    assert legacy_keys == ['old_a']
+    assert set(merged) == {'alice', 'bob'}
+    assert [v['score'] for v in merged['alice'].values()] == [4]
+    assert refunds(plan) == {'alice': {'votes_2': 1}}
+
+
+def test_newer_legacy_vote_wins_and_refunds_the_canonical_one():
+    votes = {'task_a': {'alice': _vote('v1', 2, '2024-05-01T10:00:00', 'Alice')},
+             'old_a': {'alice': _vote('v2', 4, '2024-05-02T10:00:00', 'Alice')}}
+    plan = plan_migration(votes, CATALOG)
+    assert [v['score'] for v in plan['task_a'][1]['alice'].values()] == [4]
+    assert refunds(plan) == {'alice': {'votes_2': 1}}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    users = {'alice': {'name': 'Alice', 'tokens': dict(TOKENS)}, 'bob': {'name': 'Bob', 'tokens': dict(TOKENS)}}
+    if request.param == 'memory':
+        yield MemoryVoteStore({'votes': VOTES, 'users': users})
+        return
+    backend = SqliteStore(str(tmp_path))
+    backend.apply([(('votes', task_key, user_id), user_votes)
+                   for task_key, task_votes in VOTES.items() for user_id, user_votes in task_votes.items()]
+                  + [(('users', user_id), record) for user_id, record in users.items()])
+    yield LocalVoteStore(backend)
+    backend.close()
+
+
+def test_merge_refunds_tokens_in_the_same_write(store):
+    store.merge_task_keys(plan_migration(VOTES, CATALOG))
+    snapshot = store.load_snapshot()
+
+    assert set(snapshot.votes) == {'task_a'}
+    assert set(snapshot.votes['task_a']) == {'alice', 'bob'}
+    assert snapshot.users['alice']['tokens'] == {**TOKENS, 'votes_2': TOKENS['votes_2'] + 1}
+    assert snapshot.users['bob']['tokens'] == TOKENS
+    # Plus rien à fusionner : relancer la migration ne rend rien une seconde fois
+    assert plan_migration(snapshot.votes, CATALOG) == {}
+
+
+def test_merge_rewrites_server_counters():
+    store = MemoryVoteStore({'votes': VOTES})
+    store.merge_task_keys(plan_migration(VOTES, CATALOG))
+    assert store.db.reference(AGGREGATES_ROOT).get() == {'task_a': {'sum': 9, 'count': 2,
+                                                                     'histogram': {'4': 1, '5': 1}}}
@@ -0,0 +1,46 @@
+"""``SharedSnapshotCache.leaderboard`` : un calcul par génération, invalidé à chaque publication."""
+from types import SimpleNamespace
+
+import pytest
+
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.live_sync import sync_stamp_updates
+from spring_vote.shared_cache import SharedSnapshotCache
+from spring_vote.vote_commit import build_vote_commit
+
+TOKENS = {'votes_5': 2, 'votes_4': 2, 'votes_3': 2, 'votes_2': 2, 'votes_1': 2}
+CATALOG = SimpleNamespace(tasks=[{'id': 'a', 'name': 'Tâche A'}], key_positions={'task_a': 0})
+
+
+@pytest.fixture
+def cached():
+    db = FakeRTDB({'users': {'alice': {'name': 'Alice', 'tokens': dict(TOKENS)}}})
+    shared = SharedSnapshotCache(max_age=0)
+    shared.refresh(db.reference())
+    return db, shared
+
+
+def test_board_is_computed_once_per_generation(cached):
+    db, shared = cached
+    board = shared.leaderboard(CATALOG)
+    assert shared.leaderboard(CATALOG) is board
+    # Vérification sans changement : même génération, même classement
+    shared.refresh(db.reference())
+    assert shared.leaderboard(CATALOG) is board
+    # Autre catalogue : recalcul
+    other = SimpleNamespace(tasks=CATALOG.tasks, key_positions=CATALOG.key_positions)
+    assert shared.leaderboard(other) is not board
+
+
+def test_commit_and_sync_invalidate_the_board(cached):
+    db, shared = cached
+    assert shared.leaderboard(CATALOG).loc[0, 'num_votes'] == 0
+
+    shared.apply_vote_commit(build_vote_commit('task_a', 'alice', 'Alice', 4, TOKENS))
+    assert shared.leaderboard(CATALOG).loc[0, 'total_stars'] == 4
+
+    vote = {'v1': {'score': 2, 'timestamp': '2024-05-01T10:00:00', 'user_name': 'Bob'}}
+    db.reference().update({**sync_stamp_updates(task_keys=['task_a']), 'votes/task_a/bob': vote})
+    shared.refresh(db.reference())
+    board = shared.leaderboard(CATALOG)
+    assert board.loc[0, 'num_votes'] == 1 and board.loc[0, 'total_stars'] == 2
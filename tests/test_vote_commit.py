@@ -0,0 +1,79 @@
+"""``commit_vote_checked`` : réponse perdue, échec réel et remboursement plafonné."""
+import pytest
+
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.token_ledger import TokenLedger
+from spring_vote.vote_commit import build_vote_commit, commit_vote_checked
+
+LIMITS = {'votes_5': 2, 'votes_4': 2, 'votes_3': 2, 'votes_2': 2, 'votes_1': 2}
+
+
+class FailingUpdateReference:
+    """Référence dont le prochain ``update`` lève une erreur, après l'avoir appliqué si ``lands``."""
+
+    def __init__(self, ref, state: dict):
+        self._ref = ref
+        self._state = state
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+    def child(self, path) -> 'FailingUpdateReference':
+        return FailingUpdateReference(self._ref.child(path), self._state)
+
+    def update(self, value):
+        mode = self._state.pop('next', None)
+        if mode == 'lost':
+            self._ref.update(value)
+            raise ConnectionError('réponse perdue')
+        if mode == 'fail':
+            raise ConnectionError('réseau indisponible')
+        return self._ref.update(value)
+
+
+@pytest.fixture
+def room():
+    db = FakeRTDB({'users': {'alice': {'name': 'Alice', 'tokens': dict(LIMITS)}}})
+    state = {}
+    ref = FailingUpdateReference(db.reference(), state)
+    return db, state, ref, TokenLedger(ref, LIMITS)
+
+
+def _tokens(db):
+    return db.reference('users/alice/tokens').get()
+
+
+def test_lost_response_keeps_the_vote_and_debits_once(room):
+    db, state, ref, ledger = room
+    result = build_vote_commit('task_a', 'alice', 'Alice', 5, LIMITS)
+    state['next'] = 'lost'
+
+    assert commit_vote_checked(ref, result, ledger) is result
+    assert db.reference(f'votes/task_a/alice/{result.vote_id}').get() == result.vote
+    assert _tokens(db)['votes_5'] == LIMITS['votes_5'] - 1
+    # Nouvelle tentative du même vote (file d'écritures) : pas de second débit
+    commit_vote_checked(ref, result, ledger)
+    assert _tokens(db)['votes_5'] == LIMITS['votes_5'] - 1
+
+
+def test_failed_write_refunds_the_debit(room):
+    db, state, ref, ledger = room
+    result = build_vote_commit('task_a', 'alice', 'Alice', 5, LIMITS)
+    state['next'] = 'fail'
+
+    with pytest.raises(ConnectionError):
+        commit_vote_checked(ref, result, ledger)
+    assert db.reference('votes').get() is None
+    assert _tokens(db) == LIMITS
+    assert not result.tokens_applied
+
+
+def test_failed_correction_reverts_only_what_the_capped_refund_gave(room):
+    db, state, ref, ledger = room
+    # votes_3 est déjà à sa dotation : le remboursement de l'ancienne note 3 est plafonné à zéro
+    result = build_vote_commit('task_a', 'alice', 'Alice', 5, LIMITS, previous_score=3)
+    state['next'] = 'fail'
+
+    with pytest.raises(ConnectionError):
+        commit_vote_checked(ref, result, ledger)
+    assert _tokens(db) == LIMITS
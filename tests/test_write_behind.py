@@ -0,0 +1,117 @@
+"""File d'écritures en arrière-plan : annulation des corrections après un échec, sessions abandonnées."""
+import pytest
+
+from spring_vote.fake_rtdb import FakeRTDB
+from spring_vote.shared_cache import SharedSnapshotCache
+from spring_vote.token_ledger import TokenLedger
+from spring_vote.vote_commit import VoteRejected, build_vote_commit, commit_vote_checked
+from spring_vote.write_behind import DONE, FAILED, WriteBehindQueue, WriteCancelled
+
+TOKENS = {'votes_5': 2, 'votes_4': 2, 'votes_3': 2, 'votes_2': 2, 'votes_1': 2}
+
+
+class FlakyReference:
+    """Référence dont les ``update`` échouent tant que ``state['failing']`` est vrai."""
+
+    def __init__(self, ref, state: dict):
+        self._ref = ref
+        self._state = state
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+    def child(self, path) -> 'FlakyReference':
+        return FlakyReference(self._ref.child(path), self._state)
+
+    def update(self, value):
+        if self._state['failing']:
+            raise ConnectionError('réseau indisponible')
+        return self._ref.update(value)
+
+
+@pytest.fixture
+def room():
+    db = FakeRTDB({'users': {'alice': {'name': 'Alice', 'tokens': dict(TOKENS)}}})
+    state = {'failing': True}
+    ref = FlakyReference(db.reference(), state)
+    shared = SharedSnapshotCache()
+    shared.refresh(ref)
+    write_queue = WriteBehindQueue(max_attempts=1, retry_delay=0, non_retryable=(VoteRejected,))
+
+    def vote(score, previous_score=None):
+        """Vote optimiste tel que l'application le fait : affiché, puis écrit en arrière-plan."""
+        tokens = shared.snapshot.users['alice']['tokens']
+        result = build_vote_commit('task_a', 'alice', 'Alice', score, tokens, previous_score)
+        shared.apply_vote_commit(result)
+        ledger = TokenLedger(ref, TOKENS)
+        return write_queue.submit(lambda: commit_vote_checked(ref, result, ledger), key=('alice', 'task_a'),
+                                  rollback=lambda: shared.reload_votes(ref, 'alice', result.task_keys))
+
+    return db, state, shared, write_queue, vote
+
+
+def test_correction_of_a_failed_vote_is_cancelled_and_rolled_back(room):
+    db, state, shared, write_queue, vote = room
+    first = vote(3)
+    correction = vote(5, previous_score=3)
+    # Les deux écritures sont en file avant que la première ne soit tentée
+    write_queue.start()
+    assert write_queue.drain(timeout=5)
+
+    assert write_queue.status(first)[0] == FAILED
+    outcome, error = write_queue.status(correction)
+    assert outcome == FAILED and isinstance(error, WriteCancelled)
+    # Rien n'est écrit, aucun token n'est perdu, et le cache partagé a retrouvé l'état réel
+    assert db.reference('votes').get() is None
+    assert db.reference('users/alice/tokens').get() == TOKENS
+    assert 'task_a' not in shared.snapshot.votes
+    assert shared.snapshot.users['alice']['tokens'] == TOKENS
+
+
+def test_abandoned_failure_does_not_block_later_votes(room):
+    db, state, shared, write_queue, vote = room
+    write_queue.start()
+    failed = vote(3)
+    assert write_queue.drain(timeout=5)
+    assert write_queue.status(failed)[0] == FAILED
+    # La session a disparu : ni status() ni forget() ne seront plus appelés pour ce ticket
+
+    state['failing'] = False
+    later = vote(4)
+    assert write_queue.drain(timeout=5)
+
+    assert write_queue.status(later) == (DONE, None)
+    stored = db.reference('votes/task_a/alice').get()
+    assert [v['score'] for v in stored.values()] == [4]
+    assert db.reference('users/alice/tokens/votes_4').get() == TOKENS['votes_4'] - 1
+    assert db.reference('users/alice/tokens/votes_3').get() == TOKENS['votes_3']
+
+
+def test_cancelled_outcomes_do_not_extend_the_block(room):
+    db, state, shared, write_queue, vote = room
+    vote(3)
+    vote(5, previous_score=3)
+    write_queue.start()
+    assert write_queue.drain(timeout=5)
+
+    state['failing'] = False
+    after = vote(2)
+    assert write_queue.drain(timeout=5)
+    assert write_queue.status(after) == (DONE, None)
+    assert shared.snapshot.votes['task_a']['alice']
+
+
+def test_other_keys_are_not_cancelled():
+    calls = []
+    write_queue = WriteBehindQueue(max_attempts=1, retry_delay=0)
+
+    def failing():
+        raise ConnectionError('réseau indisponible')
+
+    bad = write_queue.submit(failing, key=('alice', 'task_a'))
+    good = write_queue.submit(lambda: calls.append('task_b'), key=('alice', 'task_b'))
+    write_queue.start()
+    assert write_queue.drain(timeout=5)
+    assert write_queue.status(bad)[0] == FAILED
+    assert write_queue.status(good) == (DONE, None)
+    assert calls == ['task_b']